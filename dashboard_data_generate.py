@@ -1,16 +1,67 @@
+import argparse
 import json
+import os
 import random
+import secrets
+import shutil
+import sys
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
+from functools import lru_cache
+from itertools import islice
+from pathlib import Path
+
+try:
+    import numpy as np
+except ImportError:  # only needed for --engine numpy
+    np = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet output is optional; NDJSON/JSON need only the stdlib
+    pa = None
+    pq = None
+
+# Summary sections are computed by the shared aggregation stage in scripts/
+sys.path.insert(0, str(Path(__file__).parent / 'scripts'))
+from dashboard_aggregates import DashboardAggregator, aggregate_file
+
+try:
+    from basket_mining import BasketMiner, mine_file
+except ImportError:  # only needed for --mine-baskets (numpy and pyarrow)
+    BasketMiner = None
+    mine_file = None
+
+try:
+    from region_index import load_region_index
+except ImportError:  # needs numpy and pyarrow; without them transactions keep only their store_location label
+    load_region_index = None
 
 # Load your real brands list (from brands_500.json)
-with open('attached_assets/brands_500.json', 'r') as f:
+with open(Path(__file__).parent / 'attached_assets' / 'brands_500.json', 'r') as f:
     brand_records = json.load(f)
 
+# Group the catalogue by brand in one pass, keeping the per-brand aggregates
+# every section needs instead of rescanning brand_records per brand
+def index_brand_records(records):
+    """Map each brand to its record count, total value and latest record"""
+    index = {}
+    for rec in records:
+        entry = index.get(rec['brand'])
+        if entry is None:
+            entry = index[rec['brand']] = {"count": 0, "total_value": 0.0, "latest": rec}
+        entry["count"] += 1
+        entry["total_value"] += rec['value']
+        if rec.get('timestamp', '') > entry["latest"].get('timestamp', ''):
+            entry["latest"] = rec
+    return index
+
+brand_index = index_brand_records(brand_records)
+
 # Build a list of unique brands (with frequency weight by occurrence)
-brands_unique = list({rec['brand'] for rec in brand_records})
-brand_weights = {brand: 1 for brand in brands_unique}
-for rec in brand_records:
-    brand_weights[rec['brand']] += 1
+brands_unique = list(brand_index)
+brand_weights = {brand: entry["count"] + 1 for brand, entry in brand_index.items()}
 
 # Optionally, you can define categories if needed
 category_map = {
@@ -114,98 +165,535 @@ def assign_category(brand):
     
     return "Grocery Items"  # More specific than "General"
 
-N = 500  # number of records per main section
+# Resolve each unique brand once; row generation then does a plain dict lookup
+# instead of rescanning category_map/category_keywords per row.
+def build_category_index(brands):
+    """Map each brand to its category"""
+    return {brand: assign_category(brand) for brand in brands}
 
-# --- Transaction Trends ---
-transaction_trends = []
+brand_categories = build_category_index(brands_unique)
+
+def export_category_index(path):
+    """Write the brand → category lookup as JSON so the Node API can reuse it"""
+    with open(path, "w") as f:
+        json.dump(dict(sorted(brand_categories.items())), f, indent=2)
+    return len(brand_categories)
+
+N = 500  # default number of records per main section
+CHUNK_SIZE = 50_000  # rows per NDJSON flush / Parquet row group in streaming mode
 start_date = datetime(2025, 4, 24)
-for i in range(N):
-    rec = random.choice(brand_records)
-    brand = rec['brand']
-    category = assign_category(brand)
-    date_offset = random.randint(0, 29)
-    ts = start_date + timedelta(days=date_offset)
-    transaction_trends.append({
-        "date": ts.strftime("%Y-%m-%d"),
-        "volume": random.randint(500, 2500),
-        "peso_value": round(rec['value'], 2),
-        "duration": random.randint(30, 300),  # seconds
-        "units": random.randint(1, 10),
-        "brand": brand,
-        "category": category
-    })
+locations = ["Manila", "Cebu", "Davao", "Bacolod", "Makati", "Taguig", "Quezon City", "Iloilo", "Cagayan de Oro", "Zamboanga"]
+
+# Store, time and shopper attributes carried by the served transaction rows,
+# which the dashboard summary sections are aggregated from
+stores = [  # (city, region, latitude, longitude)
+    ("Manila", "NCR", 14.5995, 120.9842),
+    ("Quezon City", "NCR", 14.676, 121.0437),
+    ("Makati", "NCR", 14.5547, 121.0244),
+    ("Taguig", "NCR", 14.5176, 121.0509),
+    ("Cebu City", "Central Visayas", 10.3157, 123.8854),
+    ("Iloilo City", "Western Visayas", 10.7202, 122.5621),
+    ("Bacolod", "Western Visayas", 10.6407, 122.9688),
+    ("Davao City", "Davao", 7.1907, 125.4553),
+    ("Cagayan de Oro", "Northern Mindanao", 8.4822, 124.6472),
+    ("General Santos", "SOCCSKSARGEN", 6.1164, 125.1716)
+]
+peak_hours = {11, 12, 13, 17, 18, 19, 20}
+time_of_day = ["Early Morning"] * 6 + ["Morning"] * 6 + ["Afternoon"] * 5 + ["Evening"] * 4 + ["Night"] * 3  # by hour
+age_groups = ["18-24", "25-34", "35-44", "45-54", "55+"]
+CONSUMER_POOL = 100_000  # most distinct consumer ids transactions are drawn from
+TRANSACTIONS_PER_CONSUMER = 20  # sizes the pool below that, so consumers repeat and baskets hold several items
+REPEAT_RATE = 0.6
+
+# --- Transaction Trends ---
+def consumer_pool(transactions):
+    """Distinct consumer ids for a dataset of this many transactions"""
+    return max(1, min(CONSUMER_POOL, transactions // TRANSACTIONS_PER_CONSUMER))
+
+def generate_transaction_trends(n, rng=random, start=0, consumers=CONSUMER_POOL):
+    """Yield n transaction trend rows drawing from consumers consumer ids"""
+    for i in range(n):
+        rec = rng.choice(brand_records)
+        brand = rec['brand']
+        category = brand_categories[brand]
+        date_offset = rng.randint(0, 29)
+        ts = start_date + timedelta(days=date_offset)
+        hour = rng.randint(0, 23)
+        city, region, latitude, longitude = rng.choice(stores)
+        yield {
+            "transaction_id": f"TRX{start+i+1:06d}",
+            "date": ts.strftime("%Y-%m-%d"),
+            "hour": hour,
+            "day_of_week": ts.strftime("%A"),
+            "is_weekend": ts.weekday() >= 5,
+            "is_peak_hour": hour in peak_hours,
+            "time_of_day": time_of_day[hour],
+            "store_location": region,
+            "city": city,
+            "latitude": latitude,
+            "longitude": longitude,
+            "volume": rng.randint(500, 2500),
+            "peso_value": round(rec['value'], 2),
+            "duration": rng.randint(30, 300),  # seconds
+            "units": rng.randint(1, 10),
+            "brand": brand,
+            "category": category,
+            "consumer_id": f"CONS{rng.randint(1, consumers):06d}",
+            "age_group": rng.choice(age_groups),
+            "gender": rng.choice(["Male", "Female"]),
+            "is_repeat_customer": rng.random() < REPEAT_RATE
+        }
 
 # --- Consumer Profiling ---
-consumer_profiling = []
-locations = ["Manila", "Cebu", "Davao", "Bacolod", "Makati", "Taguig", "Quezon City", "Iloilo", "Cagayan de Oro", "Zamboanga"]
-for i in range(N):
-    consumer_profiling.append({
-        "gender": random.choice(["Male", "Female"]),
-        "age": random.randint(18, 65),
-        "location": random.choice(locations)
-    })
+def generate_consumer_profiling(n, rng=random, start=0):
+    """Yield n consumer profile rows"""
+    for i in range(n):
+        yield {
+            "gender": rng.choice(["Male", "Female"]),
+            "age": rng.randint(18, 65),
+            "location": rng.choice(locations)
+        }
 
 # --- Basket Analysis ---
-basket_data = []
-for i in range(N):
-    brand = random.choice(brands_unique)
-    basket_data.append({
-        "basket_id": f"BASKET{i+1:04d}",
-        "brand": brand,
-        "item_count": random.randint(1, 7),
-        "total_value": round(random.uniform(50, 1800), 2)
-    })
+def generate_basket_analysis(n, rng=random, start=0):
+    """Yield n basket rows; basket ids continue from start"""
+    for i in range(start, start + n):
+        brand = rng.choice(brands_unique)
+        yield {
+            "basket_id": f"BASKET{i+1:04d}",
+            "brand": brand,
+            "item_count": rng.randint(1, 7),
+            "total_value": round(rng.uniform(50, 1800), 2)
+        }
 
 # --- Substitution Patterns ---
-subs_brands = random.sample(brands_unique, min(40, len(brands_unique)))
-substitution_patterns = []
-for i in range(len(subs_brands)//2):
-    original = subs_brands[i]
-    substitute = subs_brands[-i-1]
-    substitution_patterns.append({
-        "original": original,
-        "substitution": substitute,
-        "count": random.randint(10, 300),
-        "reason": random.choice(["Out of stock", "Price", "Promo", "Taste", "Availability"])
-    })
+def generate_substitution_patterns(rng=random):
+    """Pair up a sample of brands as substitution patterns"""
+    subs_brands = rng.sample(brands_unique, min(40, len(brands_unique)))
+    substitution_patterns = []
+    for i in range(len(subs_brands)//2):
+        original = subs_brands[i]
+        substitute = subs_brands[-i-1]
+        substitution_patterns.append({
+            "original": original,
+            "substitution": substitute,
+            "count": rng.randint(10, 300),
+            "reason": rng.choice(["Out of stock", "Price", "Promo", "Taste", "Availability"])
+        })
+    return substitution_patterns
 
 # --- Brand Trends (for leaderboard, etc.) ---
-brand_trends = []
-for brand in brands_unique:
-    # Get a sample record from original for realistic value/trend
-    recs = [r for r in brand_records if r['brand'] == brand]
-    if recs:
-        rec = random.choice(recs)
-        brand_trends.append({
-            "brand": brand,
-            "category": assign_category(brand),
-            "value": rec['value'],
-            "pct_change": rec['pct_change']
-        })
-    else:
+def generate_brand_trends():
+    """Build one leaderboard row per unique brand from its latest catalogue record"""
+    brand_trends = []
+    for brand, entry in brand_index.items():
+        latest = entry["latest"]
         brand_trends.append({
             "brand": brand,
-            "category": assign_category(brand),
-            "value": round(random.uniform(300000, 3000000), 2),
-            "pct_change": round(random.uniform(-0.08, 0.25), 3)
+            "category": brand_categories[brand],
+            "value": latest['value'],
+            "pct_change": latest['pct_change']
         })
+    return brand_trends
 
-# --- Dashboard Export ---
-dashboard_data = {
-    "transaction_trends": transaction_trends,
-    "consumer_profiling": consumer_profiling,
-    "basket_analysis": basket_data,
-    "substitution_patterns": substitution_patterns,
-    "brand_trends": brand_trends
+# --- Vectorized NumPy Engine ---
+# Each builder draws whole columns for rows [start, start + n) in one batch and
+# returns an Arrow table, with brand/category/location as dictionary columns.
+def require_numpy_engine():
+    if np is None or pa is None:
+        raise RuntimeError("numpy and pyarrow are required for --engine numpy (pip install -r scripts/requirements.txt)")
+
+def require_basket_miner():
+    if BasketMiner is None:
+        raise RuntimeError("numpy and pyarrow are required for --mine-baskets (pip install -r scripts/requirements.txt)")
+
+@lru_cache(maxsize=None)
+def record_arrays():
+    """Brand catalogue as arrays: brand names, per-record brand index and value, per-brand category index"""
+    brand_names, record_brand = np.unique([rec['brand'] for rec in brand_records], return_inverse=True)
+    record_values = np.round(np.array([rec['value'] for rec in brand_records], dtype=np.float64), 2)
+    category_names, brand_category = np.unique([brand_categories[b] for b in brand_names], return_inverse=True)
+    return brand_names, record_brand, record_values, category_names, brand_category
+
+def dictionary_column(indices, names):
+    return pa.DictionaryArray.from_arrays(pa.array(indices.astype(np.int32)), pa.array(names))
+
+def id_column(prefix, numbers, width):
+    """Format numbers like f"{prefix}{number:0{width}d}" straight into an Arrow string buffer"""
+    numbers = np.asarray(numbers, dtype=np.int64)
+    prefix = np.frombuffer(prefix.encode(), dtype=np.uint8)
+    ndigits = np.maximum(width, np.searchsorted(10 ** np.arange(1, 19), numbers, side='right') + 1)
+    offsets = np.zeros(len(numbers) + 1, dtype=np.int64)
+    np.cumsum(len(prefix) + ndigits, out=offsets[1:])
+    buf = np.empty(offsets[-1], dtype=np.uint8)
+    for j, byte in enumerate(prefix):
+        buf[offsets[:-1] + j] = byte
+    ends = offsets[1:]
+    remaining = numbers.copy()
+    for k in range(int(ndigits.max(initial=0))):  # fill digits right to left
+        if k < width:  # every id has at least width digits
+            buf[ends - 1 - k] = remaining % 10 + ord('0')
+        else:
+            mask = k < ndigits
+            buf[ends[mask] - 1 - k] = remaining[mask] % 10 + ord('0')
+        remaining //= 10
+    return pa.StringArray.from_buffers(len(numbers), pa.py_buffer(offsets.astype(np.int32)), pa.py_buffer(buf))
+
+def transaction_table(n, rng, start=0, consumers=CONSUMER_POOL):
+    """Draw n transaction trend rows as columns, drawing from consumers consumer ids"""
+    brand_names, record_brand, record_values, category_names, brand_category = record_arrays()
+    # Sampling records uniformly weights each brand by its occurrence count, like random.choice(brand_records)
+    rec_idx = rng.integers(0, len(record_brand), n)
+    brand_idx = record_brand[rec_idx]
+    dates = np.datetime64(start_date.date()) + rng.integers(0, 30, n).astype('timedelta64[D]')
+    weekday = (dates.astype(np.int64) + 3) % 7  # 1970-01-01 was a Thursday; Monday == 0
+    hours = rng.integers(0, 24, n)
+    store_idx = rng.integers(0, len(stores), n)
+    cities, regions, latitudes, longitudes = (np.array(column) for column in zip(*stores))
+    region_names, store_region = np.unique(regions, return_inverse=True)
+    time_names, hour_time = np.unique(time_of_day, return_inverse=True)
+    return pa.table({
+        "transaction_id": id_column("TRX", np.arange(start + 1, start + n + 1), 6),
+        "date": pa.array(dates),
+        "hour": hours,
+        "day_of_week": dictionary_column(weekday, ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]),
+        "is_weekend": weekday >= 5,
+        "is_peak_hour": np.isin(hours, list(peak_hours)),
+        "time_of_day": dictionary_column(hour_time[hours], time_names),
+        "store_location": dictionary_column(store_region[store_idx], region_names),
+        "city": dictionary_column(store_idx, cities),
+        "latitude": latitudes[store_idx],
+        "longitude": longitudes[store_idx],
+        "volume": rng.integers(500, 2501, n),
+        "peso_value": record_values[rec_idx],
+        "duration": rng.integers(30, 301, n),  # seconds
+        "units": rng.integers(1, 11, n),
+        "brand": dictionary_column(brand_idx, brand_names),
+        "category": dictionary_column(brand_category[brand_idx], category_names),
+        "consumer_id": id_column("CONS", rng.integers(1, consumers + 1, n), 6),
+        "age_group": dictionary_column(rng.integers(0, len(age_groups), n), age_groups),
+        "gender": dictionary_column(rng.integers(0, 2, n), ["Male", "Female"]),
+        "is_repeat_customer": rng.random(n) < REPEAT_RATE
+    })
+
+def consumer_table(n, rng, start=0):
+    """Draw n consumer profile rows as columns"""
+    return pa.table({
+        "gender": dictionary_column(rng.integers(0, 2, n), ["Male", "Female"]),
+        "age": rng.integers(18, 66, n),
+        "location": dictionary_column(rng.integers(0, len(locations), n), locations)
+    })
+
+def basket_table(n, rng, start=0):
+    """Draw n basket rows as columns; basket ids continue from start"""
+    brand_names = record_arrays()[0]
+    return pa.table({
+        "basket_id": id_column("BASKET", np.arange(start + 1, start + n + 1), 4),
+        "brand": dictionary_column(rng.integers(0, len(brand_names), n), brand_names),
+        "item_count": rng.integers(1, 8, n),
+        "total_value": np.round(rng.uniform(50, 1800, n), 2)
+    })
+
+def table_chunks(build, n, chunk_size, rng, start=0, **options):
+    """Yield Arrow tables of at most chunk_size rows from a column builder"""
+    for offset in range(0, n, chunk_size):
+        yield build(min(chunk_size, n - offset), rng, start + offset, **options)
+
+def table_rows(table):
+    """Convert an engine table to JSON-ready row dicts (dates as YYYY-MM-DD)"""
+    for i, field in enumerate(table.schema):
+        if pa.types.is_date(field.type):
+            table = table.set_column(i, field.name, table.column(i).cast(pa.string()))
+    return table.to_pylist()
+
+# --- Seeding & Sharding ---
+# A dataset is defined by (seed, shards, chunk size): shard i of k owns a fixed
+# slice of every row section and draws from its own independent RNG stream, so
+# the merged output is identical no matter how many worker processes run it.
+ROW_SECTIONS = ("transaction_trends", "consumer_profiling", "basket_analysis")
+ROW_GENERATORS = {
+    "transaction_trends": generate_transaction_trends,
+    "consumer_profiling": generate_consumer_profiling,
+    "basket_analysis": generate_basket_analysis
+}
+TABLE_BUILDERS = {
+    "transaction_trends": transaction_table,
+    "consumer_profiling": consumer_table,
+    "basket_analysis": basket_table
 }
 
-with open("dashboard_data.json", "w") as f:
-    json.dump(dashboard_data, f, indent=2)
+def shard_bounds(n, shard, shards):
+    """Return (start, count) of the rows owned by a shard"""
+    start = n * shard // shards
+    return start, n * (shard + 1) // shards - start
+
+def section_rng(engine, seed, section, shard):
+    """Independent RNG stream for one section of one shard"""
+    if engine == "numpy":
+        return np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(ROW_SECTIONS.index(section), shard)))
+    return random.Random(f"{seed}:{section}:{shard}")
+
+# --- Streaming Output ---
+def chunked(rows, size):
+    """Group an iterable of rows into lists of at most size rows"""
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+def with_regions(chunks):
+    """Add region_id/region from the ph.json spatial join to each transaction chunk"""
+    index = load_region_index()
+    for chunk in chunks:
+        yield index.assign(chunk) if isinstance(chunk, pa.Table) else index.assign_rows(chunk)
+
+def row_section_chunks(engine, counts, chunk_size, seed, shard=0, shards=1):
+    """Map each row section to an iterator of chunks (row-dict lists or Arrow tables) for one shard"""
+    if engine == "numpy":
+        require_numpy_engine()
+    sections = {}
+    for section in counts:
+        start, n = shard_bounds(counts[section], shard, shards)
+        rng = section_rng(engine, seed, section, shard)
+        # The consumer pool follows the dataset's total transactions, not the shard's
+        options = {"consumers": consumer_pool(counts[section])} if section == "transaction_trends" else {}
+        if engine == "numpy":
+            sections[section] = table_chunks(TABLE_BUILDERS[section], n, chunk_size, rng, start, **options)
+        else:
+            sections[section] = chunked(ROW_GENERATORS[section](n, rng, start, **options), chunk_size)
+    if load_region_index is not None:
+        sections["transaction_trends"] = with_regions(sections["transaction_trends"])
+    return sections
+
+def catalogue_sections(seed, mine_baskets=False):
+    """Sections built from the brand catalogue rather than per-row draws"""
+    sections = {"brand_trends": generate_brand_trends()}
+    if not mine_baskets:  # placeholder pairs; otherwise substitutions are mined from the transactions
+        sections["substitution_patterns"] = generate_substitution_patterns(
+            random.Random(f"{seed}:substitution_patterns"))
+    return sections
+
+def write_ndjson(chunks, path):
+    """Stream chunks to a newline-delimited JSON file, one chunk in memory at a time"""
+    count = 0
+    with open(path, "w") as f:
+        for chunk in chunks:
+            if pa is not None and isinstance(chunk, pa.Table):
+                chunk = table_rows(chunk)
+            f.write("".join(json.dumps(row) + "\n" for row in chunk))
+            count += len(chunk)
+    return count
+
+def write_parquet(chunks, path):
+    """Stream chunks to a Parquet file, writing one row group per chunk"""
+    if pa is None:
+        raise RuntimeError("pyarrow is required for Parquet output (pip install -r scripts/requirements.txt)")
+    count = 0
+    writer = None
+    try:
+        for chunk in chunks:
+            table = chunk if isinstance(chunk, pa.Table) else pa.Table.from_pylist(chunk)
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema, compression='snappy')
+            writer.write_table(table.cast(writer.schema), row_group_size=len(table))
+            count += len(table)
+    finally:
+        if writer is not None:
+            writer.close()
+    return count
+
+def merge_ndjson(parts, path):
+    """Concatenate shard NDJSON files in shard order"""
+    with open(path, "wb") as out:
+        for part in parts:
+            with open(part, "rb") as f:
+                shutil.copyfileobj(f, out)
+
+def merge_parquet(parts, path):
+    """Copy shard Parquet files into one file, one row group at a time"""
+    writer = None
+    try:
+        for part in parts:
+            if not part.exists():  # empty shards write no Parquet file
+                continue
+            parquet_file = pq.ParquetFile(part)
+            for i in range(parquet_file.num_row_groups):
+                table = parquet_file.read_row_group(i)
+                if writer is None:
+                    writer = pq.ParquetWriter(path, table.schema, compression='snappy')
+                writer.write_table(table.cast(writer.schema), row_group_size=len(table))
+    finally:
+        if writer is not None:
+            writer.close()
+
+STREAM_WRITERS = {"ndjson": write_ndjson, "parquet": write_parquet}
+STREAM_MERGERS = {"ndjson": merge_ndjson, "parquet": merge_parquet}
+
+def shard_path(output_dir, section, fmt, shard, shards):
+    if shards == 1:
+        return output_dir / f"{section}.{fmt}"
+    return output_dir / f"{section}.part-{shard:05d}.{fmt}"
+
+def write_shard(task):
+    """Worker entry point: write one shard of every row section"""
+    output_dir, fmt, engine, counts, chunk_size, seed, shard, shards = task
+    writer = STREAM_WRITERS[fmt]
+    return {
+        section: writer(chunks, shard_path(output_dir, section, fmt, shard, shards))
+        for section, chunks in row_section_chunks(engine, counts, chunk_size, seed, shard, shards).items()
+    }
+
+def shard_rows(task):
+    """Worker entry point: build one shard of every row section as row dicts"""
+    engine, counts, chunk_size, seed, shard, shards = task
+    sections = {}
+    for section, chunks in row_section_chunks(engine, counts, chunk_size, seed, shard, shards).items():
+        sections[section] = []
+        for chunk in chunks:
+            if pa is not None and isinstance(chunk, pa.Table):
+                chunk = table_rows(chunk)
+            sections[section].extend(chunk)
+    return sections
+
+def run_shards(worker, tasks, workers):
+    """Run shard tasks in a process pool and return their results in shard order"""
+    if workers <= 1 or len(tasks) <= 1:
+        return [worker(task) for task in tasks]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(worker, tasks))
+
+def row_counts(transactions, rows, mine_baskets=False):
+    """Rows per generated row section; with mine_baskets, baskets are mined from the transactions instead"""
+    counts = {"transaction_trends": transactions, "consumer_profiling": rows}
+    if not mine_baskets:
+        counts["basket_analysis"] = rows
+    return counts
+
+def stream_dataset(output_dir, fmt, transactions, rows, chunk_size=CHUNK_SIZE, engine="python",
+                   seed=None, shards=1, workers=1, mine_baskets=False):
+    """Write every section to its own NDJSON/Parquet file without materializing it"""
+    if mine_baskets:
+        require_basket_miner()
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    counts = row_counts(transactions, rows, mine_baskets)
+    tasks = [(output_dir, fmt, engine, counts, chunk_size, seed, shard, shards) for shard in range(shards)]
+    shard_counts = run_shards(write_shard, tasks, workers)
+
+    written = {}
+    for section in counts:
+        path = output_dir / f"{section}.{fmt}"
+        if shards > 1:
+            parts = [shard_path(output_dir, section, fmt, shard, shards) for shard in range(shards)]
+            STREAM_MERGERS[fmt](parts, path)
+            for part in parts:
+                part.unlink(missing_ok=True)
+        written[section] = sum(c[section] for c in shard_counts)
+        print(f"✓ Wrote {written[section]} {section} rows to {path}")
+
+    sections = catalogue_sections(seed, mine_baskets)
+    mined = {}
+    if mine_baskets:
+        # The same mined baskets, brand pairs and substitutions as the JSON export. Only the
+        # first `rows` consumers are mined, so memory stays bounded as transactions grow.
+        mined = mine_file(output_dir / f"transaction_trends.{fmt}", basket_limit=rows, max_consumers=rows)
+        sections.update(mined)
+    for section, section_rows in sections.items():
+        path = output_dir / f"{section}.{fmt}"
+        written[section] = STREAM_WRITERS[fmt]([section_rows], path)
+        print(f"✓ Wrote {written[section]} {section} rows to {path}")
+    return written, mined
+
+# --- Dashboard Export ---
+def build_dashboard_data(transactions, rows, engine="python", seed=None, shards=1, workers=1,
+                         mine_baskets=False):
+    """Build all sections in memory for the single-file JSON export"""
+    if mine_baskets:
+        require_basket_miner()
+    counts = row_counts(transactions, rows, mine_baskets)
+    tasks = [(engine, counts, CHUNK_SIZE, seed, shard, shards) for shard in range(shards)]
+    dashboard_data = {section: [] for section in counts}
+    for sections in run_shards(shard_rows, tasks, workers):
+        for section, section_rows in sections.items():
+            dashboard_data[section].extend(section_rows)
+    dashboard_data.update(catalogue_sections(seed, mine_baskets))
+    dashboard_data.update(DashboardAggregator().add_rows(dashboard_data["transaction_trends"]).result())
+    if mine_baskets:
+        # Real baskets, brand pairs and substitutions mined from the same consumer sample as --stream
+        miner = BasketMiner(max_consumers=rows).add_rows(dashboard_data["transaction_trends"])
+        dashboard_data.update(miner.result(basket_limit=rows))
+    return dashboard_data
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generate synthetic dashboard data")
+    parser.add_argument("--rows", type=int, default=N,
+                        help="records per main section (default: %(default)s)")
+    parser.add_argument("--transactions", type=int,
+                        help="transaction_trends rows (defaults to --rows)")
+    parser.add_argument("--engine", choices=["python", "numpy"], default="python",
+                        help="row generator: per-row python loops or vectorized numpy columns (default: %(default)s)")
+    parser.add_argument("--stream", action="store_true",
+                        help="stream each section to its own file instead of one JSON blob")
+    parser.add_argument("--format", choices=sorted(STREAM_WRITERS), default="ndjson",
+                        help="file format for --stream (default: %(default)s)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE,
+                        help="rows per chunk / Parquet row group (default: %(default)s)")
+    parser.add_argument("--seed", type=int,
+                        help="seed for a reproducible dataset (default: random, printed at the end)")
+    parser.add_argument("--shards", type=int, default=1,
+                        help="split row sections into this many independently seeded shards (default: %(default)s)")
+    parser.add_argument("--workers", type=int,
+                        help="worker processes for sharded runs (default: min(shards, CPU count))")
+    parser.add_argument("--aggregate", action="store_true",
+                        help="with --stream, also summarize transaction_trends into dashboard_summary.json")
+    parser.add_argument("--mine-baskets", action="store_true",
+                        help="mine basket_analysis, brand_associations and substitution_patterns from the "
+                             "transactions of the first --rows consumers instead of drawing placeholders")
+    parser.add_argument("--export-categories", metavar="PATH",
+                        help="also write the brand → category lookup table as JSON")
+    parser.add_argument("--output", default=None,
+                        help="output file, or directory with --stream "
+                             "(default: dashboard_data.json / dashboard_data_stream/)")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    transactions = args.transactions if args.transactions is not None else args.rows
+    seed = args.seed if args.seed is not None else secrets.randbits(63)
+    workers = args.workers or min(args.shards, os.cpu_count() or 1)
+
+    if args.stream:
+        counts, mined = stream_dataset(args.output or "dashboard_data_stream", args.format,
+                                       transactions, args.rows, args.chunk_size, args.engine,
+                                       seed, args.shards, workers, args.mine_baskets)
+        print(f"✅ Streamed {sum(counts.values())} rows across {len(counts)} sections")
+        if args.aggregate:
+            output_dir = Path(args.output or "dashboard_data_stream")
+            summary = aggregate_file(output_dir / f"transaction_trends.{args.format}")
+            summary.update(mined)
+            with open(output_dir / "dashboard_summary.json", "w") as f:
+                json.dump(summary, f, indent=2)
+            print(f"📋 Summarized transactions into {output_dir / 'dashboard_summary.json'}")
+    else:
+        dashboard_data = build_dashboard_data(transactions, args.rows, args.engine,
+                                              seed, args.shards, workers, args.mine_baskets)
+
+        with open(args.output or "dashboard_data.json", "w") as f:
+            json.dump(dashboard_data, f, indent=2)
+
+        print("✅ dashboard_data.json generated with all modules aligned!")
+        print(f"📊 Generated {len(dashboard_data['transaction_trends'])} transaction trends")
+        print(f"👥 Generated {len(dashboard_data['consumer_profiling'])} consumer profiles")
+        print(f"🛒 Generated {len(dashboard_data.get('basket_analysis', []))} basket analyses")
+        print(f"🔄 Generated {len(dashboard_data.get('substitution_patterns', []))} substitution patterns")
+        print(f"📈 Generated {len(dashboard_data['brand_trends'])} brand trends")
+        print(f"📋 Summarized {dashboard_data['kpi_metrics']['total_transactions']} transactions into kpi/brand/location/time sections")
+
+    if args.export_categories:
+        count = export_category_index(args.export_categories)
+        print(f"🗂️  Exported {count} brand categories to {args.export_categories}")
 
-print("✅ dashboard_data.json generated with all modules aligned!")
-print(f"📊 Generated {len(transaction_trends)} transaction trends")
-print(f"👥 Generated {len(consumer_profiling)} consumer profiles")
-print(f"🛒 Generated {len(basket_data)} basket analyses")
-print(f"🔄 Generated {len(substitution_patterns)} substitution patterns")
-print(f"📈 Generated {len(brand_trends)} brand trends")
-print(f"🏷️  Using {len(brands_unique)} unique brands from your data")
\ No newline at end of file
+    print(f"🏷️  Using {len(brands_unique)} unique brands from your data")
+    print(f"🎲 Seed {seed} across {args.shards} shard(s) (pass --seed {seed} --shards {args.shards} to reproduce)")
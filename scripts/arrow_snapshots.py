@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Arrow IPC (Feather V2) snapshots of the Parquet outputs for fast cold starts
+
+Each dataset in parquet_output/ (flat files, the partitioned transaction
+dataset and the rollups) is written to arrow_output/<name>.arrow as an Arrow
+IPC file. Uncompressed snapshots are memory-mapped by load_snapshot(): the
+columns point straight into the page cache, so a process can start serving
+without parsing JSON, decoding Parquet or copying buffers. LZ4 snapshots are
+about half the size but are decompressed into memory on load.
+
+Usage:
+    python arrow_snapshots.py                      # export uncompressed snapshots
+    python arrow_snapshots.py --compression lz4
+    python arrow_snapshots.py --compare ../client/public/data/dashboard_data.json
+
+    from arrow_snapshots import load_snapshots
+    tables = load_snapshots()  # {name: pyarrow.Table}, memory-mapped
+"""
+
+import argparse
+import json
+import os
+import time
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from parquet_schemas import parquet_datasets
+
+PARQUET_DIR = Path(os.environ.get('PARQUET_OUTPUT_DIR', Path(__file__).parent.parent / "parquet_output"))
+ARROW_DIR = Path(os.environ.get('ARROW_OUTPUT_DIR', Path(__file__).parent.parent / "arrow_output"))
+COMPRESSIONS = ["none", "lz4"]
+BATCH_ROWS = 1_048_576  # rows per record batch in a snapshot
+
+
+def read_parquet_dataset(path):
+    if Path(path).is_dir():
+        return ds.dataset(path, format="parquet", partitioning="hive").to_table()
+    return pq.read_table(path)
+
+
+def write_snapshot(table, path, compression=None):
+    """Write a table as an Arrow IPC file"""
+    # The IPC file format allows one dictionary per column, so chunks must share it
+    table = table.unify_dictionaries().combine_chunks()
+    options = pa.ipc.IpcWriteOptions(compression=compression)
+    tmp_path = path.with_suffix(".tmp")
+    with pa.OSFile(str(tmp_path), "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema, options=options) as writer:
+            writer.write_table(table, max_chunksize=BATCH_ROWS)
+    os.replace(tmp_path, path)
+    return path
+
+
+def export_snapshots(parquet_dir=PARQUET_DIR, arrow_dir=ARROW_DIR, compression=None):
+    """Write every Parquet dataset as <arrow_dir>/<name>.arrow; returns {name: path}"""
+    arrow_dir = Path(arrow_dir)
+    arrow_dir.mkdir(parents=True, exist_ok=True)
+    paths = {}
+    for name, source in parquet_datasets(parquet_dir).items():
+        table = read_parquet_dataset(source)
+        paths[name] = write_snapshot(table, arrow_dir / f"{name}.arrow", compression)
+        print(f"✓ {name}: {table.num_rows} rows ({paths[name].stat().st_size / 1024:.2f} KB)")
+    return paths
+
+
+def load_snapshot(path):
+    """Memory-map one snapshot as an Arrow table (zero-copy unless it is compressed)"""
+    source = pa.memory_map(str(path), "r")
+    return pa.ipc.open_file(source).read_all()
+
+
+def load_snapshots(arrow_dir=ARROW_DIR):
+    """{name: Arrow table} for every snapshot in a directory"""
+    return {path.stem: load_snapshot(path) for path in sorted(Path(arrow_dir).glob("*.arrow"))}
+
+
+def best_time(func, repeats):
+    func()  # warm-up: the numbers compare decoding, not disk reads
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000
+
+
+def compare_load_times(json_path=None, parquet_dir=PARQUET_DIR, arrow_dir=ARROW_DIR, repeats=5):
+    """Time loading every dataset from JSON, Parquet and the Arrow snapshots"""
+    datasets = parquet_datasets(parquet_dir)
+    snapshots = sorted(Path(arrow_dir).glob("*.arrow"))
+    loaders = {
+        "parquet -> arrow": lambda: [read_parquet_dataset(path) for path in datasets.values()],
+        "parquet -> pandas": lambda: [read_parquet_dataset(path).to_pandas() for path in datasets.values()],
+        "arrow ipc (mmap)": lambda: [load_snapshot(path) for path in snapshots],
+        "arrow ipc -> pandas": lambda: [load_snapshot(path).to_pandas() for path in snapshots],
+    }
+    sizes = {
+        "parquet -> arrow": sum(f.stat().st_size for f in Path(parquet_dir).rglob("*.parquet")),
+        "arrow ipc (mmap)": sum(path.stat().st_size for path in snapshots),
+    }
+    sizes["parquet -> pandas"] = sizes["parquet -> arrow"]
+    sizes["arrow ipc -> pandas"] = sizes["arrow ipc (mmap)"]
+    if json_path is not None:
+        def load_json():
+            with open(json_path) as f:
+                return json.load(f)
+        loaders = {"json": load_json, **loaders}
+        sizes["json"] = Path(json_path).stat().st_size
+
+    results = {name: {"load_ms": round(best_time(loader, repeats), 3), "size_kb": round(sizes[name] / 1024, 2)}
+               for name, loader in loaders.items()}
+    print(f"\n📊 Load time of {len(datasets)} datasets (best of {repeats}):")
+    for name, result in results.items():
+        print(f"  {name:<20} {result['load_ms']:>10.2f} ms  {result['size_kb']:>10.2f} KB")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the Parquet outputs as memory-mappable Arrow IPC files")
+    parser.add_argument("--parquet-dir", default=str(PARQUET_DIR))
+    parser.add_argument("--output", default=str(ARROW_DIR), help="snapshot directory (default: %(default)s)")
+    parser.add_argument("--compression", choices=COMPRESSIONS, default="none",
+                        help="lz4 halves the size but gives up zero-copy loads (default: %(default)s)")
+    parser.add_argument("--compare", nargs="?", const="", metavar="JSON",
+                        help="after exporting, time loads from Parquet and Arrow (and JSON, if a file is given)")
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    paths = export_snapshots(args.parquet_dir, args.output, None if args.compression == "none" else args.compression)
+    print(f"✅ Wrote {len(paths)} Arrow snapshots to {args.output}")
+
+    if args.compare is not None:
+        results = compare_load_times(args.compare or None, args.parquet_dir, args.output, args.repeats)
+        with open(Path(args.output) / "load_times.json", "w") as f:
+            json.dump({"compression": args.compression, "repeats": args.repeats, "results": results}, f, indent=2)
@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""
+Benchmark the generate -> convert -> upload -> read pipeline
+
+Each stage runs as its own process, so its wall time and peak RSS are measured
+in isolation. Sharded stages fan out to worker processes, so with psutil
+installed peak_rss_mb is the largest summed RSS of the stage's whole process
+tree, sampled every RSS_SAMPLE_SECONDS. Without psutil it falls back to the
+peak of the largest single process in the tree (os.wait4's ru_maxrss, which
+on Linux folds in the reaped workers' peaks), and rss_scope records which one
+a result holds. max_process_rss_mb is always that single-process peak.
+Upload and read stages target a local Azurite emulator and are skipped when
+none is listening on 127.0.0.1:10000.
+
+Datasets up to STREAM_THRESHOLD rows go through the in-memory path
+(one dashboard JSON, convert_all_to_parquet). Larger ones use the streaming
+generator and converter.
+
+Results are written as JSON. The run fails when a stage fails. Given a
+baseline, every stage is compared with it and the run also fails when time or
+peak RSS regresses beyond the tolerance. The streaming generator always uses
+GENERATE_SHARDS shards: the generated data depends on the shard count, so
+machines with different core counts still benchmark the same dataset.
+
+Usage:
+    npx azurite-blob --location /tmp/azurite &
+    python benchmark_pipeline.py --sizes 1k,100k --baseline benchmark_baseline.json
+    python benchmark_pipeline.py --sizes 1k,100k,10M --save-baseline benchmark_baseline.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+try:
+    import psutil
+except ImportError:  # without it peak RSS covers only the stage's own process
+    psutil = None
+
+SCRIPTS_DIR = Path(__file__).parent
+GENERATOR = SCRIPTS_DIR.parent / "dashboard_data_generate.py"
+
+SIZES = {"1k": 1_000, "100k": 100_000, "10M": 10_000_000}
+STREAM_THRESHOLD = 1_000_000
+SEED = 42
+GENERATE_SHARDS = 8  # fixed so the dataset doesn't depend on the machine; workers still use every core
+TOLERANCE = 0.20  # allowed slowdown / memory growth against the baseline
+RSS_SAMPLE_SECONDS = 0.05
+
+AZURITE_HOST, AZURITE_PORT = "127.0.0.1", 10000
+AZURITE_CONNECTION_STRING = (
+    "DefaultEndpointsProtocol=http;AccountName=devstoreaccount1;"
+    "AccountKey=Eby8vdM02xNOcqFlqUwJPLlmEtlCDXJ1OUzFT50uSRZ6IFsuFq2UVErCz4I6tq/K1SZFPTOtr/KBHBeksoGMGw==;"
+    f"BlobEndpoint=http://{AZURITE_HOST}:{AZURITE_PORT}/devstoreaccount1;"
+)
+
+
+def parse_size(label):
+    """'100k' / '10M' / '2500' -> row count"""
+    if label in SIZES:
+        return SIZES[label]
+    multipliers = {"k": 1_000, "M": 1_000_000}
+    if label[-1] in multipliers:
+        return int(float(label[:-1]) * multipliers[label[-1]])
+    return int(label)
+
+
+def azurite_available():
+    try:
+        with socket.create_connection((AZURITE_HOST, AZURITE_PORT), timeout=1):
+            return True
+    except OSError:
+        return False
+
+
+def peak_rss_mb(usage):
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    return usage.ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def sample_tree_rss(pid, stop, peak):
+    """Record in peak["bytes"] the largest summed RSS of pid and its descendants until stop is set"""
+    try:
+        root = psutil.Process(pid)
+    except psutil.NoSuchProcess:
+        return
+    while True:
+        try:
+            processes = [root] + root.children(recursive=True)
+        except psutil.NoSuchProcess:
+            return
+        total = 0
+        for process in processes:
+            try:
+                total += process.memory_info().rss
+            except psutil.NoSuchProcess:  # a worker that exited between listing and sampling
+                pass
+        peak["bytes"] = max(peak["bytes"], total)
+        if stop.wait(RSS_SAMPLE_SECONDS):
+            return
+
+
+def directory_mb(path):
+    path = Path(path)
+    if path.is_file():
+        return path.stat().st_size / 1024 / 1024
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file()) / 1024 / 1024
+
+
+def run_stage(name, command, env, log_path):
+    """Run one stage in a child process; returns its timing and peak RSS"""
+    print(f"  ▶ {name}: {' '.join(str(part) for part in command[1:])}")
+    with open(log_path, "ab") as log:
+        log.write(f"\n=== {name} ===\n".encode())
+        log.flush()
+        started = time.perf_counter()
+        process = subprocess.Popen(command, env=env, stdout=log, stderr=subprocess.STDOUT)
+        tree_peak, stop = {"bytes": 0}, threading.Event()
+        sampler = None
+        if psutil is not None:
+            sampler = threading.Thread(target=sample_tree_rss, args=(process.pid, stop, tree_peak), daemon=True)
+            sampler.start()
+        _, status, usage = os.wait4(process.pid, 0)
+        seconds = time.perf_counter() - started
+        stop.set()
+        if sampler is not None:
+            sampler.join()
+    process.returncode = os.waitstatus_to_exitcode(status)
+    process_peak = peak_rss_mb(usage)
+    result = {
+        "stage": name,
+        "status": "ok" if process.returncode == 0 else "failed",
+        "seconds": round(seconds, 3),
+        # Sampling can miss a short spike, which wait4 always sees
+        "peak_rss_mb": round(max(tree_peak["bytes"] / 1024 / 1024, process_peak), 1),
+        "rss_scope": "process_tree" if psutil is not None else "largest_process",
+        "max_process_rss_mb": round(process_peak, 1),
+    }
+    if process.returncode != 0:
+        print(f"    ❌ exit code {process.returncode}, see {log_path}")
+    return result
+
+
+def benchmark_size(label, rows, work_dir, use_azurite):
+    """Run every stage for one dataset size"""
+    size_dir = Path(work_dir) / label
+    shutil.rmtree(size_dir, ignore_errors=True)
+    size_dir.mkdir(parents=True)
+    parquet_dir = size_dir / "parquet_output"
+    log_path = size_dir / "stages.log"
+    streaming = rows > STREAM_THRESHOLD
+
+    env = dict(os.environ)
+    env.update({
+        "PARQUET_OUTPUT_DIR": str(parquet_dir),
+        "AZURE_STORAGE_CONNECTION_STRING": AZURITE_CONNECTION_STRING,
+        "AZURE_STORAGE_ACCOUNT": "devstoreaccount1",
+        "AZURE_CONTAINER_NAME": f"benchmark-{label.lower()}",
+        "AZURE_BLOB_CACHE_DIR": str(size_dir / "blob_cache"),
+    })
+
+    python = sys.executable
+    if streaming:
+        source = size_dir / "dashboard_data_stream"
+        generate = [python, GENERATOR, "--engine", "numpy", "--seed", str(SEED), "--transactions", str(rows),
+                    "--stream", "--format", "ndjson", "--shards", str(GENERATE_SHARDS), "--output", source]
+        convert = [python, SCRIPTS_DIR / "convert-to-parquet.py", "--stream", "--input", source]
+    else:
+        source = size_dir / "dashboard_data.json"
+        generate = [python, GENERATOR, "--engine", "numpy", "--seed", str(SEED), "--transactions", str(rows),
+                    "--output", source]
+        convert = [python, SCRIPTS_DIR / "convert-to-parquet.py", "--input", source]
+
+    stages = [("generate", generate), ("convert", convert)]
+    if use_azurite:
+        stages += [
+            ("upload", [python, SCRIPTS_DIR / "upload-to-azure.py", "--azurite"]),
+            # first read fills the blob cache, the second one revalidates it
+            ("read", [python, SCRIPTS_DIR / "read-parquet-azure.py"]),
+            ("read_cached", [python, SCRIPTS_DIR / "read-parquet-azure.py"]),
+        ]
+
+    results = []
+    for name, command in stages:
+        result = run_stage(name, command, env, log_path)
+        result.update({"size": label, "rows": rows, "mode": "stream" if streaming else "memory"})
+        result["rows_per_second"] = round(rows / result["seconds"]) if result["seconds"] else None
+        if name == "generate" and source.exists():
+            result["output_mb"] = round(directory_mb(source), 2)
+        if name == "convert" and parquet_dir.exists():
+            result["output_mb"] = round(directory_mb(parquet_dir), 2)
+        results.append(result)
+        if "peak_rss_mb" in result:
+            print(f"    {result['seconds']:.2f}s, peak RSS {result['peak_rss_mb']:.0f} MB ({result['rss_scope']})")
+        if result["status"] != "ok":
+            break
+    for name, _ in stages[len(results):]:
+        results.append({"stage": name, "size": label, "rows": rows, "status": "skipped"})
+    if not use_azurite:
+        for name in ("upload", "read", "read_cached"):
+            results.append({"stage": name, "size": label, "rows": rows, "status": "skipped"})
+    return results
+
+
+def failed_stages(results):
+    """'<size> <stage>' of every stage that exited with an error"""
+    return [f"{r['size']} {r['stage']}" for r in results if r.get("status") == "failed"]
+
+
+def compare_to_baseline(results, baseline, tolerance=TOLERANCE):
+    """Regressions of this run against a baseline run, as printable strings"""
+    previous = {(r["size"], r["stage"]): r for r in baseline["results"] if r.get("status") == "ok"}
+    regressions = []
+    print(f"\n📊 Compared with baseline from {baseline.get('created_at', '?')} (tolerance {tolerance:.0%}):")
+    if baseline.get("generate_shards", GENERATE_SHARDS) != GENERATE_SHARDS:
+        regressions.append(f"baseline data was generated with {baseline['generate_shards']} shards, "
+                           f"this run uses {GENERATE_SHARDS}; the datasets differ")
+    for result in results:
+        before = previous.get((result["size"], result["stage"]))
+        if result.get("status") == "failed":
+            print(f"  {result['size']:>5} {result['stage']:<12} failed")
+            regressions.append(f"{result['size']} {result['stage']} failed")
+            continue
+        if result.get("status") != "ok" or before is None:
+            continue
+        line = f"  {result['size']:>5} {result['stage']:<12}"
+        # Peaks of different scopes are compared on the largest single process instead;
+        # baselines without rss_scope measured only that
+        same_scope = before.get("rss_scope", "largest_process") == result["rss_scope"]
+        rss_metric = "peak_rss_mb" if same_scope else "max_process_rss_mb"
+        baseline_values = {"seconds": before["seconds"], rss_metric: before.get(rss_metric, before["peak_rss_mb"])}
+        for metric, unit in (("seconds", "s"), (rss_metric, " MB")):
+            change = result[metric] / baseline_values[metric] - 1 if baseline_values[metric] else 0
+            line += (f" {metric} {baseline_values[metric]:.2f}{unit} -> {result[metric]:.2f}{unit}"
+                     f" ({change:+.0%})")
+            if change > tolerance:
+                regressions.append(f"{result['size']} {result['stage']} {metric} {change:+.0%}")
+        print(line)
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the generate/convert/upload/read pipeline")
+    parser.add_argument("--sizes", default="1k,100k",
+                        help="comma-separated dataset sizes, e.g. 1k,100k,10M (default: %(default)s)")
+    parser.add_argument("--work-dir", default=None, help="scratch directory (default: a temporary directory)")
+    parser.add_argument("--results", default="benchmark_results.json", help="where to write this run's results")
+    parser.add_argument("--baseline", default=None, help="baseline results to compare against")
+    parser.add_argument("--save-baseline", default=None, metavar="PATH", help="also write this run as a baseline")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE,
+                        help="allowed relative regression per metric (default: %(default)s)")
+    parser.add_argument("--keep", action="store_true", help="keep the generated data in --work-dir")
+    args = parser.parse_args()
+
+    work_dir = Path(args.work_dir or tempfile.mkdtemp(prefix="dashboard-bench-"))
+    use_azurite = azurite_available()
+    if not use_azurite:
+        print(f"⚠️  Azurite is not listening on {AZURITE_HOST}:{AZURITE_PORT}; upload and read stages are skipped")
+
+    results = []
+    for label in args.sizes.split(","):
+        rows = parse_size(label)
+        print(f"\n🏁 {label} rows ({rows:,})")
+        results.extend(benchmark_size(label, rows, work_dir, use_azurite))
+        if not args.keep:
+            shutil.rmtree(work_dir / label, ignore_errors=True)
+
+    report = {
+        "created_at": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "generate_shards": GENERATE_SHARDS,
+        "azurite": use_azurite,
+        "results": results,
+    }
+    failures = failed_stages(results)
+    if failures and args.save_baseline:
+        print(f"⚠️  Not saving {args.save_baseline}: a run with failed stages is no baseline")
+    for path in filter(None, [args.results, None if failures else args.save_baseline]):
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+    print(f"\n✅ Results written to {args.results}")
+
+    if not args.keep and args.work_dir is None:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare_to_baseline(results, json.load(f), args.tolerance)
+        if regressions:
+            print("\n❌ Regressions:")
+            for regression in regressions:
+                print(f"  - {regression}")
+        else:
+            print("\n✅ No regressions")
+    if failures:
+        print("\n❌ Failed stages:")
+        for failure in failures:
+            print(f"  - {failure}")
+    if failures or regressions:
+        sys.exit(1)
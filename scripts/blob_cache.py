@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Local on-disk cache for Parquet blobs read from Azure Blob Storage
+
+The cache works at byte-range granularity, below the range reader in
+read-parquet-azure.py: pyarrow still asks only for the footer and the column
+chunks a query needs, and each range is downloaded once and then served from
+disk. Every blob is stored as a sparse local file keyed by blob name and
+ETag, together with the list of byte ranges already fetched into it. The
+reader revalidates the ETag when it opens a blob (the properties request it
+needs for the blob size anyway). A changed blob starts a new file, and ranges
+are fetched with an If-Match condition, so a blob that changes mid-read fails
+instead of mixing versions. Blobs whose every byte is cached are
+memory-mapped. The least recently used files are evicted once the cached
+bytes exceed the budget.
+
+Several processes can share a cache directory. Every index update re-reads
+index.json and rewrites it while holding an exclusive lock on index.lock, so
+processes see each other's entries and evict from the same total.
+
+Configuration:
+    AZURE_BLOB_CACHE_DIR  cache directory (default: ~/.cache/dashboard-parquet)
+    AZURE_BLOB_CACHE_MB   size budget in MB, 0 disables the cache (default: 1024)
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # no flock on Windows: the index is then only safe within one process
+    fcntl = None
+
+from instrumentation import count
+
+CACHE_DIR = Path(os.environ.get('AZURE_BLOB_CACHE_DIR', Path.home() / ".cache" / "dashboard-parquet"))
+CACHE_BUDGET_MB = int(os.environ.get('AZURE_BLOB_CACHE_MB', 1024))
+
+
+def missing_ranges(ranges, start, end):
+    """Parts of [start, end) not covered by sorted, non-overlapping [start, end) ranges"""
+    gaps = []
+    for cached_start, cached_end in ranges:
+        if cached_end <= start:
+            continue
+        if cached_start >= end:
+            break
+        if cached_start > start:
+            gaps.append([start, cached_start])
+        start = max(start, cached_end)
+    if start < end:
+        gaps.append([start, end])
+    return gaps
+
+
+def merge_ranges(ranges):
+    """Sorted ranges with overlapping and adjacent ones joined"""
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+class BlobCache:
+    """Byte ranges of blobs on local disk, keyed by blob name and ETag and evicted by LRU"""
+
+    def __init__(self, cache_dir=CACHE_DIR, budget_mb=CACHE_BUDGET_MB):
+        self.cache_dir = Path(cache_dir)
+        self.budget = budget_mb * 1024 * 1024
+        self.index_path = self.cache_dir / "index.json"
+        self.lock_path = self.cache_dir / "index.lock"
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bytes_downloaded = 0
+        self.index = {}
+        with self._locked():
+            self._remove_orphans()
+
+    @contextmanager
+    def _locked(self):
+        """Hold the index for this thread and, where flock exists, for this process; reloads self.index"""
+        with self.lock:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            with open(self.lock_path, "a") as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)  # released when the file is closed
+                self.index = self._load_index()
+                yield self.index
+
+    def _load_index(self):
+        try:
+            with open(self.index_path) as f:
+                index = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+        index = {name: entry for name, entry in index.items() if (self.cache_dir / entry["file"]).exists()}
+        for entry in index.values():
+            # Entries of the whole-blob cache hold every byte
+            entry.setdefault("blob_size", entry["size"])
+            entry.setdefault("ranges", [[0, entry["size"]]] if entry["size"] else [])
+        return index
+
+    def _remove_orphans(self):
+        """Delete blob files no index entry refers to, which the budget would never count"""
+        referenced = {entry["file"] for entry in self.index.values()}
+        for path in self.cache_dir.glob("*.parquet"):
+            if path.name not in referenced:
+                path.unlink(missing_ok=True)
+
+    def _save_index(self):
+        tmp_path = self.index_path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(self.index, f, indent=2)
+        os.replace(tmp_path, self.index_path)
+
+    def _evict(self, keep):
+        """Drop least recently used files until the cache fits its budget"""
+        total = sum(entry["size"] for entry in self.index.values())
+        for name, entry in sorted(self.index.items(), key=lambda item: item[1]["last_used"]):
+            if total <= self.budget:
+                break
+            if name == keep:
+                continue
+            (self.cache_dir / entry["file"]).unlink(missing_ok=True)
+            del self.index[name]
+            total -= entry["size"]
+            self.evictions += 1
+
+    def open(self, name, etag, blob_size):
+        """Start reading a blob at its current ETag; drops the copy of an older version"""
+        with self._locked():
+            entry = self.index.get(name)
+            if entry is not None and entry["etag"] != etag:
+                (self.cache_dir / entry["file"]).unlink(missing_ok=True)
+                entry = None
+            if entry is None:
+                file_name = hashlib.sha256(f"{name}\0{etag}".encode()).hexdigest() + ".parquet"
+                with open(self.cache_dir / file_name, "wb") as f:
+                    f.truncate(blob_size)  # sparse: only fetched ranges take disk space
+                entry = self.index[name] = {"etag": etag, "file": file_name, "size": 0, "blob_size": blob_size,
+                                            "ranges": [], "last_used": time.time()}
+            entry["last_used"] = time.time()
+            self._save_index()
+
+    def complete_path(self, name):
+        """Local file of a blob whose every byte is cached, else None"""
+        with self._locked():
+            entry = self.index.get(name)
+            if entry is None or missing_ranges(entry["ranges"], 0, entry["blob_size"]):
+                return None
+            return self.cache_dir / entry["file"]
+
+    def read(self, name, offset, length, fetch):
+        """Bytes [offset, offset + length) of an opened blob; fetch(offset, length) downloads what is missing"""
+        with self._locked():
+            entry = self.index.get(name)
+            gaps = missing_ranges(entry["ranges"], offset, offset + length) if entry is not None else None
+        if entry is None:  # evicted by another reader since open()
+            return fetch(offset, length)
+
+        path = self.cache_dir / entry["file"]
+        downloaded = 0
+        try:
+            if gaps:
+                with open(path, "r+b") as f:
+                    for start, end in gaps:
+                        f.seek(start)
+                        f.write(fetch(start, end - start))
+                        downloaded += end - start
+            with open(path, "rb") as f:
+                f.seek(offset)
+                data = f.read(length)
+        except FileNotFoundError:  # evicted by another reader mid-read
+            return fetch(offset, length)
+
+        with self._locked():
+            # Other readers may have added ranges or replaced the file since the lookup above
+            current = self.index.get(name)
+            if current is not None and current["file"] == entry["file"]:
+                if downloaded:
+                    current["ranges"] = merge_ranges(current["ranges"] + gaps)
+                    current["size"] = sum(end - start for start, end in current["ranges"])
+                    self._evict(keep=name)
+                current["last_used"] = time.time()
+                self._save_index()
+            if downloaded:
+                self.misses += 1
+                self.bytes_downloaded += downloaded
+            else:
+                self.hits += 1
+        if downloaded:
+            count("cache_misses")
+            count("bytes_downloaded", downloaded)
+        else:
+            count("cache_hits")
+        return data
+
+    def stats(self):
+        """Hit/miss counters (per range read) and current cache size"""
+        with self._locked():
+            requests = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / requests if requests else 0,
+                "evictions": self.evictions,
+                "bytes_downloaded": self.bytes_downloaded,
+                "cached_files": len(self.index),
+                "cached_mb": sum(entry["size"] for entry in self.index.values()) / 1024 / 1024
+            }
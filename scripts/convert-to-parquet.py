@@ -4,27 +4,255 @@ Convert dashboard JSON data to Parquet format for Azure Blob Storage
 Parquet provides columnar storage with excellent compression
 """
 
+import argparse
 import json
 import pandas as pd
 import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
 import pyarrow.parquet as pq
 from datetime import datetime
 import os
+import shutil
 from pathlib import Path
+import time
+from urllib.parse import quote
+
+from dashboard_rollups import ROLLUPS, RollupBuilder, build_rollups_from_parquet, write_rollups
+from sketches import SKETCHES, SketchBuilder, build_sketches_from_parquet, write_sketches
+from time_series import SOURCE_ROLLUPS, build_time_series, write_time_series
+from instrumentation import count, span, traced
+from parquet_schemas import SCHEMA_VERSION, apply_schema, cast_column, get_schema
+
+try:
+    import ijson
+except ImportError:  # only needed to stream a single large JSON file (--stream)
+    ijson = None
 
 # Configuration
 DATA_DIR = Path(__file__).parent.parent / "client" / "public" / "data"
-OUTPUT_DIR = Path(__file__).parent.parent / "parquet_output"
-OUTPUT_DIR.mkdir(exist_ok=True)
+OUTPUT_DIR = Path(os.environ.get('PARQUET_OUTPUT_DIR', Path(__file__).parent.parent / "parquet_output"))
+OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+BATCH_SIZE = 65_536  # rows per Parquet row group in streaming mode
+ROW_GROUP_SIZE = 65_536  # max rows per row group in partitioned files
+PARTITIONED_SECTION = "transaction_trends"
+DERIVED_DIRS = ["rollups", "sketches", "time_series"]  # computed from the converted transactions
+BLOOM_FILTER_COLUMNS = ["brand", "consumer_id"]
+WATERMARK_COLUMNS = ["transaction_id", "date"]
+COMPACT_MAX_FILES = int(os.environ.get('PARQUET_COMPACT_MAX_FILES', 8))  # part files per partition before compaction
+
+# Output file name -> location of its rows in the dashboard JSON
+SECTION_SOURCES = {
+    "transaction_trends": "transaction_trends",
+    "brand_trends": "brand_trends",
+    "consumer_profiles": "consumer_profiles",
+    "hourly_patterns": "time_patterns.hourly_patterns",
+    "demand_forecast": "time_patterns.demand_forecast",
+    "product_mix": "product_mix",
+    "basket_analysis": "basket_analysis",
+    "ai_insights": "ai_insights",
+    "substitution_patterns": "substitution_patterns",
+    "brand_associations": "brand_associations",
+    "location_data": "location_data",
+    "sku_data": "sku_data",
+}
 
 def load_json_data(filepath):
     """Load JSON data from file"""
+    count("bytes_read", os.path.getsize(filepath))
     with open(filepath, 'r') as f:
         return json.load(f)
 
-def convert_transactions_to_parquet(data):
-    """Convert transaction trends to Parquet"""
+def section_table(df, section):
+    """Arrow table for a DataFrame, cast to the section's registry schema"""
+    # pandas metadata would describe the pre-cast dtypes, so drop it
+    table = pa.Table.from_pandas(df, preserve_index=False).replace_schema_metadata(None)
+    return apply_schema(table, section)
+
+def write_section_parquet(df, output_path, section):
+    """Write a DataFrame to Parquet using the section's registry schema"""
+    pq.write_table(section_table(df, section), output_path, compression='snappy')
+    count("rows", len(df))
+    count("bytes_written", output_path.stat().st_size)
+
+# --- Partitioned dataset layout ---
+# transaction_trends can be written as a Hive-partitioned dataset,
+#   transaction_trends/month=YYYY-MM/store_location=<region>/part-NNNNN.parquet
+# with rows sorted by brand inside each file, so readers prune whole files by
+# path and row groups by their min/max statistics (and optional bloom filters).
+# The partition key is "month" because "date" is already a day-level column.
+
+def path_size(path):
+    """Size in bytes of a file, or of every Parquet file under a dataset directory"""
+    if path.is_dir():
+        return sum(f.stat().st_size for f in path.rglob("*.parquet"))
+    return path.stat().st_size
+
+def reset_dataset_dir(dataset_dir):
+    if dataset_dir.exists():
+        shutil.rmtree(dataset_dir)
+    flat_file = dataset_dir.with_suffix(".parquet")
+    if flat_file.exists():
+        flat_file.unlink()
+
+def partition_dir(month, region):
+    """Hive partition path; values are URI-encoded, which pyarrow decodes on read"""
+    month = month if month is not None else "__HIVE_DEFAULT_PARTITION__"
+    region = quote(region, safe='') if region is not None else "__HIVE_DEFAULT_PARTITION__"
+    return Path(f"month={month}") / f"store_location={region}"
+
+def plain_column(column):
+    if pa.types.is_dictionary(column.type):
+        return column.cast(column.type.value_type)
+    return column
+
+def write_partition_file(data, path, bloom_filters=False, row_group_size=ROW_GROUP_SIZE):
+    """Write one partition file, sorted by brand, with statistics and a page index"""
+    data = data.take(pc.sort_indices(plain_column(data.column("brand"))))
+    sorting = [pq.SortingColumn(data.schema.get_field_index("brand"))]
+    options = {}
+    if bloom_filters:
+        options["bloom_filter_options"] = {
+            name: {"ndv": max(data.num_rows, 1), "fpp": 0.05}
+            for name in BLOOM_FILTER_COLUMNS if name in data.column_names
+        }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        pq.write_table(data, path, compression='snappy', row_group_size=row_group_size,
+                       write_statistics=True, write_page_index=True, sorting_columns=sorting, **options)
+    except TypeError:
+        if bloom_filters:
+            raise RuntimeError("--bloom-filters needs a pyarrow version with Parquet bloom filter support")
+        raise
+    count("bytes_written", path.stat().st_size)
+
+def write_partitioned(table, dataset_dir, part=0, bloom_filters=False, row_group_size=ROW_GROUP_SIZE):
+    """Write rows into the month/store_location dataset, sorted by brand within each file"""
+    dates = table.column("date")
+    if not pa.types.is_timestamp(dates.type):
+        dates = dates.cast(pa.timestamp("s"))
+    keys = pa.table({
+        "month": pc.strftime(dates, format="%Y-%m"),
+        "region": plain_column(table.column("store_location")),
+        "row": pa.array(range(table.num_rows), type=pa.int64())
+    })
+    data = table.drop_columns(["store_location"])  # restored from the path on read
+
+    files = 0
+    for group in keys.group_by(["month", "region"]).aggregate([("row", "list")]).to_pylist():
+        rows = pa.array(group["row_list"], type=pa.int64())
+        path = dataset_dir / partition_dir(group["month"], group["region"]) / f"part-{part:05d}.parquet"
+        write_partition_file(data.take(rows), path, bloom_filters, row_group_size)
+        files += 1
+    count("rows", table.num_rows)
+    return files
+
+# --- Incremental conversion ---
+# A run records the high-water mark of transaction_trends (max transaction_id
+# or date) in conversion_metadata.json. With --incremental, only rows past it
+# are converted, as new part files in the partitioned dataset, and the rollups
+# and sketches are updated by folding the new rows into the previous ones (the time
+# series are then recomputed from the updated rollups). The other
+# sections are small snapshots and are rewritten every run. Daily appends leave
+# small files behind, so partitions holding more than COMPACT_MAX_FILES part
+# files are rewritten as one file with full-size row groups.
+
+def watermark_key(column, value):
+    """Comparable form of a watermark value; ids compare by length first (TRX1000000 > TRX999999)"""
+    if column == "date":
+        return str(value)[:10]  # date, datetime or ISO string
+    value = str(value)
+    return (len(value), value)
+
+def after_watermark(row, watermark):
+    """Whether a JSON row is newer than the watermark"""
+    value = row.get(watermark["column"])
+    return value is not None and watermark_key(watermark["column"], value) > watermark_key(
+        watermark["column"], watermark["value"])
+
+def table_watermark(table, column, previous=None):
+    """Watermark covering an Arrow table of transactions and an earlier watermark
+
+    Tables without the watermark column (e.g. transactions without ids) leave
+    the earlier watermark as it was.
+    """
+    if column not in table.column_names:
+        return previous
+    values = plain_column(table.column(column))
+    if column == "transaction_id":
+        lengths = pc.utf8_length(values)
+        values = values.filter(pc.equal(lengths, pc.max(lengths)))
+    latest = pc.max(values).as_py()
+    if latest is None:
+        return previous
+    latest = {"column": column, "value": str(latest)}
+    if previous is not None and watermark_key(column, previous["value"]) >= watermark_key(column, latest["value"]):
+        return previous
+    return latest
+
+def load_watermark():
+    """Watermark of the previous run, if its partitioned transaction dataset is still there"""
+    try:
+        with open(OUTPUT_DIR / "conversion_metadata.json") as f:
+            watermark = json.load(f).get("watermark")
+    except (FileNotFoundError, ValueError):
+        return None
+    if watermark is None or not (OUTPUT_DIR / PARTITIONED_SECTION).is_dir():
+        return None
+    return watermark
+
+def previous_rollups():
+    """RollupBuilder holding the rollups written so far (rebuilt from the dataset if they are missing)"""
+    rollup_dir = OUTPUT_DIR / "rollups"
+    paths = {name: rollup_dir / f"{name}.parquet" for name in ROLLUPS}
+    # A rollup the dataset has columns for but that was never written (added after the
+    # last run) has to be rebuilt, or it would only ever cover the new rows
+    columns = set(ds.dataset(OUTPUT_DIR / PARTITIONED_SECTION, format="parquet", partitioning="hive").schema.names)
+    if all(path.exists() for name, path in paths.items() if set(ROLLUPS[name]) <= columns):
+        return RollupBuilder().merge({name: pq.read_table(path) for name, path in paths.items() if path.exists()})
+    return RollupBuilder().merge(build_rollups_from_parquet(OUTPUT_DIR / PARTITIONED_SECTION))
+
+def previous_sketches():
+    """SketchBuilder holding the sketches written so far (rebuilt from the dataset if they are missing)"""
+    sketch_dir = OUTPUT_DIR / "sketches"
+    paths = {name: sketch_dir / f"{name}.parquet" for name in SKETCHES}
+    if any(path.exists() for path in paths.values()):
+        return SketchBuilder().merge({name: pq.read_table(path) for name, path in paths.items() if path.exists()})
+    return SketchBuilder().merge(build_sketches_from_parquet(OUTPUT_DIR / PARTITIONED_SECTION))
+
+def next_part_number(dataset_dir):
+    parts = [int(p.stem.removeprefix("part-")) for p in dataset_dir.rglob("part-*.parquet")]
+    return max(parts, default=-1) + 1
+
+@traced()
+def compact_partitions(dataset_dir, max_files=COMPACT_MAX_FILES, bloom_filters=False):
+    """Rewrite every partition holding more than max_files part files as a single file"""
+    part = next_part_number(dataset_dir)
+    compacted = 0
+    for directory in sorted({p.parent for p in dataset_dir.rglob("part-*.parquet")}):
+        files = sorted(directory.glob("part-*.parquet"))
+        if len(files) <= max_files:
+            continue
+        # ParquetFile skips the Hive path keys, which the rewritten file gets from its path again
+        table = pa.concat_tables([pq.ParquetFile(f).read() for f in files])
+        write_partition_file(table, directory / f"part-{part:05d}.parquet", bloom_filters)
+        for f in files:
+            f.unlink()
+        compacted += 1
+        print(f"  Compacted {len(files)} files ({table.num_rows} rows) in {directory.relative_to(dataset_dir)}")
+    return compacted
+
+@traced()
+def convert_transactions_to_parquet(data, partitioned=False, bloom_filters=False, watermark=None):
+    """Convert transaction trends to Parquet
+
+    Given a watermark, only the newer rows are converted and appended to the
+    partitioned dataset.
+    """
     transactions = data.get('transaction_trends', [])
+    if watermark is not None:
+        transactions = [row for row in transactions if after_watermark(row, watermark)]
+        print(f"✓ {len(transactions)} transactions past {watermark['column']} {watermark['value']}")
     
     if transactions:
         df = pd.DataFrame(transactions)
@@ -40,16 +268,32 @@ def convert_transactions_to_parquet(data):
                 df[col] = pd.to_numeric(df[col], errors='coerce')
         
         # Save to Parquet
-        output_path = OUTPUT_DIR / "transaction_trends.parquet"
-        df.to_parquet(output_path, engine='pyarrow', compression='snappy')
+        if watermark is not None:
+            output_path = OUTPUT_DIR / "transaction_trends"
+            files = write_partitioned(section_table(df, "transaction_trends"), output_path,
+                                      next_part_number(output_path), bloom_filters)
+        elif partitioned:
+            output_path = OUTPUT_DIR / "transaction_trends"
+            reset_dataset_dir(output_path)
+            files = write_partitioned(section_table(df, "transaction_trends"), output_path,
+                                      bloom_filters=bloom_filters)
+        else:
+            output_path = OUTPUT_DIR / "transaction_trends.parquet"
+            write_section_parquet(df, output_path, "transaction_trends")
         
         print(f"✓ Converted {len(df)} transaction records")
-        print(f"  Original size: {get_json_size(transactions)} KB")
-        print(f"  Parquet size: {output_path.stat().st_size / 1024:.2f} KB")
-        print(f"  Compression ratio: {get_compression_ratio(transactions, output_path):.1f}x")
+        if partitioned or watermark is not None:
+            print(f"  Partitioned into {files} files by month/store_location")
+        if watermark is not None:
+            print(f"  Dataset size: {path_size(output_path) / 1024:.2f} KB")
+        else:
+            print(f"  Original size: {get_json_size(transactions)} KB")
+            print(f"  Parquet size: {path_size(output_path) / 1024:.2f} KB")
+            print(f"  Compression ratio: {get_compression_ratio(transactions, output_path):.1f}x")
         
         return df
 
+@traced()
 def convert_brands_to_parquet(data):
     """Convert brand trends to Parquet"""
     brands = data.get('brand_trends', [])
@@ -64,13 +308,14 @@ def convert_brands_to_parquet(data):
                 df[col] = pd.to_numeric(df[col], errors='coerce')
         
         output_path = OUTPUT_DIR / "brand_trends.parquet"
-        df.to_parquet(output_path, engine='pyarrow', compression='snappy')
+        write_section_parquet(df, output_path, "brand_trends")
         
         print(f"✓ Converted {len(df)} brand records")
         print(f"  Compression ratio: {get_compression_ratio(brands, output_path):.1f}x")
         
         return df
 
+@traced()
 def convert_consumer_profiles_to_parquet(data):
     """Convert consumer profiles to Parquet"""
     profiles = data.get('consumer_profiles', [])
@@ -85,13 +330,14 @@ def convert_consumer_profiles_to_parquet(data):
                 df[col] = pd.to_datetime(df[col])
         
         output_path = OUTPUT_DIR / "consumer_profiles.parquet"
-        df.to_parquet(output_path, engine='pyarrow', compression='snappy')
+        write_section_parquet(df, output_path, "consumer_profiles")
         
         print(f"✓ Converted {len(df)} consumer profiles")
         print(f"  Compression ratio: {get_compression_ratio(profiles, output_path):.1f}x")
         
         return df
 
+@traced()
 def convert_time_patterns_to_parquet(data):
     """Convert time patterns to Parquet"""
     time_patterns = data.get('time_patterns', {})
@@ -101,7 +347,7 @@ def convert_time_patterns_to_parquet(data):
     if hourly:
         df = pd.DataFrame(hourly)
         output_path = OUTPUT_DIR / "hourly_patterns.parquet"
-        df.to_parquet(output_path, engine='pyarrow', compression='snappy')
+        write_section_parquet(df, output_path, "hourly_patterns")
         print(f"✓ Converted {len(df)} hourly pattern records")
     
     # Demand forecast
@@ -111,32 +357,270 @@ def convert_time_patterns_to_parquet(data):
         if 'date' in df.columns:
             df['date'] = pd.to_datetime(df['date'])
         output_path = OUTPUT_DIR / "demand_forecast.parquet"
-        df.to_parquet(output_path, engine='pyarrow', compression='snappy')
+        write_section_parquet(df, output_path, "demand_forecast")
         print(f"✓ Converted {len(df)} forecast records")
 
-def convert_all_to_parquet(json_filepath):
-    """Convert all data sections to Parquet format"""
+@traced()
+def convert_rollups_to_parquet(rollups):
+    """Write the pre-aggregated rollups next to the raw Parquet; returns the rollup tables"""
+    tables = rollups.result()
+    paths = write_rollups(tables, OUTPUT_DIR / "rollups")
+    for name, path in paths.items():
+        count("rows", pq.read_metadata(path).num_rows)
+        count("bytes_written", path.stat().st_size)
+        print(f"✓ Materialized {pq.read_metadata(path).num_rows} {name} rollup rows")
+        print(f"  Parquet size: {path.stat().st_size / 1024:.2f} KB")
+    return tables
+
+@traced()
+def convert_sketches_to_parquet(sketches):
+    """Write the mergeable consumer/value sketches next to the raw Parquet"""
+    sketch_dir = OUTPUT_DIR / "sketches"
+    # Drop tables written under earlier names so they don't show up as datasets
+    for path in sketch_dir.glob("*.parquet"):
+        if path.stem not in SKETCHES:
+            path.unlink()
+    paths = write_sketches(sketches.result(), sketch_dir)
+    for name, path in paths.items():
+        count("rows", pq.read_metadata(path).num_rows)
+        count("bytes_written", path.stat().st_size)
+        print(f"✓ Materialized {pq.read_metadata(path).num_rows} {name} sketch rows")
+        print(f"  Parquet size: {path.stat().st_size / 1024:.2f} KB")
+
+@traced()
+def convert_time_series_to_parquet(rollup_tables):
+    """Write the rolling daily/hourly series and forecasts built from the hourly rollups"""
+    tables = build_time_series({name: rollup_tables[name] for name in SOURCE_ROLLUPS if name in rollup_tables})
+    if not tables:
+        print("ℹ️  No hourly rollups (transactions lack date/hour columns); skipping time series")
+        return
+    paths = write_time_series(tables, OUTPUT_DIR / "time_series")
+    for name, path in paths.items():
+        count("rows", tables[name].num_rows)
+        count("bytes_written", path.stat().st_size)
+        print(f"✓ Materialized {tables[name].num_rows} {name} time series rows")
+        print(f"  Parquet size: {path.stat().st_size / 1024:.2f} KB")
+
+@traced()
+def convert_all_to_parquet(json_filepath, partitioned=False, bloom_filters=False,
+                           watermark=None, watermark_column="transaction_id"):
+    """Convert all data sections to Parquet format
+
+    Returns the transaction watermark to record for the next incremental run.
+    """
     print(f"Loading data from {json_filepath}...")
     data = load_json_data(json_filepath)
     
     print("\nConverting to Parquet format...")
     
     # Convert each data section
-    convert_transactions_to_parquet(data)
+    rollups = previous_rollups() if watermark is not None else RollupBuilder()
+    sketches = previous_sketches() if watermark is not None else SketchBuilder()
+    transactions = convert_transactions_to_parquet(data, partitioned, bloom_filters, watermark)
+    if transactions is not None:
+        table = section_table(transactions, "transaction_trends")
+        convert_time_series_to_parquet(convert_rollups_to_parquet(rollups.add(table)))
+        convert_sketches_to_parquet(sketches.add(table))
+        watermark = table_watermark(table, watermark["column"] if watermark else watermark_column, watermark)
     convert_brands_to_parquet(data)
     convert_consumer_profiles_to_parquet(data)
     convert_time_patterns_to_parquet(data)
     
     # Convert other sections if they exist
     other_sections = ['product_mix', 'basket_analysis', 'ai_insights', 
-                     'substitution_patterns', 'location_data', 'sku_data']
+                     'substitution_patterns', 'brand_associations', 'location_data', 'sku_data']
     
     for section in other_sections:
         if section in data and data[section]:
-            df = pd.DataFrame(data[section])
-            output_path = OUTPUT_DIR / f"{section}.parquet"
-            df.to_parquet(output_path, engine='pyarrow', compression='snappy')
+            with span("convert_section", section=section):
+                df = pd.DataFrame(data[section])
+                output_path = OUTPUT_DIR / f"{section}.parquet"
+                write_section_parquet(df, output_path, section)
             print(f"✓ Converted {len(df)} {section} records")
+    
+    return watermark
+
+# --- Streaming conversion ---
+# Rows are parsed incrementally and flushed to a ParquetWriter one row group at
+# a time, so peak memory is bounded by BATCH_SIZE rather than the input size.
+
+def coerce_column(values, arrow_type):
+    """Build an Arrow array of the given type, coercing like the pandas path does"""
+    try:
+        return pa.array(values, type=arrow_type)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        pass
+    try:
+        # e.g. ISO date strings -> date32, numeric strings -> float
+        return cast_column(pa.array(values), arrow_type)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+        if not (pa.types.is_floating(arrow_type) or pa.types.is_integer(arrow_type)):
+            raise
+    # Same as pd.to_numeric(errors='coerce'): unparseable values become null
+    numbers = []
+    for value in values:
+        try:
+            numbers.append(float(value) if value is not None else None)
+        except (TypeError, ValueError):
+            numbers.append(None)
+    return pa.array(numbers, type=pa.float64()).cast(arrow_type, safe=False)
+
+def resolve_schema(rows, known_schema=None):
+    """Schema for a section: known types for listed columns, inferred for the rest"""
+    names = list(dict.fromkeys(name for row in rows for name in row))
+    fields = []
+    for name in names:
+        if known_schema is not None and known_schema.get_field_index(name) != -1:
+            fields.append(known_schema.field(name))
+        else:
+            inferred = pa.array([row.get(name) for row in rows]).type
+            fields.append(pa.field(name, pa.string() if pa.types.is_null(inferred) else inferred))
+    return pa.schema(fields)
+
+class ParquetSectionWriter:
+    """Buffer rows for one section and write them as Parquet row groups"""
+
+    def __init__(self, output_path, known_schema=None, batch_size=BATCH_SIZE,
+                 partitioned=False, bloom_filters=False, on_batch=None, row_filter=None, append=False):
+        self.output_path = output_path
+        self.known_schema = known_schema
+        self.batch_size = batch_size
+        self.partitioned = partitioned  # output_path is then a dataset directory
+        self.bloom_filters = bloom_filters
+        self.on_batch = on_batch  # called with each written Arrow table
+        self.row_filter = row_filter  # rows it rejects are skipped
+        self.append = append  # add part files to an existing partitioned dataset
+        self.parts = next_part_number(output_path) if append else 0
+        self.schema = None
+        self.writer = None
+        self.rows = []
+        self.count = 0
+
+    def write(self, row):
+        if self.row_filter is not None and not self.row_filter(row):
+            return
+        self.rows.append(row)
+        if len(self.rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.rows:
+            return
+        if self.schema is None:
+            self.schema = resolve_schema(self.rows, self.known_schema)
+            if self.partitioned:
+                if not self.append:
+                    reset_dataset_dir(self.output_path)
+            else:
+                self.writer = pq.ParquetWriter(self.output_path, self.schema, compression='snappy')
+        columns = [coerce_column([row.get(f.name) for row in self.rows], f.type) for f in self.schema]
+        table = pa.Table.from_batches([pa.RecordBatch.from_arrays(columns, schema=self.schema)])
+        if self.partitioned:
+            # each batch lands as its own part file in every partition it touches
+            write_partitioned(table, self.output_path, self.parts, self.bloom_filters)
+            self.parts += 1
+        else:
+            self.writer.write_table(table, row_group_size=len(self.rows))
+            count("rows", len(self.rows))  # write_partitioned counts its own
+        if self.on_batch is not None:
+            self.on_batch(table)
+        self.count += len(self.rows)
+        self.rows = []
+
+    def close(self):
+        self.flush()
+        if self.writer is not None:
+            self.writer.close()
+            count("bytes_written", self.output_path.stat().st_size)
+        return self.count
+
+def iter_array_items(f, item_prefixes):
+    """Yield (prefix, item) for every element of the given JSON arrays in one parse"""
+    if ijson is None:
+        raise RuntimeError("ijson is required to stream JSON input (pip install -r requirements.txt)")
+    current = None
+    builder = None
+    for prefix, event, value in ijson.parse(f, use_float=True):
+        if current is None:
+            if prefix in item_prefixes:
+                if event in ('start_map', 'start_array'):
+                    current = prefix
+                    builder = ijson.ObjectBuilder()
+                    builder.event(event, value)
+                elif event not in ('end_map', 'end_array', 'map_key'):
+                    yield prefix, value
+        else:
+            builder.event(event, value)
+            if prefix == current and event in ('end_map', 'end_array'):
+                yield current, builder.value
+                current = None
+
+def iter_ndjson(filepath):
+    with open(filepath, 'r') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+@traced()
+def convert_all_to_parquet_streaming(input_path, batch_size=BATCH_SIZE, partitioned=False, bloom_filters=False,
+                                     watermark=None, watermark_column="transaction_id"):
+    """Convert all sections without loading the input into memory
+
+    input_path is either a dashboard JSON file (parsed incrementally) or a
+    directory of <section>.ndjson files such as dashboard_data_generate.py
+    --stream writes. Given a watermark, only newer transactions are appended.
+    Returns the transaction watermark to record for the next incremental run.
+    """
+    input_path = Path(input_path)
+    count("bytes_read", sum(f.stat().st_size for f in input_path.glob("*.ndjson"))
+          if input_path.is_dir() else input_path.stat().st_size)
+    print(f"Streaming data from {input_path}...")
+    print("\nConverting to Parquet format (streaming)...")
+
+    writers = {}
+    rollups = previous_rollups() if watermark is not None else RollupBuilder()
+    sketches = previous_sketches() if watermark is not None else SketchBuilder()
+    column = watermark["column"] if watermark else watermark_column
+    latest = watermark
+    def on_transactions(table):
+        nonlocal latest
+        rollups.add(table)
+        sketches.add(table)
+        latest = table_watermark(table, column, latest)
+    def writer_for(section):
+        if section not in writers:
+            if section == PARTITIONED_SECTION:
+                incremental = watermark is not None
+                output_path = OUTPUT_DIR / section if partitioned or incremental else OUTPUT_DIR / f"{section}.parquet"
+                writers[section] = ParquetSectionWriter(
+                    output_path, get_schema(section), batch_size, partitioned or incremental, bloom_filters,
+                    on_transactions, row_filter=(lambda row: after_watermark(row, watermark)) if incremental else None,
+                    append=incremental)
+            else:
+                writers[section] = ParquetSectionWriter(
+                    OUTPUT_DIR / f"{section}.parquet", get_schema(section), batch_size)
+        return writers[section]
+
+    if input_path.is_dir():
+        for ndjson_file in sorted(input_path.glob("*.ndjson")):
+            writer = writer_for(ndjson_file.stem)
+            for row in iter_ndjson(ndjson_file):
+                writer.write(row)
+    else:
+        sections_by_prefix = {f"{source}.item": section for section, source in SECTION_SOURCES.items()}
+        with open(input_path, 'rb') as f:
+            for prefix, row in iter_array_items(f, sections_by_prefix):
+                writer_for(sections_by_prefix[prefix]).write(row)
+
+    for section, writer in writers.items():
+        written = writer.close()
+        if written:
+            print(f"✓ Converted {written} {section} records")
+            print(f"  Parquet size: {path_size(writer.output_path) / 1024:.2f} KB")
+    if PARTITIONED_SECTION in writers and writers[PARTITIONED_SECTION].count:
+        convert_time_series_to_parquet(convert_rollups_to_parquet(rollups))
+        convert_sketches_to_parquet(sketches)
+    return latest
 
 def get_json_size(data):
     """Get size of JSON data in KB"""
@@ -145,36 +629,92 @@ def get_json_size(data):
 def get_compression_ratio(json_data, parquet_path):
     """Calculate compression ratio"""
     json_size = len(json.dumps(json_data).encode('utf-8'))
-    parquet_size = parquet_path.stat().st_size
+    parquet_size = path_size(parquet_path)
     return json_size / parquet_size if parquet_size > 0 else 0
 
-def create_metadata_file():
+def measure_schema_gains(parquet_path, repeats=5):
+    """Compare the registry layout of a file against plain (version 1) types
+
+    Measured on the first row group so the cost stays bounded for large files.
+    """
+    section = parquet_path.relative_to(OUTPUT_DIR).parts[0].removesuffix(".parquet")
+    parquet_file = pq.ParquetFile(parquet_path)
+    if get_schema(section) is None or parquet_file.num_row_groups == 0:
+        return None
+    compact = parquet_file.read_row_group(0)
+    layouts = {"compact": compact, "plain": apply_schema(compact, section, version=1)}
+    sizes, decode_ms = {}, {}
+    for name, table in layouts.items():
+        sink = pa.BufferOutputStream()
+        pq.write_table(table, sink, compression='snappy')
+        buffer = sink.getvalue()
+        sizes[name] = buffer.size
+        pq.read_table(pa.BufferReader(buffer)).to_pandas()  # warm-up
+        start = time.perf_counter()
+        for _ in range(repeats):
+            pq.read_table(pa.BufferReader(buffer)).to_pandas()
+        decode_ms[name] = (time.perf_counter() - start) / repeats * 1000
+    return {
+        "sample_rows": compact.num_rows,
+        "compact_size_kb": sizes["compact"] / 1024,
+        "plain_size_kb": sizes["plain"] / 1024,
+        "size_reduction": 1 - sizes["compact"] / sizes["plain"] if sizes["plain"] else 0,
+        "compact_decode_ms": decode_ms["compact"],
+        "plain_decode_ms": decode_ms["plain"],
+        "decode_speedup": decode_ms["plain"] / decode_ms["compact"] if decode_ms["compact"] else 0
+    }
+
+def create_metadata_file(source_path=None, watermark=None):
     """Create metadata file with conversion info"""
     metadata = {
         "conversion_date": datetime.now().isoformat(),
+        "schema_version": SCHEMA_VERSION,
+        "watermark": watermark,
         "parquet_files": [],
         "total_compression_ratio": 0,
         "original_json_size_mb": 0,
-        "total_parquet_size_mb": 0
+        "total_parquet_size_mb": 0,
+        "derived_parquet_size_mb": {}
     }
     
-    # List all parquet files
-    parquet_files = list(OUTPUT_DIR.glob("*.parquet"))
+    # List all parquet files (including the files of partitioned datasets). Only the
+    # converted sections count towards the compression ratio; the derived outputs
+    # (rollups, sketches, time series) are reported separately.
+    parquet_files = sorted(OUTPUT_DIR.rglob("*.parquet"))
     total_parquet_size = 0
+    derived_sizes = {name: 0 for name in DERIVED_DIRS}
+    measured_datasets = set()
     
     for pf in parquet_files:
+        file_metadata = pq.read_metadata(pf)
+        schema_version = (file_metadata.metadata or {}).get(b"schema_version")
+        dataset = pf.relative_to(OUTPUT_DIR).parts[0] if pf.parent != OUTPUT_DIR else None
         file_info = {
-            "filename": pf.name,
+            "filename": pf.relative_to(OUTPUT_DIR).as_posix(),
             "size_kb": pf.stat().st_size / 1024,
-            "records": pq.read_metadata(pf).num_rows
+            "records": file_metadata.num_rows,
+            "row_groups": file_metadata.num_row_groups,
+            "schema_version": int(schema_version) if schema_version else None,
+            # one sample file per partitioned dataset is enough
+            "schema_gains": measure_schema_gains(pf) if dataset not in measured_datasets else None
         }
+        if dataset is not None:
+            measured_datasets.add(dataset)
         metadata["parquet_files"].append(file_info)
-        total_parquet_size += pf.stat().st_size
+        if dataset in derived_sizes:
+            derived_sizes[dataset] += pf.stat().st_size
+        else:
+            total_parquet_size += pf.stat().st_size
     
     # Calculate total sizes
-    original_size = (DATA_DIR / "dashboard_data_backup.json").stat().st_size
+    source_path = Path(source_path or DATA_DIR / "dashboard_data_backup.json")
+    if source_path.is_dir():
+        original_size = sum(f.stat().st_size for f in source_path.glob("*.ndjson"))
+    else:
+        original_size = source_path.stat().st_size
     metadata["original_json_size_mb"] = original_size / 1024 / 1024
     metadata["total_parquet_size_mb"] = total_parquet_size / 1024 / 1024
+    metadata["derived_parquet_size_mb"] = {name: size / 1024 / 1024 for name, size in derived_sizes.items() if size}
     metadata["total_compression_ratio"] = original_size / total_parquet_size if total_parquet_size > 0 else 0
     
     # Save metadata
@@ -185,18 +725,60 @@ def create_metadata_file():
     print(f"  Original JSON: {metadata['original_json_size_mb']:.2f} MB")
     print(f"  Total Parquet: {metadata['total_parquet_size_mb']:.2f} MB")
     print(f"  Compression ratio: {metadata['total_compression_ratio']:.1f}x")
+    for name, size_mb in metadata["derived_parquet_size_mb"].items():
+        print(f"  Derived {name}: {size_mb:.2f} MB")
+    for file_info in metadata["parquet_files"]:
+        gains = file_info["schema_gains"]
+        if gains:
+            print(f"  {file_info['filename']}: {gains['size_reduction']:.0%} size reduction, "
+                  f"{gains['decode_speedup']:.1f}x decode speed vs plain types")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert dashboard JSON data to Parquet")
+    parser.add_argument("--input", default=None,
+                        help="dashboard JSON file, or a directory of <section>.ndjson files with --stream "
+                             "(default: the backup file with full data)")
+    parser.add_argument("--stream", action="store_true",
+                        help="parse incrementally and write row groups as they fill, for inputs larger than memory")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE,
+                        help="rows per row group with --stream (default: %(default)s)")
+    parser.add_argument("--partitioned", action="store_true",
+                        help="write transaction_trends as a month/store_location partitioned dataset")
+    parser.add_argument("--bloom-filters", action="store_true",
+                        help="with --partitioned, add bloom filters on brand and consumer_id")
+    parser.add_argument("--incremental", action="store_true",
+                        help="append only transactions past the watermark in conversion_metadata.json "
+                             "(implies --partitioned; the first run converts everything)")
+    parser.add_argument("--watermark-column", choices=WATERMARK_COLUMNS, default="transaction_id",
+                        help="column tracked as the watermark when none is recorded yet (default: %(default)s)")
+    parser.add_argument("--compact", action="store_true",
+                        help="compact every partition of transaction_trends that holds more than one part file")
+    args = parser.parse_args()
+
     # Use the backup file with full data
-    json_file = DATA_DIR / "dashboard_data_backup.json"
+    json_file = Path(args.input) if args.input else DATA_DIR / "dashboard_data_backup.json"
     
     if not json_file.exists():
         print(f"❌ Error: {json_file} not found")
         print("Please run the migration script first to create the backup file")
         exit(1)
     
-    convert_all_to_parquet(json_file)
-    create_metadata_file()
+    watermark = load_watermark() if args.incremental else None
+    if args.incremental and watermark is None:
+        print("ℹ️  No watermark from a previous partitioned run; converting everything")
+    partitioned = args.partitioned or args.incremental
+    if args.stream:
+        watermark = convert_all_to_parquet_streaming(json_file, args.batch_size, partitioned, args.bloom_filters,
+                                                     watermark, args.watermark_column)
+    else:
+        watermark = convert_all_to_parquet(json_file, partitioned, args.bloom_filters,
+                                           watermark, args.watermark_column)
+    dataset_dir = OUTPUT_DIR / PARTITIONED_SECTION
+    if (args.incremental or args.compact) and dataset_dir.is_dir():
+        compacted = compact_partitions(dataset_dir, 1 if args.compact else COMPACT_MAX_FILES, args.bloom_filters)
+        if compacted:
+            print(f"✓ Compacted {compacted} partitions of {PARTITIONED_SECTION}")
+    create_metadata_file(json_file, watermark)
     
     print(f"\n✅ Conversion complete! Parquet files saved to: {OUTPUT_DIR}")
     print("\nNext steps:")
@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+Single-pass aggregation of transaction rows into the dashboard summary sections
+(kpi_metrics, brand_performance, location_data, category_breakdown,
+time_patterns, consumer_insights) served in dashboard_data.json.
+
+Rows are consumed one at a time into a fixed set of accumulators per key, so
+NDJSON/Parquet inputs of any size are summarized without loading them into
+memory. Unique consumers are HyperLogLog estimates and transaction value
+percentiles come from KLL sketches (see sketches.py for their error bounds),
+so memory stays fixed per key and aggregators of separate shards or batches
+can be merged.
+
+Usage:
+    python dashboard_aggregates.py transaction_trends.parquet [-o summary.json]
+"""
+
+import argparse
+import json
+from datetime import datetime
+from pathlib import Path
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:  # only needed for Parquet inputs
+    pq = None
+
+from sketches import QUANTILES, HyperLogLog, KLLSketch, hash64
+
+BATCH_SIZE = 65_536
+
+
+class DashboardAggregator:
+    """Accumulate dashboard summary sections from transaction rows"""
+
+    def __init__(self):
+        self.transactions = 0
+        self.revenue = 0.0
+        self.consumers = HyperLogLog()
+        self.values = KLLSketch()
+        self.tbwa_transactions = 0
+        self.has_tbwa_flag = False
+        self.min_date = None
+        self.max_date = None
+        # key -> [transactions, revenue, consumer sketch, value sketch] (+ descriptive fields)
+        self.brands = {}
+        self.locations = {}
+        self.categories = {}
+        self.ages = {}
+        self.hours = {hour: [0, 0.0] for hour in range(24)}
+        self.peak_hours = set()
+        self.weekend_transactions = 0
+        self.weekday_transactions = 0
+        self.genders = {"male": 0, "female": 0}
+        self.repeat_transactions = 0
+
+    def add(self, row):
+        """Fold one transaction row into every accumulator"""
+        # Revenue is the post-discount final_price when rows carry it
+        value = row.get('final_price', row.get('peso_value')) or 0.0
+        consumer = hash64(row['consumer_id']) if row.get('consumer_id') is not None else None
+        date = str(row['date'])[:10] if row.get('date') is not None else None
+
+        self.transactions += 1
+        self.revenue += value
+        self.values.update(value)
+        if consumer is not None:
+            self.consumers.add_hash(consumer)
+        if row.get('is_tbwa_client') is not None:
+            self.has_tbwa_flag = True
+            self.tbwa_transactions += bool(row['is_tbwa_client'])
+        if date is not None:
+            if self.min_date is None or date < self.min_date:
+                self.min_date = date
+            if self.max_date is None or date > self.max_date:
+                self.max_date = date
+
+        brand = row.get('brand')
+        if brand is not None:
+            acc = self.brands.get(brand)
+            if acc is None:
+                acc = self.brands[brand] = [0, 0.0, HyperLogLog(), KLLSketch(), row.get('category')]
+            self._fold(acc, value, consumer)
+
+        city = row.get('city')
+        if city is not None:
+            acc = self.locations.get(city)
+            if acc is None:
+                coordinates = None
+                if row.get('longitude') is not None and row.get('latitude') is not None:
+                    coordinates = [row['longitude'], row['latitude']]
+                # Regions from the spatial join (region_index.py) when present, else the store's label
+                region = row.get('region') or row.get('store_location')
+                acc = self.locations[city] = [0, 0.0, HyperLogLog(), KLLSketch(), region, row.get('region_id'),
+                                              coordinates]
+            self._fold(acc, value, consumer)
+
+        category = row.get('category')
+        if category is not None:
+            self.categories[category] = self.categories.get(category, 0.0) + value
+
+        hour = row.get('hour')
+        if hour is not None:
+            self.hours[hour][0] += 1
+            self.hours[hour][1] += value
+            if row.get('is_peak_hour'):
+                self.peak_hours.add(hour)
+
+        if row.get('is_weekend') is not None:
+            if row['is_weekend']:
+                self.weekend_transactions += 1
+            else:
+                self.weekday_transactions += 1
+
+        age_group = row.get('age_group')
+        if age_group is not None:
+            acc = self.ages.get(age_group)
+            if acc is None:
+                acc = self.ages[age_group] = [0, 0.0]
+            acc[0] += 1
+            acc[1] += value
+
+        gender = (row.get('gender') or '').lower()
+        if gender in self.genders:
+            self.genders[gender] += 1
+        self.repeat_transactions += bool(row.get('is_repeat_customer'))
+
+    @staticmethod
+    def _fold(acc, value, consumer):
+        acc[0] += 1
+        acc[1] += value
+        acc[3].update(value)
+        if consumer is not None:
+            acc[2].add_hash(consumer)
+
+    def add_rows(self, rows):
+        for row in rows:
+            self.add(row)
+        return self
+
+    def merge(self, other):
+        """Fold in an aggregator of other rows (another shard or batch)"""
+        self.transactions += other.transactions
+        self.revenue += other.revenue
+        self.consumers.merge(other.consumers)
+        self.values.merge(other.values)
+        self.tbwa_transactions += other.tbwa_transactions
+        self.has_tbwa_flag |= other.has_tbwa_flag
+        for date in (other.min_date, other.max_date):
+            if date is not None:
+                self.min_date = date if self.min_date is None else min(self.min_date, date)
+                self.max_date = date if self.max_date is None else max(self.max_date, date)
+        for mine, theirs in ((self.brands, other.brands), (self.locations, other.locations)):
+            for key, acc in theirs.items():
+                if key not in mine:
+                    mine[key] = [0, 0.0, HyperLogLog(), KLLSketch(), *acc[4:]]
+                target = mine[key]
+                target[0] += acc[0]
+                target[1] += acc[1]
+                target[2].merge(acc[2])
+                target[3].merge(acc[3])
+        for category, value in other.categories.items():
+            self.categories[category] = self.categories.get(category, 0.0) + value
+        for age_group, (count, revenue) in other.ages.items():
+            acc = self.ages.setdefault(age_group, [0, 0.0])
+            acc[0] += count
+            acc[1] += revenue
+        for hour, (count, revenue) in other.hours.items():
+            self.hours[hour][0] += count
+            self.hours[hour][1] += revenue
+        self.peak_hours |= other.peak_hours
+        self.weekend_transactions += other.weekend_transactions
+        self.weekday_transactions += other.weekday_transactions
+        for gender, count in other.genders.items():
+            self.genders[gender] += count
+        self.repeat_transactions += other.repeat_transactions
+        return self
+
+    def result(self):
+        """Build the summary sections in the dashboard_data.json shapes"""
+        total = self.transactions
+        avg = lambda revenue, count: revenue / count if count else 0
+
+        kpi_metrics = {
+            "total_transactions": total,
+            "total_revenue": round(self.revenue),
+            "avg_transaction_value": round(avg(self.revenue, total), 2),
+            "unique_consumers": self.consumers.count(total),
+            "transaction_value_percentiles": dict(zip(QUANTILES, self.values.quantiles(QUANTILES.values())))
+        }
+        if self.has_tbwa_flag:
+            kpi_metrics["tbwa_client_share"] = avg(self.tbwa_transactions, total) * 100
+
+        brand_performance = [
+            {
+                "brand": brand,
+                "category": category,
+                "total_transactions": count,
+                "total_revenue": revenue,
+                "avg_transaction_value": avg(revenue, count),
+                "market_share": avg(count, total) * 100,
+                "unique_customers": consumers.count(count),
+                "median_transaction_value": values.quantile(0.5)
+            }
+            for brand, (count, revenue, consumers, values, category) in self.brands.items()
+        ]
+        brand_performance.sort(key=lambda b: b["total_revenue"], reverse=True)
+
+        location_data = [
+            {
+                "location": city,
+                "region": region,
+                "region_id": region_id,
+                "coordinates": coordinates,
+                "transactions": count,
+                "revenue": revenue,
+                "avg_transaction_value": avg(revenue, count),
+                "unique_customers": consumers.count(count),
+                "median_transaction_value": values.quantile(0.5)
+            }
+            for city, (count, revenue, consumers, values, region, region_id, coordinates) in self.locations.items()
+        ]
+        location_data.sort(key=lambda l: l["revenue"], reverse=True)
+
+        category_breakdown = [
+            {"category": category, "value": round(value), "percentage": avg(value, self.revenue) * 100}
+            for category, value in sorted(self.categories.items(), key=lambda c: c[1], reverse=True)
+        ]
+
+        time_patterns = {
+            "hourly_patterns": [
+                {
+                    "hour": hour,
+                    "time_label": f"{hour:02d}:00",
+                    "transactions": count,
+                    "revenue": revenue,
+                    "is_peak": hour in self.peak_hours
+                }
+                for hour, (count, revenue) in self.hours.items()
+            ],
+            "peak_hours": sorted(self.peak_hours),
+            "weekend_lift": avg(self.weekend_transactions, self.weekday_transactions)
+        }
+
+        consumer_insights = {
+            "age_distribution": {
+                age_group: {
+                    "age_group": age_group,
+                    "transactions": count,
+                    "revenue": revenue,
+                    "avg_transaction_value": avg(revenue, count)
+                }
+                for age_group, (count, revenue) in sorted(self.ages.items())
+            },
+            "gender_split": dict(self.genders),
+            "repeat_customer_rate": avg(self.repeat_transactions, total) * 100
+        }
+
+        return {
+            "metadata": {
+                "generated_at": datetime.now().isoformat(),
+                "total_records": total,
+                "date_range": {"start": self.min_date, "end": self.max_date}
+            },
+            "kpi_metrics": kpi_metrics,
+            "brand_performance": brand_performance,
+            "location_data": location_data,
+            "category_breakdown": category_breakdown,
+            "time_patterns": time_patterns,
+            "consumer_insights": consumer_insights
+        }
+
+
+def iter_rows(path, batch_size=BATCH_SIZE):
+    """Stream transaction rows from NDJSON, Parquet or a dashboard JSON file"""
+    path = Path(path)
+    if path.suffix == ".parquet":
+        if pq is None:
+            raise RuntimeError("pyarrow is required to aggregate Parquet input")
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_size):
+            yield from batch.to_pylist()
+    elif path.suffix in (".ndjson", ".jsonl"):
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    else:
+        with open(path) as f:
+            yield from json.load(f).get('transaction_trends', [])
+
+
+def aggregate_file(path):
+    """Summarize a transaction file in one streaming pass"""
+    return DashboardAggregator().add_rows(iter_rows(path)).result()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Aggregate transaction rows into dashboard summary sections")
+    parser.add_argument("input", help="transaction rows (.ndjson, .parquet or dashboard .json)")
+    parser.add_argument("-o", "--output", default="dashboard_summary.json")
+    args = parser.parse_args()
+
+    summary = aggregate_file(args.input)
+    with open(args.output, "w") as f:
+        json.dump(summary, f, indent=2)
+
+    print(f"✅ Aggregated {summary['kpi_metrics']['total_transactions']} transactions into {args.output}")
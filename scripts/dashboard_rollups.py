@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Pre-aggregated rollups of the transaction rows, materialized next to the raw
+Parquet so dashboard tiles are answered from a few thousand rows instead of
+the full transaction table.
+
+Each rollup groups by a fixed set of columns and keeps additive measures
+(transactions, revenue, units), so any coarser grouping can be re-aggregated
+from it. Columns that are functionally dependent on a grouping column (a
+brand's category, an hour's time_of_day) ride along without adding rows.
+
+Usage:
+    python dashboard_rollups.py transaction_trends.parquet [-o rollups/]
+"""
+
+import argparse
+import operator
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+# name -> grouping columns
+ROLLUPS = {
+    "brand_day": ["brand", "category", "date"],
+    "category_region_day": ["category", "store_location", "date"],
+    "hour_weekday": ["hour", "time_of_day", "day_of_week", "is_weekend"],
+    # Hourly grain for the time series stage (time_series.py)
+    "brand_day_hour": ["brand", "category", "date", "hour"],
+    "region_day_hour": ["store_location", "date", "hour"],
+}
+MEASURES = ["transactions", "revenue", "units"]
+COMPACT_EVERY = 16  # re-aggregate buffered partials after this many batches
+
+FILTER_OPS = {
+    "=": operator.eq, "==": operator.eq, "!=": operator.ne,
+    "<": operator.lt, "<=": operator.le, ">": operator.gt, ">=": operator.ge,
+    "in": lambda column, values: column.isin(values),
+}
+
+
+def _plain(column):
+    if pa.types.is_dictionary(column.type):
+        return column.cast(column.type.value_type)
+    return column
+
+
+def _filter_value(column, value):
+    """A filter value cast to the Arrow type of a rollup column, so '2025-05-01' compares with dates"""
+    column_type = pa.Array.from_pandas(column.iloc[:1]).type
+    if pa.types.is_dictionary(column_type):
+        column_type = column_type.value_type
+    if pa.types.is_null(column_type):  # empty or all-null column: nothing to match anyway
+        return value
+    if isinstance(value, (list, tuple, set)):
+        return pa.array(list(value)).cast(column_type).to_pylist()
+    return pa.scalar(value).cast(column_type).as_py()
+
+
+def _aggregate(table, dims):
+    """Sum the measures of table by dims"""
+    result = table.group_by(dims).aggregate([(name, "sum") for name in MEASURES])
+    return result.rename_columns([
+        name.removesuffix("_sum") if name.removesuffix("_sum") in MEASURES else name
+        for name in result.column_names
+    ])
+
+
+class RollupBuilder:
+    """Fold transaction batches into every rollup the batches have columns for"""
+
+    def __init__(self):
+        self.partials = {name: [] for name in ROLLUPS}
+
+    def add(self, table):
+        # Revenue is the post-discount final_price when rows carry it
+        revenue = "final_price" if "final_price" in table.column_names else "peso_value"
+        ones = pa.repeat(pa.scalar(1, pa.int64()), table.num_rows)
+        columns = {
+            "transactions": ones,
+            "revenue": pc.fill_null(table.column(revenue).cast(pa.float64()), 0.0),
+            "units": pc.fill_null(table.column("units").cast(pa.int64()), 0)
+            if "units" in table.column_names else pc.multiply(ones, 0),
+        }
+        for name, dims in ROLLUPS.items():
+            if not all(dim in table.column_names for dim in dims):
+                continue
+            base = pa.table({**{dim: _plain(table.column(dim)) for dim in dims}, **columns})
+            partials = self.partials[name]
+            partials.append(_aggregate(base, dims))
+            if len(partials) >= COMPACT_EVERY:
+                self.partials[name] = [_aggregate(pa.concat_tables(partials), dims)]
+        return self
+
+    def merge(self, rollups):
+        """Fold in rollup tables materialized by an earlier run (they are additive)"""
+        for name, table in rollups.items():
+            if name in self.partials:
+                self.partials[name].append(table)
+        return self
+
+    def result(self):
+        """Final rollup tables, sorted by their grouping columns"""
+        rollups = {}
+        for name, partials in self.partials.items():
+            if partials:
+                dims = ROLLUPS[name]
+                table = _aggregate(pa.concat_tables(partials), dims)
+                rollups[name] = table.sort_by([(dim, "ascending") for dim in dims])
+        return rollups
+
+
+def write_rollups(rollups, output_dir):
+    """Write each rollup to <output_dir>/<name>.parquet"""
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    for name, table in rollups.items():
+        pq.write_table(table, output_dir / f"{name}.parquet", compression='snappy')
+    return {name: output_dir / f"{name}.parquet" for name in rollups}
+
+
+def load_rollups(directory):
+    """Read the rollups in a directory as DataFrames"""
+    return {
+        name: pq.read_table(Path(directory) / f"{name}.parquet").to_pandas()
+        for name in ROLLUPS if (Path(directory) / f"{name}.parquet").exists()
+    }
+
+
+def choose_rollup(rollups, columns):
+    """Name of the smallest rollup whose grouping columns cover columns"""
+    candidates = [
+        (len(df), name) for name, df in rollups.items()
+        if set(columns) <= set(ROLLUPS[name])
+    ]
+    if not candidates:
+        raise ValueError(f"No rollup covers {sorted(columns)}")
+    return min(candidates)[1]
+
+
+def query_rollup(rollups, group_by=(), filters=None):
+    """Answer a grouped query from the coarsest rollup that can satisfy it
+
+    rollups maps rollup names to DataFrames (see load_rollups). filters is a
+    list of (column, op, value) tuples, as in pyarrow.parquet.read_table.
+    Values are cast to the column's type, so dates can be ISO strings.
+    """
+    group_by = list(group_by)
+    filters = filters or []
+    df = rollups[choose_rollup(rollups, group_by + [column for column, _, _ in filters])]
+
+    for column, op, value in filters:
+        df = df[FILTER_OPS[op](df[column], _filter_value(df[column], value))]
+
+    if group_by:
+        result = df.groupby(group_by, observed=True, sort=False)[MEASURES].sum().reset_index()
+    else:
+        result = df[MEASURES].agg(["sum"]).reset_index(drop=True)
+    result["avg_transaction_value"] = (result["revenue"] / result["transactions"]).where(result["transactions"] > 0, 0)
+    return result.sort_values("revenue", ascending=False, ignore_index=True)
+
+
+def build_rollups_from_parquet(path, batch_size=65_536):
+    """Build the rollups from a transaction Parquet file or partitioned dataset"""
+    builder = RollupBuilder()
+    dataset = ds.dataset(path, format="parquet", partitioning="hive")
+    for batch in dataset.to_batches(batch_size=batch_size):
+        builder.add(pa.Table.from_batches([batch]))
+    return builder.result()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Materialize dashboard rollups from transaction Parquet")
+    parser.add_argument("input", help="transaction_trends.parquet or a partitioned transaction_trends/ directory")
+    parser.add_argument("-o", "--output", default="rollups")
+    args = parser.parse_args()
+
+    paths = write_rollups(build_rollups_from_parquet(args.input), args.output)
+    for name, path in paths.items():
+        print(f"✓ {name}: {pq.read_metadata(path).num_rows} rows ({path.stat().st_size / 1024:.2f} KB)")
+    print(f"✅ Wrote {len(paths)} rollups to {args.output}")
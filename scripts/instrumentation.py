@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Shared instrumentation for the Python data scripts: timed spans with row/byte
+counters, retry and cache-hit counts, exported as structured JSON lines or as
+OpenTelemetry spans.
+
+Configuration:
+    PIPELINE_TRACE       off (default) | json | otel
+    PIPELINE_TRACE_FILE  JSON lines destination (default: stderr)
+
+With tracing off, span() returns a shared no-op object and traced() adds one
+flag check per call, so instrumented code runs at its normal speed.
+
+JSON spans follow the OpenTelemetry field names (trace_id, span_id,
+parent_span_id, start/end_time_unix_nano, attributes, status), so a log
+shipper can forward them to a metrics/tracing stack unchanged. With
+PIPELINE_TRACE=otel the spans go through the opentelemetry API instead, using
+whatever tracer provider and exporter the process has configured.
+
+Usage:
+    from instrumentation import count, span, traced
+
+    @traced()
+    def convert_brands_to_parquet(data):
+        ...
+        count("rows", len(df))
+
+    with span("upload", blob=blob_name) as s:
+        s.count("bytes", size)
+"""
+
+import atexit
+import contextvars
+import functools
+import json
+import os
+import secrets
+import sys
+import threading
+import time
+
+try:
+    from opentelemetry import trace as otel_trace
+except ImportError:  # only needed for PIPELINE_TRACE=otel
+    otel_trace = None
+
+TRACE_MODE = os.environ.get('PIPELINE_TRACE', 'off').lower()
+TRACE_FILE = os.environ.get('PIPELINE_TRACE_FILE')
+SERVICE_NAME = "dashboard-data-pipeline"
+
+enabled = TRACE_MODE in ("json", "otel")
+if TRACE_MODE == "otel" and otel_trace is None:
+    print("⚠️  PIPELINE_TRACE=otel needs opentelemetry-api; falling back to JSON lines", file=sys.stderr)
+    TRACE_MODE = "json"
+
+_current = contextvars.ContextVar("current_span", default=None)
+_lock = threading.Lock()
+_totals = {}  # counter name -> total across all spans
+_timings = {}  # span name -> [calls, total seconds]
+_output = None
+
+
+def _write(record):
+    global _output
+    line = json.dumps(record, default=str) + "\n"
+    with _lock:
+        if _output is None:
+            _output = open(TRACE_FILE, "a") if TRACE_FILE else sys.stderr
+        _output.write(line)
+        _output.flush()
+
+
+class Span:
+    """A timed operation with attributes and counters"""
+
+    def __init__(self, name, attributes):
+        self.name = name
+        self.attributes = attributes
+        self.counters = {}
+        parent = _current.get()
+        self.parent = parent
+        self.trace_id = parent.trace_id if parent else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self._otel_span = None
+
+    def set(self, key, value):
+        self.attributes[key] = value
+
+    def count(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+        with _lock:
+            _totals[name] = _totals.get(name, 0) + value
+
+    def __enter__(self):
+        self._token = _current.set(self)
+        if TRACE_MODE == "otel":
+            self._otel_context = otel_trace.get_tracer(SERVICE_NAME).start_as_current_span(
+                self.name, attributes=self.attributes)
+            self._otel_span = self._otel_context.__enter__()
+        self.start_ns = time.time_ns()
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self._started
+        end_ns = time.time_ns()
+        _current.reset(self._token)
+        with _lock:
+            timing = _timings.setdefault(self.name, [0, 0.0])
+            timing[0] += 1
+            timing[1] += seconds
+
+        status = {"code": "ERROR", "message": f"{exc_type.__name__}: {exc}"} if exc_type else {"code": "OK"}
+        if self._otel_span is not None:
+            for key, value in self.counters.items():
+                self._otel_span.set_attribute(f"count.{key}", value)
+            self._otel_context.__exit__(exc_type, exc, tb)
+        else:
+            _write({
+                "name": self.name,
+                "trace_id": self.trace_id,
+                "span_id": self.span_id,
+                "parent_span_id": self.parent.span_id if self.parent else None,
+                "start_time_unix_nano": self.start_ns,
+                "end_time_unix_nano": end_ns,
+                "duration_ms": round(seconds * 1000, 3),
+                "attributes": {**self.attributes, **{f"count.{k}": v for k, v in self.counters.items()}},
+                "status": status,
+                "resource": {"service.name": SERVICE_NAME},
+            })
+        return False
+
+
+class _NoopSpan:
+    """Stands in for Span when tracing is off"""
+
+    def set(self, key, value):
+        pass
+
+    def count(self, name, value=1):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+def span(name, **attributes):
+    """Context manager timing a block as a span (nested spans share a trace)"""
+    if not enabled:
+        return _NOOP
+    return Span(name, attributes)
+
+
+def traced(name=None):
+    """Decorator running a function inside a span named after it"""
+    def decorate(func):
+        span_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return func(*args, **kwargs)
+            with Span(span_name, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def count(name, value=1):
+    """Add to a counter on the current span (and the process totals)"""
+    if not enabled:
+        return
+    current = _current.get()
+    if current is not None:
+        current.count(name, value)
+    else:
+        with _lock:
+            _totals[name] = _totals.get(name, 0) + value
+
+
+def azure_retry_hook(retry_count=0, location_mode=None, request=None, response=None, error=None, **kwargs):
+    """Pass as retry_hook= to Azure storage calls to count their retries"""
+    count("retries")
+
+
+def summary():
+    """Counter totals and per-span call counts/time for this process"""
+    with _lock:
+        return {
+            "counters": dict(_totals),
+            "spans": {name: {"calls": calls, "seconds": round(seconds, 3)}
+                      for name, (calls, seconds) in _timings.items()},
+        }
+
+
+@atexit.register
+def _write_summary():
+    if enabled and TRACE_MODE == "json" and _timings:
+        _write({"name": "process.summary", "resource": {"service.name": SERVICE_NAME}, **summary()})
@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+"""
+Multi-resolution map geometry from the Philippine region boundaries
+
+attached_assets/ph.json is close to 1 MB of full-resolution coordinates. This
+tool writes a few simplified levels of detail for the map layer, plus a
+manifest listing each level's zoom range, byte sizes and parse time, and
+every feature's bounding box. The map fetches manifest.json first and then
+only the level its current zoom needs.
+
+Simplification keeps the topology: the rings are split into arcs at the
+points where neighbouring regions meet. Each shared border is one arc, so it
+is simplified once (Douglas-Peucker, endpoints fixed) and both regions keep
+the same line, without gaps or overlaps. Coordinates are quantized onto an
+integer grid per level. TopoJSON output stores the arcs delta-encoded on that
+grid; GeoJSON output rounds coordinates to the grid's precision.
+
+Usage:
+    python map_geometry.py                           # TopoJSON + GeoJSON into client/public/data/geo/
+    python map_geometry.py --formats topojson -o geo/
+
+    from map_geometry import level_for_zoom
+    level = level_for_zoom(manifest, 7)  # manifest entry of the level to load at zoom 7
+"""
+
+import argparse
+import gzip
+import json
+import math
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+
+GEOJSON_PATH = Path(__file__).parent.parent / "attached_assets" / "ph.json"
+OUTPUT_DIR = Path(os.environ.get('MAP_GEOMETRY_DIR', Path(__file__).parent.parent / "client" / "public" / "data" / "geo"))
+FORMATS = ["topojson", "geojson"]
+OBJECT_NAME = "regions"  # TopoJSON object holding the features
+
+# Coarse to fine: Douglas-Peucker tolerance (degrees), quantization grid steps across the
+# extent, and the map zoom levels served by each level
+LEVELS = [
+    {"name": "low", "tolerance": 0.02, "quantization": 10_000, "min_zoom": 0, "max_zoom": 6},
+    {"name": "medium", "tolerance": 0.005, "quantization": 100_000, "min_zoom": 7, "max_zoom": 8},
+    {"name": "high", "tolerance": 0.001, "quantization": 100_000, "min_zoom": 9, "max_zoom": None},
+]
+
+
+def feature_polygons(feature):
+    """Polygons of a feature as lists of rings (n x 2 arrays, closing point dropped)"""
+    geometry = feature["geometry"]
+    polygons = geometry["coordinates"] if geometry["type"] == "MultiPolygon" else [geometry["coordinates"]]
+    return [[np.asarray(ring, dtype=np.float64)[:-1, :2] for ring in rings] for rings in polygons]
+
+
+def find_junctions(rings):
+    """Points where rings stop running alongside each other: the ends of shared borders"""
+    neighbours = {}
+    for ring in rings:
+        points = list(map(tuple, ring))
+        for i, point in enumerate(points):
+            pair = frozenset((points[i - 1], points[(i + 1) % len(points)]))
+            neighbours.setdefault(point, set()).add(pair)
+    return {point for point, pairs in neighbours.items() if len(pairs) > 1}
+
+
+class Topology:
+    """Rings of every feature as references to shared arcs (TopoJSON style: ~i is arc i reversed)"""
+
+    def __init__(self, features):
+        self.arcs = []
+        self._arc_index = {}
+        self.polygons = [feature_polygons(feature) for feature in features]
+        junctions = find_junctions([ring for polygons in self.polygons for rings in polygons for ring in rings])
+        # feature -> polygon -> ring -> arc references
+        self.features = [[[self._split(ring, junctions) for ring in rings] for rings in polygons]
+                         for polygons in self.polygons]
+
+    def _add_arc(self, points):
+        key = tuple(points)
+        if key in self._arc_index:
+            return self._arc_index[key]
+        reversed_key = key[::-1]
+        if reversed_key in self._arc_index:
+            return ~self._arc_index[reversed_key]
+        self._arc_index[key] = len(self.arcs)
+        self.arcs.append(np.array(points))
+        return len(self.arcs) - 1
+
+    def _split(self, ring, junctions):
+        points = list(map(tuple, ring))
+        cuts = [i for i, point in enumerate(points) if point in junctions]
+        if not cuts:
+            # A ring nobody shares a border with is one closed arc; start it at its smallest
+            # point so the same ring seen from another feature maps to the same arc
+            start = points.index(min(points))
+            points = points[start:] + points[:start]
+            return [self._add_arc(points + points[:1])]
+        points = points[cuts[0]:] + points[:cuts[0]] + [points[cuts[0]]]
+        cuts = [i - cuts[0] for i in cuts] + [len(points) - 1]
+        return [self._add_arc(points[start:end + 1]) for start, end in zip(cuts, cuts[1:])]
+
+
+def douglas_peucker(points, tolerance):
+    """Indices of the points kept by Douglas-Peucker simplification (first and last always kept)"""
+    keep = np.zeros(len(points), dtype=bool)
+    keep[[0, -1]] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        a, b = points[start], points[end]
+        between = points[start + 1:end]
+        direction = b - a
+        length = math.hypot(*direction)
+        if length == 0:  # closed arc: distance to its start point
+            distance = np.hypot(*(between - a).T)
+        else:
+            distance = np.abs(direction[0] * (between[:, 1] - a[1]) - direction[1] * (between[:, 0] - a[0])) / length
+        i = int(np.argmax(distance))
+        if distance[i] > tolerance:
+            keep[start + 1 + i] = True
+            stack.extend([(start, start + 1 + i), (start + 1 + i, end)])
+    if np.array_equal(points[0], points[-1]) and keep.sum() < 4 and len(points) >= 4:
+        # A closed arc keeps at least a triangle: its start, the farthest point from the start
+        # and the point farthest from that chord. Tiny islands are dropped by area instead.
+        far = int(np.argmax(np.hypot(*(points - points[0]).T)))
+        offset = points - points[0]
+        spread = np.abs(offset[far, 0] * offset[:, 1] - offset[far, 1] * offset[:, 0])
+        keep[far] = True
+        keep[int(np.argmax(spread))] = True
+    return np.nonzero(keep)[0]
+
+
+def ring_area(ring):
+    """Unsigned shoelace area of a closed ring (degrees squared)"""
+    x, y = ring[:, 0], ring[:, 1]
+    return abs(np.dot(x[:-1], y[1:]) - np.dot(x[1:], y[:-1])) / 2
+
+
+def ring_points(arcs, refs):
+    """Concatenate arc references into one closed ring"""
+    parts = [arcs[ref] if ref >= 0 else arcs[~ref][::-1] for ref in refs]
+    return np.vstack([parts[0]] + [part[1:] for part in parts[1:]])
+
+
+def bounding_box(arrays):
+    points = np.vstack(arrays)
+    return points.min(axis=0).tolist() + points.max(axis=0).tolist()
+
+
+def bboxes_to_points(bboxes):
+    return [np.array([bbox[:2], bbox[2:]]) for bbox in bboxes]
+
+
+class Level:
+    """One simplified, quantized level of detail of a topology"""
+
+    def __init__(self, topology, extent, tolerance, quantization):
+        x0, y0, x1, y1 = extent
+        self.translate = [x0, y0]
+        self.scale = [(x1 - x0) / (quantization - 1), (y1 - y0) / (quantization - 1)]
+
+        # Simplify and quantize every arc once; consecutive points that land on the same
+        # grid cell collapse into one
+        self.arcs = []
+        for arc in topology.arcs:
+            grid = np.round((arc[douglas_peucker(arc, tolerance)] - self.translate) / self.scale).astype(np.int64)
+            moved = np.any(grid[1:] != grid[:-1], axis=1)
+            self.arcs.append(grid[np.concatenate([[True], moved])] if len(grid) > 1 else grid)
+
+        # Drop rings that collapsed on the grid and islands smaller than one tolerance square,
+        # but never a feature's largest polygon
+        min_area = tolerance ** 2 / (self.scale[0] * self.scale[1])
+        self.features = []
+        for polygons in topology.features:
+            kept = []
+            for rings in polygons:
+                areas = []
+                for refs in rings:
+                    ring = ring_points(self.arcs, refs)
+                    areas.append(ring_area(ring) if len(ring) >= 4 else 0)
+                kept.append((areas[0], [refs for refs, area in zip(rings, areas) if area > 0]))
+            largest = max(area for area, _ in kept)
+            self.features.append([rings for area, rings in kept
+                                  if rings and area > 0 and (area >= min_area or area == largest)])
+
+    def used_arcs(self):
+        return sorted({ref if ref >= 0 else ~ref
+                       for polygons in self.features for rings in polygons for refs in rings for ref in refs})
+
+    def vertices(self):
+        return sum(len(self.arcs[i]) for i in self.used_arcs())
+
+    def coordinates(self, refs, digits):
+        """Closed ring of the given arc references in degrees, rounded to the grid precision"""
+        points = ring_points(self.arcs, refs) * self.scale + self.translate
+        return np.round(points, digits).tolist()
+
+    def digits(self):
+        return max(0, math.ceil(-math.log10(min(self.scale))))
+
+    def to_topojson(self, ids, names, bboxes):
+        used = self.used_arcs()
+        renumber = {old: new for new, old in enumerate(used)}
+
+        def ref(r):
+            return renumber[r] if r >= 0 else ~renumber[~r]
+
+        geometries = []
+        for polygons, feature_id, name, bbox in zip(self.features, ids, names, bboxes):
+            geometries.append({
+                "type": "MultiPolygon",
+                "id": feature_id,
+                "properties": {"id": feature_id, "name": name},
+                "bbox": bbox,
+                "arcs": [[[ref(r) for r in refs] for refs in rings] for rings in polygons],
+            })
+        arcs = []
+        for i in used:  # delta-encoded, as in TopoJSON's quantized form
+            arc = self.arcs[i]
+            arcs.append(np.vstack([arc[:1], np.diff(arc, axis=0)]).tolist())
+        return {
+            "type": "Topology",
+            "bbox": bounding_box(bboxes_to_points(bboxes)),
+            "transform": {"scale": self.scale, "translate": self.translate},
+            "objects": {OBJECT_NAME: {"type": "GeometryCollection", "geometries": geometries}},
+            "arcs": arcs,
+        }
+
+    def to_geojson(self, ids, names, bboxes):
+        digits = self.digits()
+        features = []
+        for polygons, feature_id, name, bbox in zip(self.features, ids, names, bboxes):
+            features.append({
+                "type": "Feature",
+                "id": feature_id,
+                "properties": {"id": feature_id, "name": name},
+                "bbox": bbox,
+                "geometry": {
+                    "type": "MultiPolygon",
+                    "coordinates": [[self.coordinates(refs, digits) for refs in rings] for rings in polygons],
+                },
+            })
+        return {"type": "FeatureCollection", "bbox": bounding_box(bboxes_to_points(bboxes)), "features": features}
+
+
+def compact_json(data):
+    return json.dumps(data, separators=(",", ":")).encode()
+
+
+def parse_time(payload, repeats):
+    """Best-of-repeats milliseconds to parse a JSON payload"""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        json.loads(payload)
+        timings.append(time.perf_counter() - start)
+    return round(min(timings) * 1000, 3)
+
+
+def file_stats(path, payload, repeats):
+    return {
+        "path": path.name,
+        "bytes": len(payload),
+        "gzip_bytes": len(gzip.compress(payload)),
+        "parse_ms": parse_time(payload, repeats),
+    }
+
+
+def export_levels(source=GEOJSON_PATH, output_dir=OUTPUT_DIR, formats=FORMATS, levels=LEVELS, repeats=5):
+    """Write every level in every format plus manifest.json; returns the manifest"""
+    source = Path(source)
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    with open(source, "rb") as f:
+        source_payload = f.read()
+    features = json.loads(source_payload)["features"]
+    ids = [feature["properties"].get("id") for feature in features]
+    names = [feature["properties"].get("name") for feature in features]
+
+    topology = Topology(features)
+    # Full-resolution bounding boxes, rounded outwards, so they hold at every level
+    bboxes = []
+    for polygons in topology.polygons:
+        x0, y0, x1, y1 = bounding_box([ring for rings in polygons for ring in rings])
+        bboxes.append([math.floor(x0 * 1e4) / 1e4, math.floor(y0 * 1e4) / 1e4,
+                       math.ceil(x1 * 1e4) / 1e4, math.ceil(y1 * 1e4) / 1e4])
+    extent = bounding_box(bboxes_to_points(bboxes))
+
+    manifest = {
+        "source": {"path": source.name, "bytes": len(source_payload),
+                   "vertices": sum(len(ring) + 1 for polygons in topology.polygons for rings in polygons for ring in rings),
+                   "parse_ms": parse_time(source_payload, repeats)},
+        "bbox": extent,
+        "object": OBJECT_NAME,
+        "features": [{"id": i, "name": n, "bbox": b} for i, n, b in zip(ids, names, bboxes)],
+        "levels": [],
+    }
+    writers = {"topojson": ("topo.json", Level.to_topojson), "geojson": ("geojson", Level.to_geojson)}
+    for spec in levels:
+        level = Level(topology, extent, spec["tolerance"], spec["quantization"])
+        entry = {**spec, "arcs": len(level.used_arcs()), "vertices": level.vertices(), "files": {}}
+        for fmt in formats:
+            suffix, write = writers[fmt]
+            path = output_dir / f"{spec['name']}.{suffix}"
+            payload = compact_json(write(level, ids, names, bboxes))
+            path.write_bytes(payload)
+            entry["files"][fmt] = file_stats(path, payload, repeats)
+        manifest["levels"].append(entry)
+
+    with open(output_dir / "manifest.json", "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def level_for_zoom(manifest, zoom):
+    """Manifest entry of the level covering a map zoom (the finest level beyond the last range)"""
+    for level in manifest["levels"]:
+        if level["min_zoom"] <= zoom and (level["max_zoom"] is None or zoom <= level["max_zoom"]):
+            return level
+    return manifest["levels"][-1]
+
+
+def print_report(manifest):
+    source = manifest["source"]
+    print(f"\n📊 {source['path']}: {source['vertices']} vertices, {source['bytes'] / 1024:.1f} KB, "
+          f"parsed in {source['parse_ms']:.2f} ms")
+    print(f"  {'level':<8} {'zoom':<6} {'vertices':>9} {'format':<9} {'KB':>9} {'gzip KB':>9} {'parse ms':>9}")
+    for level in manifest["levels"]:
+        zoom = f"{level['min_zoom']}-{level['max_zoom'] if level['max_zoom'] is not None else ''}"
+        for fmt, stats in level["files"].items():
+            print(f"  {level['name']:<8} {zoom:<6} {level['vertices']:>9} {fmt:<9} {stats['bytes'] / 1024:>9.1f} "
+                  f"{stats['gzip_bytes'] / 1024:>9.1f} {stats['parse_ms']:>9.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write simplified levels of detail of the region boundaries")
+    parser.add_argument("--source", default=str(GEOJSON_PATH))
+    parser.add_argument("-o", "--output", default=str(OUTPUT_DIR), help="output directory (default: %(default)s)")
+    parser.add_argument("--formats", nargs="+", choices=FORMATS, default=FORMATS)
+    parser.add_argument("--repeats", type=int, default=5, help="parses timed per file (best is reported)")
+    args = parser.parse_args()
+
+    manifest = export_levels(args.source, args.output, args.formats, repeats=args.repeats)
+    print_report(manifest)
+    print(f"✅ Wrote {len(manifest['levels'])} levels and manifest.json to {args.output}")
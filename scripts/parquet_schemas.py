@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Versioned Arrow schema registry for the Parquet files written by
+convert-to-parquet.py
+
+Schema versions:
+  1 - plain types as pandas infers them (strings, int64, float64, timestamp[ns])
+  2 - dictionary-encoded repetitive strings, the narrowest int/float type the
+      value ranges allow, and date32 for calendar dates
+  3 - as 2, but transaction coordinates and percentages stay float64: as
+      float32 they read back with representation noise (14.5547 ->
+      14.554699897766113) for no measurable size or decode gain
+
+Columns a section's schema does not list are left as they are.
+"""
+
+from collections import Counter
+from pathlib import Path
+
+import pyarrow as pa
+
+SCHEMA_VERSION = 3
+
+# Low-cardinality strings: stored once per row group, read back as categoricals
+CATEGORY = pa.dictionary(pa.int32(), pa.string())
+
+SCHEMAS = {
+    "transaction_trends": pa.schema([
+        ("transaction_id", pa.string()),
+        ("date", pa.date32()),
+        ("time", pa.string()),
+        ("hour", pa.int8()),                    # 0-23
+        ("day_of_week", CATEGORY),
+        ("is_weekend", pa.bool_()),
+        ("is_peak_hour", pa.bool_()),
+        ("time_of_day", CATEGORY),
+        ("store_id", CATEGORY),
+        ("store_location", CATEGORY),
+        ("city", CATEGORY),
+        ("region_id", CATEGORY),                # ph.json region the coordinates fall in
+        ("region", CATEGORY),
+        ("latitude", pa.float64()),             # served as stored
+        ("longitude", pa.float64()),
+        ("brand", CATEGORY),
+        ("category", CATEGORY),
+        ("subcategory", CATEGORY),
+        ("is_tbwa_client", pa.bool_()),
+        ("units", pa.int16()),
+        ("peso_value", pa.float64()),           # currency keeps full precision
+        ("unit_price", pa.float64()),
+        ("cost", pa.float64()),
+        ("margin_percentage", pa.float64()),
+        ("discount_percentage", pa.float64()),
+        ("final_price", pa.float64()),
+        ("volume", pa.int32()),
+        ("duration", pa.int32()),               # seconds
+        ("duration_seconds", pa.int32()),
+        ("consumer_id", pa.string()),
+        ("age_group", CATEGORY),
+        ("gender", CATEGORY),
+        ("income_level", CATEGORY),
+        ("is_repeat_customer", pa.bool_()),
+        ("customer_satisfaction", pa.int8()),   # 1-5
+    ]),
+    "brand_trends": pa.schema([
+        ("brand", pa.string()),
+        ("category", CATEGORY),
+        ("value", pa.float64()),
+        ("pct_change", pa.float32()),
+    ]),
+    "consumer_profiles": pa.schema([
+        ("gender", CATEGORY),
+        ("age", pa.int8()),
+        ("location", CATEGORY),
+        ("age_group", CATEGORY),
+        ("last_purchase", pa.timestamp("ns")),
+        ("first_purchase", pa.timestamp("ns")),
+    ]),
+    "consumer_profiling": pa.schema([
+        ("gender", CATEGORY),
+        ("age", pa.int8()),
+        ("location", CATEGORY),
+    ]),
+    "hourly_patterns": pa.schema([
+        ("hour", pa.int8()),
+        ("time_label", pa.string()),
+        ("transactions", pa.int32()),
+        ("revenue", pa.float64()),
+        ("is_peak", pa.bool_()),
+    ]),
+    "demand_forecast": pa.schema([
+        ("date", pa.date32()),
+    ]),
+    "basket_analysis": pa.schema([
+        ("basket_id", pa.string()),
+        ("brand", CATEGORY),
+        ("item_count", pa.int16()),
+        ("total_value", pa.float64()),
+    ]),
+    "substitution_patterns": pa.schema([
+        ("original", CATEGORY),
+        ("substitution", CATEGORY),
+        ("count", pa.int32()),
+        ("reason", CATEGORY),
+        ("confidence", pa.float32()),
+        ("basket_lift", pa.float32()),
+    ]),
+    "brand_associations": pa.schema([
+        ("antecedent", CATEGORY),
+        ("consequent", CATEGORY),
+        ("count", pa.int32()),
+        ("support", pa.float64()),
+        ("confidence", pa.float32()),
+        ("lift", pa.float32()),
+    ]),
+    "location_data": pa.schema([
+        ("location", pa.string()),
+        ("region", CATEGORY),
+        ("region_id", CATEGORY),
+        ("transactions", pa.int32()),
+        ("revenue", pa.float64()),
+        ("avg_transaction_value", pa.float64()),
+        ("unique_customers", pa.int32()),           # HyperLogLog estimate
+        ("median_transaction_value", pa.float64()),  # KLL estimate
+    ]),
+}
+
+
+def plain_type(arrow_type):
+    """Widen a compact type back to what pandas would have inferred"""
+    if pa.types.is_dictionary(arrow_type):
+        return arrow_type.value_type
+    if pa.types.is_integer(arrow_type):
+        return pa.int64()
+    if pa.types.is_floating(arrow_type):
+        return pa.float64()
+    if pa.types.is_date(arrow_type):
+        return pa.timestamp("ns")
+    return arrow_type
+
+
+def get_schema(section, version=SCHEMA_VERSION):
+    """Registry schema for a section, or None if the section is not registered"""
+    schema = SCHEMAS.get(section)
+    if schema is None:
+        return None
+    if version == 1:
+        schema = pa.schema([pa.field(f.name, plain_type(f.type)) for f in schema])
+    elif version != SCHEMA_VERSION:
+        raise ValueError(f"Unknown schema version {version}")
+    return schema.with_metadata({"schema_version": str(version)})
+
+
+def cast_column(column, arrow_type):
+    """Cast a column to a registry type"""
+    if column.type == arrow_type:
+        return column
+    if pa.types.is_date(arrow_type) and (pa.types.is_string(column.type) or pa.types.is_large_string(column.type)):
+        # full ISO timestamps don't cast straight to date32
+        column = column.cast(pa.timestamp("ns"))
+    if pa.types.is_dictionary(arrow_type):
+        if pa.types.is_dictionary(column.type):
+            column = column.cast(column.type.value_type)
+        column = column.cast(arrow_type.value_type)  # e.g. large_string from pandas
+    # float64 -> float32 only drops precision beyond what the registry needs;
+    # integer narrowing stays checked so out-of-range values still fail loudly
+    return column.cast(arrow_type, safe=not pa.types.is_floating(arrow_type))
+
+
+def apply_schema(table, section, version=SCHEMA_VERSION):
+    """Cast the registered columns of a table to the section's schema"""
+    schema = get_schema(section, version)
+    if schema is None:
+        return table
+    for i, name in enumerate(table.column_names):
+        index = schema.get_field_index(name)
+        if index != -1:
+            table = table.set_column(i, schema.field(index), cast_column(table.column(i), schema.field(index).type))
+    metadata = dict(table.schema.metadata or {})
+    metadata[b"schema_version"] = str(version).encode()
+    return table.replace_schema_metadata(metadata)
+
+
+def parquet_datasets(parquet_dir):
+    """{name: path} of every dataset in a Parquet output directory
+
+    Flat files and the files of derived directories (rollups/, sketches/,
+    time_series/) are named by file stem, Hive-partitioned directories by
+    directory name. A stem used by more than one directory is qualified as
+    <directory>_<stem>, so no dataset hides another.
+    """
+    parquet_dir = Path(parquet_dir)
+    datasets = [(path.stem, path) for path in sorted(parquet_dir.glob("*.parquet"))]
+    nested = []
+    for directory in sorted(p for p in parquet_dir.iterdir() if p.is_dir()):
+        if any("=" in child.name for child in directory.iterdir()):
+            datasets.append((directory.name, directory))  # Hive-partitioned dataset
+        else:
+            nested.extend((path.stem, path) for path in sorted(directory.glob("*.parquet")))
+    taken = Counter(name for name, _ in datasets + nested)
+    for stem, path in nested:
+        name = f"{path.parent.name}_{stem}" if taken[stem] > 1 else stem
+        datasets.append((name, path))  # e.g. rollups/brand_day.parquet -> brand_day
+    return dict(datasets)
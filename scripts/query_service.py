@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+"""
+Embedded SQL query service over the Parquet outputs
+
+Registers every dataset in parquet_output/ as a DuckDB view (flat files by
+name, Hive-partitioned directories as one view, rollups by rollup name) and
+answers the dashboard API shapes with parameterized SQL. Queries run
+vectorized on all cores against the Parquet files directly, so nothing is
+loaded into pandas first.
+
+A small HTTP shim serves the same queries for the Node server to proxy to:
+
+    GET /api/dashboard/kpi|locations|categories|brands|trends
+    GET /api/transactions?region=NCR&brand=...&start=2025-01-01&limit=100
+    GET /api/compare?brands=A,B&period=30d
+
+JSON responses have the shapes of the Node routes in server/routes.ts, so a
+proxy needs no client changes: kpi is a KPIMetrics object and compare is
+{comparisons: [{brand, metrics}], period}. With ?format=arrow (or an
+Accept: application/vnd.apache.arrow.stream header) the query result is sent
+as an Arrow IPC stream instead, with the same nested columns.
+
+Usage:
+    python query_service.py --port 8765
+    python query_service.py --query brands --param region=NCR
+"""
+
+import argparse
+import json
+import os
+from datetime import date, datetime
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+import pyarrow as pa
+
+try:
+    import duckdb
+except ImportError:  # only needed to run queries
+    duckdb = None
+
+from parquet_schemas import parquet_datasets
+
+PARQUET_DIR = Path(os.environ.get('PARQUET_OUTPUT_DIR', Path(__file__).parent.parent / "parquet_output"))
+QUERY_PORT = int(os.environ.get('QUERY_SERVICE_PORT', 8765))
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+FRESHNESS_DAYS = 30  # dataFreshness falls from 100 to 0 as the newest transaction ages this many days
+TREND_DAYS = 7  # KPI trend changes compare the last this many days of data with the ones before
+
+# Shared WHERE clause: every filter is optional and bound as a parameter
+FILTERS = """
+    ($region IS NULL OR store_location = $region)
+    AND ($location IS NULL OR city = $location)
+    AND ($brand IS NULL OR brand = $brand)
+    AND ($category IS NULL OR category = $category)
+    AND ($start IS NULL OR date >= CAST($start AS DATE))
+    AND ($end IS NULL OR date <= CAST($end AS DATE))
+"""
+FILTER_PARAMS = ["region", "location", "brand", "category", "start", "end"]
+
+QUERIES = {
+    # KPIMetrics: substitutionRate is the share of transactions whose brand is a known
+    # substitute; trend changes are % growth of the last $trend_days days over the ones before
+    "kpi": f"""
+        WITH filtered AS (SELECT * FROM transactions WHERE {FILTERS}),
+        bounds AS (SELECT max(date) AS last_day FROM filtered),
+        totals AS (
+            SELECT count(*) AS transactions,
+                   coalesce(avg(revenue), 0) AS avgValue,
+                   coalesce(sum(revenue), 0) AS revenue,
+                   count(DISTINCT consumer_id) AS consumers,
+                   coalesce(100 * avg(CAST(brand IN (SELECT substitution FROM substitutes) AS DOUBLE)), 0)
+                       AS substitutionRate,
+                   coalesce(greatest(0, 100 - 100 * date_diff('day', max(date), current_date) / $freshness_days), 0)
+                       AS dataFreshness,
+                   count(*) FILTER (WHERE date > last_day - $trend_days) AS recent_transactions,
+                   count(*) FILTER (WHERE date <= last_day - $trend_days
+                                    AND date > last_day - 2 * $trend_days) AS previous_transactions,
+                   sum(revenue) FILTER (WHERE date > last_day - $trend_days) AS recent_revenue,
+                   sum(revenue) FILTER (WHERE date <= last_day - $trend_days
+                                        AND date > last_day - 2 * $trend_days) AS previous_revenue,
+                   count(DISTINCT consumer_id) FILTER (WHERE date > last_day - $trend_days) AS recent_consumers,
+                   count(DISTINCT consumer_id) FILTER (WHERE date <= last_day - $trend_days
+                                                       AND date > last_day - 2 * $trend_days) AS previous_consumers
+            FROM filtered, bounds
+        )
+        SELECT transactions, avgValue, substitutionRate, dataFreshness,
+               [{{'label': 'Transactions', 'value': CAST(transactions AS DOUBLE),
+                  'change': coalesce((recent_transactions / nullif(previous_transactions, 0) - 1) * 100, 0)}},
+                {{'label': 'Revenue', 'value': CAST(revenue AS DOUBLE),
+                  'change': coalesce((recent_revenue / nullif(previous_revenue, 0) - 1) * 100, 0)}},
+                {{'label': 'Active Consumers', 'value': CAST(consumers AS DOUBLE),
+                  'change': coalesce((recent_consumers / nullif(previous_consumers, 0) - 1) * 100, 0)}}]
+                   AS trendsData
+        FROM totals
+    """,
+    "locations": f"""
+        SELECT city AS location, any_value(store_location) AS region,
+               count(*) AS transactions, sum(revenue) AS revenue,
+               [any_value(longitude), any_value(latitude)] AS coordinates
+        FROM transactions WHERE {FILTERS}
+        GROUP BY city ORDER BY revenue DESC
+    """,
+    "categories": f"""
+        SELECT category, sum(revenue) AS value,
+               sum(revenue) * 100 / sum(sum(revenue)) OVER () AS percentage
+        FROM transactions WHERE {FILTERS}
+        GROUP BY category ORDER BY value DESC
+    """,
+    "brands": f"""
+        SELECT brand, any_value(category) AS category, sum(revenue) AS sales,
+               count(*) AS transactions
+        FROM transactions WHERE {FILTERS}
+        GROUP BY brand ORDER BY sales DESC
+        LIMIT coalesce(CAST($limit AS INTEGER), 1000)
+    """,
+    "trends": f"""
+        SELECT strftime(date, '%Y-%m-%d') AS period, count(*) AS transactions,
+               sum(revenue) AS pesoValue
+        FROM transactions WHERE {FILTERS}
+        GROUP BY date ORDER BY date
+    """,
+    "transactions": f"""
+        SELECT * EXCLUDE (revenue)
+        FROM transactions WHERE {FILTERS}
+        ORDER BY date DESC
+        LIMIT coalesce(CAST($limit AS INTEGER), 100) OFFSET coalesce(CAST($offset AS INTEGER), 0)
+    """,
+    # One row per requested brand, in request order. Growth compares the last $days days
+    # of data with the $days before them (0 without earlier data, as in the Node route)
+    "compare": """
+        WITH bounds AS (SELECT max(date) AS last_day FROM transactions),
+        requested AS (
+            SELECT unnest(string_split($brands, ',')) AS brand,
+                   generate_subscripts(string_split($brands, ','), 1) AS position
+        )
+        SELECT requested.brand,
+               {'totalValue': coalesce(sum(revenue), 0),
+                'transactionCount': count(transactions.brand),
+                'averageTransaction': coalesce(avg(revenue), 0),
+                'growth': coalesce((sum(revenue) FILTER (WHERE date > last_day - CAST($days AS INTEGER))
+                                    / nullif(sum(revenue) FILTER (WHERE date <= last_day - CAST($days AS INTEGER)
+                                                                  AND date > last_day - 2 * CAST($days AS INTEGER)), 0)
+                                    - 1) * 100, 0)} AS metrics
+        FROM requested CROSS JOIN bounds
+        LEFT JOIN transactions ON transactions.brand = requested.brand
+        GROUP BY requested.brand, requested.position ORDER BY requested.position
+    """,
+}
+QUERY_PARAMS = {
+    "kpi": FILTER_PARAMS,
+    "locations": FILTER_PARAMS,
+    "categories": FILTER_PARAMS,
+    "brands": FILTER_PARAMS + ["limit"],
+    "trends": FILTER_PARAMS,
+    "transactions": FILTER_PARAMS + ["limit", "offset"],
+    "compare": ["brands", "days"],
+}
+ROUTES = {
+    "/api/dashboard/kpi": "kpi",
+    "/api/dashboard/locations": "locations",
+    "/api/dashboard/categories": "categories",
+    "/api/dashboard/brands": "brands",
+    "/api/dashboard/trends": "trends",
+    "/api/transactions": "transactions",
+    "/api/compare": "compare",
+}
+
+
+def require_duckdb():
+    if duckdb is None:
+        raise RuntimeError("The query service requires duckdb (pip install duckdb)")
+
+
+def to_arrow(result):
+    """Arrow table of a DuckDB result (to_arrow_table replaced fetch_arrow_table in 1.4)"""
+    fetch = getattr(result, "to_arrow_table", None) or result.fetch_arrow_table
+    return fetch()
+
+
+def period_days(period):
+    """'30d' / '12w' / '3m' -> days"""
+    units = {"d": 1, "w": 7, "m": 30}
+    return int(period[:-1]) * units[period[-1]] if period and period[-1] in units else int(period)
+
+
+class QueryService:
+    """DuckDB views over a directory of Parquet outputs"""
+
+    def __init__(self, data_dir=PARQUET_DIR, threads=None):
+        require_duckdb()
+        self.data_dir = Path(data_dir)
+        self.connection = duckdb.connect()
+        if threads:
+            self.connection.execute(f"SET threads = {int(threads)}")
+        self.views = self.register_views()
+
+    def _create_view(self, name, source):
+        self.connection.execute(f'CREATE OR REPLACE VIEW "{name}" AS SELECT * FROM {source}')
+
+    def register_views(self):
+        """Create a view per dataset; returns {view name: source path}"""
+        views = parquet_datasets(self.data_dir)
+        for name, path in views.items():
+            if path.is_dir():
+                pattern = (path / "**" / "*.parquet").as_posix()
+                self._create_view(name, f"read_parquet('{pattern}', hive_partitioning = true)")
+            else:
+                self._create_view(name, f"read_parquet('{path.as_posix()}')")
+
+        if "transaction_trends" in views:
+            columns = {row[0] for row in self.connection.execute("DESCRIBE transaction_trends").fetchall()}
+            # Revenue is the post-discount final_price when rows carry it
+            revenue = "final_price" if "final_price" in columns else "peso_value"
+            # month is only the partition key of the partitioned layout
+            exclude = " EXCLUDE (month)" if "month" in columns and "date" in columns else ""
+            self.connection.execute(
+                f"CREATE OR REPLACE VIEW transactions AS SELECT *{exclude}, {revenue} AS revenue FROM transaction_trends")
+
+        # Brands known as substitutes, for the KPI substitutionRate (none without substitution_patterns)
+        if "substitution_patterns" in views:
+            self.connection.execute(
+                "CREATE OR REPLACE VIEW substitutes AS SELECT DISTINCT CAST(substitution AS VARCHAR) AS substitution "
+                "FROM substitution_patterns")
+        else:
+            self.connection.execute(
+                "CREATE OR REPLACE VIEW substitutes AS SELECT CAST(NULL AS VARCHAR) AS substitution WHERE false")
+        return views
+
+    def query(self, name, params=None):
+        """Run a named query; returns an Arrow table"""
+        if name not in QUERIES:
+            raise KeyError(f"Unknown query {name!r}")
+        params = params or {}
+        bound = {key: params.get(key) for key in QUERY_PARAMS[name]}
+        if name == "kpi":
+            bound.update(freshness_days=FRESHNESS_DAYS, trend_days=TREND_DAYS)
+        if name == "compare":
+            bound["days"] = period_days(params.get("period") or "30d")
+        # One cursor per call so concurrent HTTP requests don't share state
+        cursor = self.connection.cursor()
+        try:
+            return to_arrow(cursor.execute(QUERIES[name], bound))
+        finally:
+            cursor.close()
+
+    def sql(self, statement, params=None):
+        """Run ad-hoc SQL against the registered views; returns an Arrow table"""
+        cursor = self.connection.cursor()
+        try:
+            return to_arrow(cursor.execute(statement, params or {}))
+        finally:
+            cursor.close()
+
+
+def payload(name, table, params=None):
+    """JSON body of a query result, in the shape the Node route returns"""
+    rows = table.to_pylist()
+    if name == "kpi":
+        return rows[0]
+    if name == "compare":
+        return {"comparisons": rows, "period": (params or {}).get("period") or "30d"}
+    return rows
+
+
+def json_default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def arrow_ipc_bytes(table):
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def make_handler(service):
+    class QueryHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            name = ROUTES.get(url.path.rstrip("/"))
+            if name is None:
+                return self.send_json(404, {"error": f"Unknown endpoint {url.path}"})
+            params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+            try:
+                table = service.query(name, params)
+            except (duckdb.Error, ValueError) as e:
+                return self.send_json(400, {"error": str(e)})
+
+            if params.get("format") == "arrow" or ARROW_STREAM in self.headers.get("Accept", ""):
+                self.send_body(200, ARROW_STREAM, arrow_ipc_bytes(table))
+            else:
+                self.send_json(200, payload(name, table, params))
+
+        def send_json(self, status, payload):
+            self.send_body(status, "application/json", json.dumps(payload, default=json_default).encode())
+
+        def send_body(self, status, content_type, body):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # keep the console for the startup summary
+
+    return QueryHandler
+
+
+def serve(service, port=QUERY_PORT, host="127.0.0.1"):
+    server = ThreadingHTTPServer((host, port), make_handler(service))
+    print(f"✅ Query service listening on http://{host}:{port}")
+    for route in ROUTES:
+        print(f"  GET {route}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="SQL query service over the Parquet outputs")
+    parser.add_argument("--data-dir", default=str(PARQUET_DIR),
+                        help="directory of Parquet outputs, or a local mirror of the blob container")
+    parser.add_argument("--port", type=int, default=QUERY_PORT)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--threads", type=int, default=None, help="DuckDB worker threads (default: all cores)")
+    parser.add_argument("--query", choices=sorted(QUERIES), help="run one query, print JSON and exit")
+    parser.add_argument("--param", action="append", default=[], metavar="KEY=VALUE",
+                        help="query parameter (repeatable), e.g. --param region=NCR")
+    args = parser.parse_args()
+
+    service = QueryService(args.data_dir, args.threads)
+    print(f"📁 Registered {len(service.views)} views from {args.data_dir}: {', '.join(service.views)}")
+
+    if args.query:
+        params = dict(param.split("=", 1) for param in args.param)
+        print(json.dumps(payload(args.query, service.query(args.query, params), params), indent=2,
+                         default=json_default))
+    else:
+        serve(service, args.port, args.host)
@@ -4,52 +4,249 @@ Read Parquet files from Azure Blob Storage
 Example script showing how to query Parquet data efficiently
 """
 
+import asyncio
 import os
+import threading
 import pandas as pd
+import requests
 import pyarrow.parquet as pq
+from azure.core import MatchConditions
 from azure.storage.blob import BlobServiceClient
+from azure.core.pipeline.transport import RequestsTransport
 from azure.identity import DefaultAzureCredential
 import io
-from datetime import datetime
+from datetime import datetime, date, timedelta
+from urllib.parse import unquote
+
+from blob_cache import CACHE_BUDGET_MB, BlobCache
+from dashboard_rollups import ROLLUPS, query_rollup
+from instrumentation import azure_retry_hook, count, span
 
 # Configuration
 AZURE_STORAGE_ACCOUNT = os.environ.get('AZURE_STORAGE_ACCOUNT', 'your-storage-account')
 CONTAINER_NAME = os.environ.get('AZURE_CONTAINER_NAME', 'dashboard-data')
 CONNECTION_STRING = os.environ.get('AZURE_STORAGE_CONNECTION_STRING')
+PARTITIONED_PREFIX = "parquet/transaction_trends/"
+READ_CONCURRENCY = int(os.environ.get('AZURE_READ_CONCURRENCY', 8))  # pooled connections / parallel reads
+
+_client = None
+_client_lock = threading.Lock()
+
+# Fetched byte ranges are cached on local disk per blob ETag (AZURE_BLOB_CACHE_MB=0 disables)
+blob_cache = BlobCache() if CACHE_BUDGET_MB > 0 else None
 
 def get_blob_service_client():
-    """Get Azure Blob Service Client"""
-    if CONNECTION_STRING:
-        return BlobServiceClient.from_connection_string(CONNECTION_STRING)
-    else:
-        account_url = f"https://{AZURE_STORAGE_ACCOUNT}.blob.core.windows.net"
-        credential = DefaultAzureCredential()
-        return BlobServiceClient(account_url, credential=credential)
-
-def read_parquet_from_blob(blob_name):
+    """Get the shared Azure Blob Service Client"""
+    # One client per process: its credential caches the access token and its
+    # transport keeps a pool of open TLS connections, so repeated reads skip
+    # both the token fetch and the handshake. The client is thread-safe.
+    global _client
+    with _client_lock:
+        if _client is None:
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=READ_CONCURRENCY)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            transport = RequestsTransport(session=session, session_owner=False)
+            if CONNECTION_STRING:
+                _client = BlobServiceClient.from_connection_string(CONNECTION_STRING, transport=transport)
+            else:
+                account_url = f"https://{AZURE_STORAGE_ACCOUNT}.blob.core.windows.net"
+                credential = DefaultAzureCredential()
+                _client = BlobServiceClient(account_url, credential=credential, transport=transport)
+        return _client
+
+class BlobRangeFile(io.RawIOBase):
+    """Read-only, seekable view of a blob that downloads only the byte ranges read from it
+
+    Given a BlobCache, ranges come from the local copy when it already holds
+    them, and newly downloaded ones are added to it.
+    """
+    
+    def __init__(self, blob_client, cache=None):
+        self.blob_client = blob_client
+        properties = blob_client.get_blob_properties()
+        self.size = properties.size
+        self.etag = properties.etag
+        self.cache = cache
+        if cache is not None:
+            cache.open(blob_client.blob_name, self.etag, self.size)
+        self.position = 0
+        self.bytes_fetched = 0
+        self.requests = 0
+        # The last range fetched; pyarrow re-reads parts of the footer it has already seen
+        self._cached_offset = 0
+        self._cached = b""
+    
+    def readable(self):
+        return True
+    
+    def seekable(self):
+        return True
+    
+    def tell(self):
+        return self.position
+    
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self.position
+        elif whence == io.SEEK_END:
+            offset += self.size
+        self.position = max(0, offset)
+        return self.position
+    
+    def readinto(self, buffer):
+        length = min(len(buffer), self.size - self.position)
+        if length <= 0:
+            return 0
+        start = self.position - self._cached_offset
+        if 0 <= start and start + length <= len(self._cached):
+            data = self._cached[start:start + length]
+        else:
+            if self.cache is not None:
+                data = self.cache.read(self.blob_client.blob_name, self.position, length, self._fetch)
+            else:
+                data = self._fetch(self.position, length)
+            self._cached_offset, self._cached = self.position, data
+        buffer[:len(data)] = data
+        self.position += len(data)
+        return len(data)
+    
+    def _fetch(self, offset, length):
+        """Download one byte range of the version opened (fails if the blob has changed since)"""
+        data = self.blob_client.download_blob(offset=offset, length=length, etag=self.etag,
+                                              match_condition=MatchConditions.IfNotModified,
+                                              retry_hook=azure_retry_hook).readall()
+        self.bytes_fetched += len(data)
+        self.requests += 1
+        count("bytes_fetched", len(data))
+        count("range_requests")
+        return data
+
+def read_parquet_from_blob(blob_name, columns=None, filters=None):
     """Read a Parquet file from Azure Blob Storage"""
-    try:
-        blob_service_client = get_blob_service_client()
-        container_client = blob_service_client.get_container_client(CONTAINER_NAME)
-        blob_client = container_client.get_blob_client(blob_name)
-        
-        # Download blob to memory
-        blob_data = blob_client.download_blob().readall()
-        
-        # Read Parquet from bytes
-        df = pd.read_parquet(io.BytesIO(blob_data))
-        
-        return df
+    with span("read_parquet_from_blob", blob=blob_name) as trace:
+        try:
+            blob_service_client = get_blob_service_client()
+            container_client = blob_service_client.get_container_client(CONTAINER_NAME)
+            blob_client = container_client.get_blob_client(blob_name)
+            
+            # pyarrow reads the footer first, then only the column chunks of the
+            # requested columns in row groups whose statistics can match the filters.
+            # pre_buffer coalesces nearby chunks into fewer range requests. With the
+            # cache, ranges fetched by earlier reads of this blob version come from disk.
+            with BlobRangeFile(blob_client, blob_cache) as f:
+                path = blob_cache.complete_path(blob_name) if blob_cache is not None else None
+                if path is not None:
+                    # Every byte is cached: memory-map the local copy
+                    table = pq.read_table(path, columns=columns, filters=filters, memory_map=True)
+                else:
+                    table = pq.read_table(f, columns=columns, filters=filters, pre_buffer=True)
+                print(f"  {blob_name}: fetched {f.bytes_fetched / 1024:.2f} of {f.size / 1024:.2f} KB "
+                      f"in {f.requests} range requests")
+            trace.count("rows", table.num_rows)
+            
+            return table.to_pandas()
+            
+        except Exception as e:
+            trace.set("error", str(e))
+            print(f"Error reading {blob_name}: {str(e)}")
+            return None
+
+async def read_parquet_datasets(requests_by_name):
+    """Read several Parquet blobs concurrently over the shared client
+    
+    requests_by_name maps a result key to a blob name, or to a
+    (blob_name, columns) tuple. Returns {key: DataFrame or None}.
+    """
+    semaphore = asyncio.Semaphore(READ_CONCURRENCY)
+    
+    async def read_one(spec):
+        blob_name, columns = spec if isinstance(spec, tuple) else (spec, None)
+        async with semaphore:
+            return await asyncio.to_thread(read_parquet_from_blob, blob_name, columns)
+    
+    keys = list(requests_by_name)
+    frames = await asyncio.gather(*(read_one(requests_by_name[key]) for key in keys))
+    return dict(zip(keys, frames))
+
+def list_partitions():
+    """List the files of the partitioned transaction dataset with their month/region keys"""
+    blob_service_client = get_blob_service_client()
+    container_client = blob_service_client.get_container_client(CONTAINER_NAME)
+    
+    partitions = []
+    for blob in container_client.list_blobs(name_starts_with=PARTITIONED_PREFIX):
+        keys = dict(
+            part.split("=", 1) for part in blob.name[len(PARTITIONED_PREFIX):].split("/") if "=" in part
+        )
+        if "month" in keys and "store_location" in keys:
+            partitions.append({
+                "blob_name": blob.name,
+                "month": keys["month"],
+                "store_location": unquote(keys["store_location"])
+            })
+    return partitions
+
+def read_partitioned_transactions(region=None, start_date=None, end_date=None, columns=None):
+    """Read transactions for a region/date window, downloading only the matching partitions"""
+    start_month = start_date.strftime("%Y-%m") if start_date else None
+    end_month = end_date.strftime("%Y-%m") if end_date else None
+    
+    filters = []
+    if start_date:
+        filters.append(("date", ">=", start_date))
+    if end_date:
+        filters.append(("date", "<=", end_date))
+    
+    frames = []
+    for partition in list_partitions():
+        # Prune whole files by their partition path before downloading anything
+        if region and partition["store_location"] != region:
+            continue
+        if start_month and partition["month"] < start_month:
+            continue
+        if end_month and partition["month"] > end_month:
+            continue
         
-    except Exception as e:
-        print(f"Error reading {blob_name}: {str(e)}")
+        # Row groups outside the date window are skipped using their statistics
+        df = read_parquet_from_blob(partition["blob_name"], columns, filters or None)
+        if df is None:
+            continue
+        df["store_location"] = partition["store_location"]
+        frames.append(df)
+    
+    if not frames:
         return None
+    return pd.concat(frames, ignore_index=True)
+
+def query_region_example(region="NCR", days=30):
+    """Example: Read one region's recent transactions from the partitioned dataset"""
+    print(f"\n📊 Reading the last {days} days of {region} transactions from Azure...")
+    
+    partitions = list_partitions()
+    if not partitions:
+        print("  No partitioned dataset found (run convert-to-parquet.py --partitioned)")
+        return
+    
+    # Anchor the window on the latest month in the dataset
+    latest_month = max(p["month"] for p in partitions if p["month"] != "__HIVE_DEFAULT_PARTITION__")
+    year, month = map(int, latest_month.split("-"))
+    end_date = (date(year, month, 28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+    start_date = end_date - timedelta(days=days)
+    
+    df = read_partitioned_transactions(region, start_date, end_date,
+                                       columns=["date", "brand", "peso_value"])
+    if df is not None:
+        print(f"✓ Loaded {len(df)} transaction records ({start_date} to {end_date})")
+        print(df.groupby("brand")["peso_value"].sum().nlargest(5).round(2).to_string())
 
 def query_transactions_example():
     """Example: Query transaction data with filters"""
     print("📊 Reading transaction trends from Azure...")
     
-    df = read_parquet_from_blob("parquet/transaction_trends.parquet")
+    columns = ['date', 'brand', 'peso_value', 'store_location', 'time_of_day', 'is_weekend', 'units']
+    df = read_parquet_from_blob("parquet/transaction_trends.parquet", columns=columns)
     
     if df is not None:
         print(f"✓ Loaded {len(df)} transaction records")
@@ -78,7 +275,8 @@ def query_brands_example():
     """Example: Analyze brand performance"""
     print("\n📊 Reading brand trends from Azure...")
     
-    df = read_parquet_from_blob("parquet/brand_trends.parquet")
+    df = read_parquet_from_blob("parquet/brand_trends.parquet",
+                                columns=['brand', 'category', 'value', 'pct_change'])
     
     if df is not None:
         print(f"✓ Loaded {len(df)} brand records")
@@ -108,6 +306,28 @@ def query_time_patterns_example():
             peak_hours = df[df['is_peak'] == True][['hour', 'time_label', 'avg_transactions', 'total_revenue']]
             print(peak_hours.to_string(index=False))
 
+def query_rollups_example():
+    """Example: Answer dashboard tiles from the pre-aggregated rollups"""
+    print("\n📊 Reading rollups from Azure...")
+    
+    rollups = asyncio.run(read_parquet_datasets({
+        name: f"parquet/rollups/{name}.parquet" for name in ROLLUPS
+    }))
+    rollups = {name: df for name, df in rollups.items() if df is not None}
+    if not rollups:
+        print("  No rollups found (run convert-to-parquet.py)")
+        return
+    print(f"✓ Loaded {sum(len(df) for df in rollups.values())} rollup rows")
+    
+    print("\n1. Top 5 brands by revenue:")
+    print(query_rollup(rollups, ["brand"]).head(5).round(2).to_string(index=False))
+    
+    print("\n2. Category revenue in NCR:")
+    print(query_rollup(rollups, ["category"], [("store_location", "=", "NCR")]).round(2).to_string(index=False))
+    
+    print("\n3. Weekend vs Weekday performance:")
+    print(query_rollup(rollups, ["is_weekend"]).round(2).to_string(index=False))
+
 def list_available_files():
     """List all Parquet files in the container"""
     try:
@@ -127,9 +347,13 @@ def create_api_response_example():
     """Example: Create API response from Parquet data"""
     print("\n🔧 Creating API response from Parquet data...")
     
-    # Read multiple datasets
-    transactions = read_parquet_from_blob("parquet/transaction_trends.parquet")
-    brands = read_parquet_from_blob("parquet/brand_trends.parquet")
+    # Read multiple datasets at once
+    datasets = asyncio.run(read_parquet_datasets({
+        "transactions": "parquet/transaction_trends.parquet",
+        "brands": "parquet/brand_trends.parquet"
+    }))
+    transactions = datasets["transactions"]
+    brands = datasets["brands"]
     
     # Create response similar to original JSON structure
     response = {
@@ -161,12 +385,18 @@ if __name__ == "__main__":
     query_transactions_example()
     query_brands_example()
     query_time_patterns_example()
+    query_region_example()
+    query_rollups_example()
     
     # Create API response
     print("\n" + "="*50 + "\n")
     api_response = create_api_response_example()
     
     print("\n✅ Successfully queried Parquet data from Azure!")
+    if blob_cache is not None:
+        stats = blob_cache.stats()
+        print(f"  Blob cache: {stats['hits']} hits, {stats['misses']} misses, "
+              f"{stats['bytes_downloaded'] / 1024 / 1024:.2f} MB downloaded")
     print("\nBenefits of Parquet format:")
     print("- Columnar storage: Read only needed columns")
     print("- Compression: ~5-10x smaller than JSON")
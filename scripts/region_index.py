@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Point-in-polygon region assignment against the Philippine admin boundaries
+
+attached_assets/ph.json holds one MultiPolygon per region (properties id and
+name). RegionIndex loads it once into a uniform grid: every cell lists the
+polygons with an edge passing near it, and cells no edge comes near are
+resolved (to one region or to none) without any polygon test. Points are looked up in
+vectorized batches. Repeated coordinates (every transaction of a store) are
+resolved once. The remaining points are ray-cast only against the polygons
+listed for their cell. Points just off a simplified coastline snap to the
+nearest region within SNAP_DEGREES.
+
+Usage:
+    python region_index.py transaction_trends.parquet [-o transaction_regions.parquet]
+
+    from region_index import load_region_index
+    regions = load_region_index().lookup(latitudes, longitudes)  # region positions, -1 if none
+"""
+
+import argparse
+import json
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+GEOJSON_PATH = Path(__file__).parent.parent / "attached_assets" / "ph.json"
+CELL_DEGREES = 0.1  # grid cell size (about 11 km)
+SNAP_DEGREES = 0.05  # how far outside a polygon a point may still be assigned to it
+PIP_CHUNK = 4_000_000  # point x edge tests evaluated at once
+
+
+class RegionIndex:
+    """Grid index over region polygons"""
+
+    def __init__(self, features, cell_degrees=CELL_DEGREES):
+        self.ids = [feature["properties"]["id"] for feature in features]
+        self.names = [feature["properties"]["name"] for feature in features]
+        self.cell_degrees = cell_degrees
+
+        # One entry per polygon part: owning region, edges (x1, y1, x2, y2) of all its rings, bbox
+        self.polygon_region = []
+        self.polygon_edges = []
+        for region, feature in enumerate(features):
+            geometry = feature["geometry"]
+            polygons = geometry["coordinates"] if geometry["type"] == "MultiPolygon" else [geometry["coordinates"]]
+            for rings in polygons:
+                edges = []
+                for ring in rings:
+                    ring = np.asarray(ring, dtype=np.float64)[:, :2]
+                    edges.append(np.hstack([ring, np.roll(ring, -1, axis=0)]))
+                self.polygon_region.append(region)
+                self.polygon_edges.append(np.vstack(edges))
+        self.polygon_region = np.array(self.polygon_region)
+        self.polygon_bbox = np.array([
+            [min(e[:, 0].min(), e[:, 2].min()), min(e[:, 1].min(), e[:, 3].min()),
+             max(e[:, 0].max(), e[:, 2].max()), max(e[:, 1].max(), e[:, 3].max())]
+            for e in self.polygon_edges
+        ])
+        self._build_grid()
+
+    @classmethod
+    def load(cls, path=GEOJSON_PATH, cell_degrees=CELL_DEGREES):
+        with open(path) as f:
+            return cls(json.load(f)["features"], cell_degrees)
+
+    def _build_grid(self):
+        margin = SNAP_DEGREES
+        self.origin = self.polygon_bbox[:, :2].min(axis=0) - margin
+        extent = self.polygon_bbox[:, 2:].max(axis=0) + margin - self.origin
+        self.shape = tuple(int(n) for n in np.ceil(extent / self.cell_degrees).astype(int))
+        n_cells = self.shape[0] * self.shape[1]
+
+        # candidates[cell, polygon]: an edge of the polygon passes within SNAP_DEGREES of the cell.
+        # Regions don't overlap, so a point in such a cell can only belong to one of these
+        # polygons (a polygon containing the whole cell would overlap them).
+        self.candidates = np.zeros((n_cells, len(self.polygon_edges)), dtype=bool)
+        for polygon, edges in enumerate(self.polygon_edges):
+            lo = self._cell_xy(np.minimum(edges[:, :2], edges[:, 2:]) - margin)
+            hi = self._cell_xy(np.maximum(edges[:, :2], edges[:, 2:]) + margin)
+            for (x0, y0), (x1, y1) in zip(lo, hi):
+                xs, ys = np.meshgrid(np.arange(x0, x1 + 1), np.arange(y0, y1 + 1), indexing="ij")
+                self.candidates[(xs * self.shape[1] + ys).ravel(), polygon] = True
+
+        # Cells no edge comes near lie wholly inside one polygon or wholly outside all of
+        # them, so their centre decides every point in them: a polygon, or -1
+        self.cell_resolved = ~self.candidates.any(axis=1)
+        self.cell_polygon = np.full(n_cells, -1)
+        clear = np.nonzero(self.cell_resolved)[0]
+        centres = self.origin + (np.stack([clear // self.shape[1], clear % self.shape[1]], axis=1) + 0.5) \
+            * self.cell_degrees
+        for polygon, bbox in enumerate(self.polygon_bbox):
+            near = np.nonzero(np.all((centres >= bbox[:2]) & (centres <= bbox[2:]), axis=1))[0]
+            inside = near[self._contains(polygon, centres[near, 0], centres[near, 1])]
+            self.cell_polygon[clear[inside]] = polygon
+
+    def _cell_xy(self, points):
+        cell = np.floor((np.asarray(points) - self.origin) / self.cell_degrees).astype(int)
+        return np.clip(cell, 0, np.array(self.shape) - 1)
+
+    def _contains(self, polygon, x, y):
+        """Even-odd ray casting of points against every ring of one polygon"""
+        edges = self.polygon_edges[polygon]
+        inside = np.zeros(len(x), dtype=bool)
+        step = max(1, PIP_CHUNK // len(edges))
+        x1, y1, x2, y2 = (edges[:, i] for i in range(4))
+        for start in range(0, len(x), step):
+            px = x[start:start + step, None]
+            py = y[start:start + step, None]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                crosses = ((y1 > py) != (y2 > py)) & (px < (x2 - x1) * (py - y1) / (y2 - y1) + x1)
+            inside[start:start + step] = np.count_nonzero(crosses, axis=1) % 2 == 1
+        return inside
+
+    def lookup(self, latitude, longitude):
+        """Region position (into ids/names) of every point, -1 where none matches"""
+        latitude = np.asarray(latitude, dtype=np.float64)
+        longitude = np.asarray(longitude, dtype=np.float64)
+        valid = ~(np.isnan(latitude) | np.isnan(longitude))
+        result = np.full(len(latitude), -1)
+        if not valid.any():
+            return result
+
+        # Stores repeat their coordinates on every transaction, so resolve each point once
+        # (packed as complex numbers: a 1-D unique is an order of magnitude faster than axis=0)
+        unique, inverse = np.unique(longitude[valid] + 1j * latitude[valid], return_inverse=True)
+        x, y = unique.real.copy(), unique.imag.copy()
+        points = np.stack([x, y], axis=1)
+        in_grid = np.all((points >= self.origin) & (points < self.origin + np.array(self.shape) * self.cell_degrees),
+                         axis=1)
+        cell_xy = self._cell_xy(points)
+        cell = cell_xy[:, 0] * self.shape[1] + cell_xy[:, 1]
+        polygon = np.where(in_grid, self.cell_polygon[cell], -1)
+
+        # Points in cells near edges: ray-cast against the polygons listed for their cell,
+        # remembering the closest vertex for points that end up outside all of them
+        pending = np.nonzero(in_grid & ~self.cell_resolved[cell])[0]
+        nearest = np.full(len(points), -1)
+        nearest_distance = np.full(len(points), SNAP_DEGREES ** 2)
+        for candidate in range(len(self.polygon_edges)):
+            tested = pending[self.candidates[cell[pending], candidate]]
+            if not len(tested):
+                continue
+            hit = self._contains(candidate, x[tested], y[tested])
+            polygon[tested[hit]] = candidate
+            pending = pending[polygon[pending] < 0]
+            missed = tested[~hit]
+            vertices = self.polygon_edges[candidate][:, :2]
+            step = max(1, PIP_CHUNK // len(vertices))
+            for start in range(0, len(missed), step):
+                chunk = missed[start:start + step]
+                dx = x[chunk, None] - vertices[:, 0]
+                dy = y[chunk, None] - vertices[:, 1]
+                distance = (dx * dx + dy * dy).min(axis=1)
+                closer = distance < nearest_distance[chunk]
+                nearest[chunk[closer]] = candidate
+                nearest_distance[chunk[closer]] = distance[closer]
+        polygon[pending] = nearest[pending]
+
+        regions = np.where(polygon >= 0, self.polygon_region[np.maximum(polygon, 0)], -1)
+        result[valid] = regions[inverse.reshape(-1)]
+        return result
+
+    def region_columns(self, latitude, longitude):
+        """region_id and region name columns (dictionary-encoded) for the points"""
+        positions = self.lookup(latitude, longitude)
+        indices = pa.array(positions, mask=positions < 0, type=pa.int32())
+        return {
+            "region_id": pa.DictionaryArray.from_arrays(indices, pa.array(self.ids)),
+            "region": pa.DictionaryArray.from_arrays(indices, pa.array(self.names)),
+        }
+
+    def assign(self, table):
+        """Arrow table with region_id/region columns added (or replaced) from its coordinates"""
+        latitude = table.column("latitude").cast(pa.float64()).to_numpy(zero_copy_only=False)
+        longitude = table.column("longitude").cast(pa.float64()).to_numpy(zero_copy_only=False)
+        for name, column in self.region_columns(latitude, longitude).items():
+            if name in table.column_names:
+                table = table.set_column(table.column_names.index(name), name, column)
+            else:
+                table = table.append_column(name, column)
+        return table
+
+    def assign_rows(self, rows):
+        """Set region_id/region on transaction row dicts in place"""
+        positions = self.lookup(
+            [np.nan if row.get("latitude") is None else row["latitude"] for row in rows],
+            [np.nan if row.get("longitude") is None else row["longitude"] for row in rows])
+        for row, position in zip(rows, positions):
+            row["region_id"] = self.ids[position] if position >= 0 else None
+            row["region"] = self.names[position] if position >= 0 else None
+        return rows
+
+
+@lru_cache(maxsize=None)
+def load_region_index(path=GEOJSON_PATH):
+    """The region index for a GeoJSON file, built once per process"""
+    return RegionIndex.load(path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Assign transactions to regions by their coordinates")
+    parser.add_argument("input", help="transaction_trends.parquet")
+    parser.add_argument("-o", "--output", default="transaction_regions.parquet")
+    parser.add_argument("--geojson", default=str(GEOJSON_PATH))
+    args = parser.parse_args()
+
+    index = load_region_index(Path(args.geojson))
+    parquet_file = pq.ParquetFile(args.input)
+    writer = None
+    unmatched = 0
+    for batch in parquet_file.iter_batches():
+        table = index.assign(pa.Table.from_batches([batch]))
+        unmatched += table.column("region_id").null_count
+        if writer is None:
+            writer = pq.ParquetWriter(args.output, table.schema, compression='snappy')
+        writer.write_table(table)
+    if writer is not None:
+        writer.close()
+    print(f"✅ Assigned {parquet_file.metadata.num_rows - unmatched} of {parquet_file.metadata.num_rows} "
+          f"transactions to regions in {args.output}")
@@ -0,0 +1,19 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+# Modules without hyphens are also tested in-process
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+@pytest.fixture
+def run_script():
+    """Run a repo script in a subprocess (the scripts are CLIs, some with hyphenated names)"""
+    def run(script, *args, env=None, cwd=None):
+        result = subprocess.run([sys.executable, str(script), *map(str, args)], capture_output=True, text=True,
+                                env=env, cwd=cwd)
+        assert result.returncode == 0, result.stderr
+        return result
+    return run
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+import basket_mining
+from basket_mining import BasketMiner, cooccurrence
+
+
+def transaction(consumer_id, brand, date="2025-05-01", category="Snacks", units=1, peso_value=10.0):
+    return {"consumer_id": consumer_id, "date": date, "brand": brand, "category": category,
+            "units": units, "peso_value": peso_value}
+
+
+def test_rows_without_consumer_or_brand_are_not_mined():
+    rows = [transaction("C1", "A"), transaction("C1", "B"), transaction("C2", "A"), transaction("C2", "B")]
+    # Anonymous purchases would otherwise form one large basket of every brand
+    rows += [transaction(None, brand) for brand in "ABCDE" * 3]
+    rows += [transaction("C3", None), transaction("C3", "A"), transaction("C4", None), transaction("C4", "A")]
+
+    sections = BasketMiner().add_rows(rows).result()
+
+    assert [basket["basket_id"] for basket in sections["basket_analysis"]] == [
+        "BASKET0001", "BASKET0002", "BASKET0003", "BASKET0004"]
+    assert sum(basket["item_count"] for basket in sections["basket_analysis"]) == 6
+    pairs = {(rule["antecedent"], rule["consequent"]) for rule in sections["brand_associations"]}
+    assert pairs == {("A", "B"), ("B", "A")}
+    for pattern in sections["substitution_patterns"]:
+        assert None not in (pattern["original"], pattern["substitution"])
+
+
+def test_max_consumers_keeps_the_first_consumers_in_row_order():
+    rows = [transaction(f"C{i % 5}", "AB"[i % 2], units=i) for i in range(50)]
+
+    small_batches = BasketMiner(max_consumers=2).add_rows(rows, batch_size=3).result()
+    one_batch = BasketMiner(max_consumers=2).add_rows(rows).result()
+
+    assert small_batches == one_batch
+    assert sum(basket["item_count"] for basket in one_batch["basket_analysis"]) == sum(
+        row["units"] for row in rows if row["consumer_id"] in ("C0", "C1"))
+
+
+def test_cooccurrence_scales_with_observed_pairs_not_catalogue_size():
+    pytest.importorskip("scipy")
+    baskets = np.array([0, 0, 1, 1, 1, 2])
+    brands = np.array([5, 199_999, 5, 7, 199_999, 7])
+
+    a, b, count = cooccurrence(baskets, brands, 3, 200_000)  # dense would be 200k x 200k
+
+    pairs = {(int(x), int(y)): int(c) for x, y, c in zip(a, b, count)}
+    assert pairs == {(5, 5): 2, (5, 7): 1, (5, 199_999): 2, (7, 5): 1, (7, 7): 2, (7, 199_999): 1,
+                     (199_999, 5): 2, (199_999, 7): 1, (199_999, 199_999): 2}
+
+
+def test_numpy_fallback_mines_the_same_sections(monkeypatch):
+    rows = [transaction(f"C{i % 7}", "ABCD"[i % 4], date=f"2025-05-0{i % 3 + 1}", units=i % 5 + 1)
+            for i in range(200)]
+    with_scipy = BasketMiner().add_rows(rows).result()
+
+    monkeypatch.setattr(basket_mining, "sparse", None)
+    assert BasketMiner().add_rows(rows).result() == with_scipy
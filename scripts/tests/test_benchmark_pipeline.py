@@ -0,0 +1,51 @@
+import os
+import sys
+
+import pytest
+
+import benchmark_pipeline
+from benchmark_pipeline import compare_to_baseline, run_stage
+
+WORKERS = 4
+WORKER_MB = 64
+# A stage that fans out like the sharded generator: each worker holds WORKER_MB for a while
+FAN_OUT = f"""
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+def hold(_):
+    block = bytearray({WORKER_MB} * 1024 * 1024)
+    time.sleep(1)
+    return len(block)
+
+if __name__ == "__main__":
+    with ProcessPoolExecutor({WORKERS}) as pool:
+        list(pool.map(hold, range({WORKERS})))
+"""
+
+
+def test_peak_rss_covers_the_stage_process_tree(tmp_path):
+    pytest.importorskip("psutil")
+    result = run_stage("fan_out", [sys.executable, "-c", FAN_OUT], dict(os.environ), tmp_path / "stages.log")
+
+    assert result["status"] == "ok"
+    assert result["rss_scope"] == "process_tree"
+    # wait4 alone sees one worker's peak; the tree holds all of them at once
+    assert result["peak_rss_mb"] >= WORKERS * WORKER_MB > result["max_process_rss_mb"] >= WORKER_MB
+
+
+def test_without_psutil_the_single_process_peak_is_labelled(tmp_path, monkeypatch):
+    monkeypatch.setattr(benchmark_pipeline, "psutil", None)
+    result = run_stage("fan_out", [sys.executable, "-c", FAN_OUT], dict(os.environ), tmp_path / "stages.log")
+
+    assert result["rss_scope"] == "largest_process"
+    assert result["peak_rss_mb"] == result["max_process_rss_mb"]
+
+
+def test_peaks_of_different_scopes_are_not_compared():
+    before = {"size": "1k", "stage": "generate", "status": "ok", "seconds": 1.0, "peak_rss_mb": 100.0}
+    after = {**before, "peak_rss_mb": 400.0, "rss_scope": "process_tree", "max_process_rss_mb": 105.0}
+
+    assert compare_to_baseline([after], {"results": [before]}) == []
+    assert compare_to_baseline([{**after, "max_process_rss_mb": 150.0}], {"results": [before]}) == [
+        "1k generate max_process_rss_mb +50%"]
@@ -0,0 +1,89 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+from blob_cache import BlobCache
+
+SCRIPTS = Path(__file__).resolve().parent.parent
+BLOB = bytes(range(256)) * 64  # 16 KiB
+
+
+class Fetcher:
+    """Serves ranges of a blob and records each one requested"""
+
+    def __init__(self, data=BLOB):
+        self.data = data
+        self.requests = []
+
+    def __call__(self, offset, length):
+        self.requests.append((offset, length))
+        return self.data[offset:offset + length]
+
+
+def test_only_missing_ranges_are_downloaded(tmp_path):
+    cache, fetch = BlobCache(tmp_path), Fetcher()
+    cache.open("t.parquet", "v1", len(BLOB))
+
+    assert cache.read("t.parquet", 100, 50, fetch) == BLOB[100:150]
+    assert cache.read("t.parquet", 120, 100, fetch) == BLOB[120:220]
+    assert cache.read("t.parquet", 100, 120, fetch) == BLOB[100:220]
+
+    assert fetch.requests == [(100, 50), (150, 70)]
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 2
+    assert cache.complete_path("t.parquet") is None
+    cache.read("t.parquet", 0, len(BLOB), fetch)
+    assert cache.complete_path("t.parquet").read_bytes() == BLOB
+
+
+def test_a_new_etag_starts_a_new_copy(tmp_path):
+    cache = BlobCache(tmp_path)
+    cache.open("t.parquet", "v1", len(BLOB))
+    cache.read("t.parquet", 0, 10, Fetcher())
+
+    changed, fetch = bytes(reversed(BLOB)), Fetcher(bytes(reversed(BLOB)))
+    cache.open("t.parquet", "v2", len(changed))
+
+    assert cache.read("t.parquet", 0, 10, fetch) == changed[:10]
+    assert fetch.requests == [(0, 10)]
+    assert len(list(tmp_path.glob("*.parquet"))) == 1
+
+
+def test_instances_sharing_a_directory_keep_each_others_entries(tmp_path):
+    first, second = BlobCache(tmp_path), BlobCache(tmp_path)
+    first.open("a.parquet", "v1", len(BLOB))
+    second.open("b.parquet", "v1", len(BLOB))
+    first.read("a.parquet", 0, 1000, Fetcher())
+    second.read("b.parquet", 0, 1000, Fetcher())
+
+    assert set(BlobCache(tmp_path).index) == {"a.parquet", "b.parquet"}
+    fetch = Fetcher()
+    first.read("b.parquet", 0, 1000, fetch)
+    assert fetch.requests == []
+
+
+def test_budget_counts_blobs_cached_by_other_processes(tmp_path):
+    # Four processes each cache 8 blobs of 16 KiB under a 0.25 MiB budget (16 blobs)
+    worker = (
+        "import sys; sys.path.insert(0, sys.argv[1]); from blob_cache import BlobCache\n"
+        "cache = BlobCache(sys.argv[2], budget_mb=0.25)\n"
+        "data = bytes(16384)\n"
+        "for i in range(8):\n"
+        "    name = f'{sys.argv[3]}-{i}.parquet'\n"
+        "    cache.open(name, 'v1', len(data))\n"
+        "    cache.read(name, 0, len(data), lambda offset, length: data[offset:offset + length])\n"
+    )
+    processes = [subprocess.Popen([sys.executable, "-c", worker, str(SCRIPTS), str(tmp_path), f"p{n}"])
+                 for n in range(4)]
+    assert all(process.wait() == 0 for process in processes)
+
+    index = json.loads((tmp_path / "index.json").read_text())
+    files = list(tmp_path.glob("*.parquet"))
+    assert sum(entry["size"] for entry in index.values()) <= 0.25 * 1024 * 1024
+    assert sorted(path.name for path in files) == sorted(entry["file"] for entry in index.values())
+
+
+def test_unreferenced_blob_files_are_removed(tmp_path):
+    (tmp_path / "0123.parquet").write_bytes(BLOB)
+    BlobCache(tmp_path)
+    assert not (tmp_path / "0123.parquet").exists()
@@ -0,0 +1,58 @@
+import json
+import os
+from pathlib import Path
+
+import pyarrow.parquet as pq
+
+CONVERT = Path(__file__).resolve().parent.parent / "convert-to-parquet.py"
+
+
+def baseline_transactions(n=200):
+    """Transaction rows in the original generator's shape: no transaction_id, hour or store_location"""
+    brands = ["Oishi", "Tide", "Milo"]
+    return [
+        {"date": f"2025-03-{1 + i % 28:02d}", "volume": 500 + i, "peso_value": 100.0 + i, "duration": 30,
+         "units": 1 + i % 5, "brand": brands[i % 3], "category": "Snacks"}
+        for i in range(n)
+    ]
+
+
+def test_converts_transactions_without_transaction_id(tmp_path, run_script):
+    source = tmp_path / "dashboard_data.json"
+    source.write_text(json.dumps({"transaction_trends": baseline_transactions()}))
+    output = tmp_path / "parquet_output"
+
+    run_script(CONVERT, "--input", source, env={**os.environ, "PARQUET_OUTPUT_DIR": str(output)})
+
+    assert pq.read_metadata(output / "transaction_trends.parquet").num_rows == 200
+    metadata = json.loads((output / "conversion_metadata.json").read_text())
+    assert metadata["watermark"] is None
+
+
+def test_compression_ratio_counts_only_converted_sections(tmp_path, run_script):
+    source = tmp_path / "dashboard_data.json"
+    source.write_text(json.dumps({"transaction_trends": baseline_transactions()}))
+    output = tmp_path / "parquet_output"
+
+    run_script(CONVERT, "--input", source, env={**os.environ, "PARQUET_OUTPUT_DIR": str(output)})
+
+    metadata = json.loads((output / "conversion_metadata.json").read_text())
+    sections = sum(path.stat().st_size for path in output.glob("*.parquet"))
+    rollups = sum(path.stat().st_size for path in (output / "rollups").glob("*.parquet"))
+    assert metadata["total_parquet_size_mb"] * 1024 * 1024 == sections
+    assert metadata["derived_parquet_size_mb"]["rollups"] * 1024 * 1024 == rollups
+    assert metadata["total_compression_ratio"] == source.stat().st_size / sections
+
+
+def test_records_transaction_id_watermark(tmp_path, run_script):
+    rows = baseline_transactions()
+    for i, row in enumerate(rows):
+        row["transaction_id"] = f"TRX{i:06d}"
+    source = tmp_path / "dashboard_data.json"
+    source.write_text(json.dumps({"transaction_trends": rows}))
+    output = tmp_path / "parquet_output"
+
+    run_script(CONVERT, "--input", source, env={**os.environ, "PARQUET_OUTPUT_DIR": str(output)})
+
+    metadata = json.loads((output / "conversion_metadata.json").read_text())
+    assert metadata["watermark"] == {"column": "transaction_id", "value": "TRX000199"}
@@ -0,0 +1,100 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pyarrow.parquet as pq
+import pytest
+
+GENERATE = Path(__file__).resolve().parent.parent.parent / "dashboard_data_generate.py"
+MINED_SECTIONS = ["basket_analysis", "brand_associations", "substitution_patterns"]
+RSS_GROWTH_LIMIT_MB = 40  # allowed peak RSS growth from 4x the transactions in stream mode
+
+
+def peak_rss_mb(*args, cwd):
+    """Run the generator and return the peak resident memory of its process in MB"""
+    process = subprocess.Popen([sys.executable, str(GENERATE), *map(str, args)], cwd=cwd,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    _, status, usage = os.wait4(process.pid, 0)
+    assert status == 0
+    return usage.ru_maxrss / 1024
+
+
+def test_default_generation_keeps_placeholder_basket_sections(tmp_path, run_script):
+    run_script(GENERATE, "--seed", 1, "--output", tmp_path / "dashboard_data.json", cwd=tmp_path)
+
+    data = json.loads((tmp_path / "dashboard_data.json").read_text())
+    assert len(data["basket_analysis"]) == 500
+    assert data["substitution_patterns"]
+    assert "brand_associations" not in data
+
+
+def test_mine_baskets_fills_non_empty_sections(tmp_path, run_script):
+    run_script(GENERATE, "--seed", 1, "--mine-baskets", "--output", tmp_path / "dashboard_data.json", cwd=tmp_path)
+
+    data = json.loads((tmp_path / "dashboard_data.json").read_text())
+    for section in MINED_SECTIONS:
+        assert data[section], section
+
+
+def test_stream_mode_writes_the_same_mined_sections(tmp_path, run_script):
+    run_script(GENERATE, "--seed", 1, "--mine-baskets", "--output", tmp_path / "dashboard_data.json", cwd=tmp_path)
+    run_script(GENERATE, "--seed", 1, "--mine-baskets", "--stream", "--output", tmp_path / "stream", cwd=tmp_path)
+
+    data = json.loads((tmp_path / "dashboard_data.json").read_text())
+    for section in MINED_SECTIONS:
+        lines = (tmp_path / "stream" / f"{section}.ndjson").read_text().splitlines()
+        assert [json.loads(line) for line in lines] == data[section], section
+
+
+@pytest.mark.parametrize("options", [[], ["--mine-baskets"]], ids=["placeholders", "mined"])
+def test_stream_mode_memory_does_not_grow_with_transactions(tmp_path, options):
+    def peak(transactions):
+        return peak_rss_mb("--engine", "numpy", "--stream", "--format", "parquet", "--seed", 1,
+                           "--transactions", transactions, "--output", tmp_path / str(transactions), *options,
+                           cwd=tmp_path)
+
+    small, large = peak(250_000), peak(1_000_000)
+    assert large - small < RSS_GROWTH_LIMIT_MB, f"{small:.0f} MB -> {large:.0f} MB"
+
+
+@pytest.mark.parametrize("engine", ["python", "numpy"])
+def test_sharded_output_does_not_depend_on_worker_count(tmp_path, run_script, engine):
+    def generate(workers, seed=5):
+        output = tmp_path / f"{engine}-{workers}-{seed}"
+        run_script(GENERATE, "--engine", engine, "--seed", seed, "--shards", 4, "--workers", workers,
+                   "--rows", 300, "--transactions", 3000, "--stream", "--output", output, cwd=tmp_path)
+        return {path.name: path.read_bytes() for path in sorted(output.glob("*.ndjson"))}
+
+    single = generate(1)
+
+    assert generate(4) == single
+    assert generate(1, seed=6) != single
+    assert len(single["transaction_trends.ndjson"].splitlines()) == 3000
+
+
+@pytest.mark.parametrize("fmt", ["ndjson", "parquet"])
+def test_stream_mode_writes_the_requested_rows_in_chunks(tmp_path, run_script, fmt):
+    output = tmp_path / "stream"
+    run_script(GENERATE, "--seed", 1, "--stream", "--format", fmt, "--rows", 250, "--transactions", 2500,
+               "--chunk-size", 1000, "--output", output, cwd=tmp_path)
+
+    if fmt == "parquet":
+        metadata = pq.read_metadata(output / "transaction_trends.parquet")
+        assert metadata.num_rows == 2500
+        assert [metadata.row_group(i).num_rows for i in range(metadata.num_row_groups)] == [1000, 1000, 500]
+        assert pq.read_metadata(output / "consumer_profiling.parquet").num_rows == 250
+    else:
+        assert len((output / "transaction_trends.ndjson").read_text().splitlines()) == 2500
+        assert len((output / "consumer_profiling.ndjson").read_text().splitlines()) == 250
+
+
+def test_stream_mode_writes_the_same_rows_as_the_json_export(tmp_path, run_script):
+    run_script(GENERATE, "--seed", 1, "--rows", 200, "--output", tmp_path / "dashboard_data.json", cwd=tmp_path)
+    run_script(GENERATE, "--seed", 1, "--rows", 200, "--stream", "--output", tmp_path / "stream", cwd=tmp_path)
+
+    data = json.loads((tmp_path / "dashboard_data.json").read_text())
+    for section in ["transaction_trends", "consumer_profiling", "basket_analysis"]:
+        lines = (tmp_path / "stream" / f"{section}.ndjson").read_text().splitlines()
+        assert [json.loads(line) for line in lines] == data[section], section
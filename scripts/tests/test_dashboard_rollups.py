@@ -0,0 +1,41 @@
+from datetime import date
+
+import pyarrow as pa
+import pytest
+
+from dashboard_rollups import RollupBuilder, query_rollup
+
+
+@pytest.fixture
+def rollups():
+    rows = [
+        {"date": date(2025, 4, 30) if i < 4 else date(2025, 5, 5), "hour": 8 + i % 3, "brand": "AB"[i % 2],
+         "category": "Snacks", "store_location": "NCR" if i % 3 else "Visayas", "peso_value": 10.0 * (i + 1),
+         "units": 1, "time_of_day": "Morning", "day_of_week": "Wednesday", "is_weekend": False}
+        for i in range(10)
+    ]
+    tables = RollupBuilder().add(pa.Table.from_pylist(rows)).result()
+    return {name: table.to_pandas() for name, table in tables.items()}
+
+
+def test_rollup_answers_a_coarser_grouping(rollups):
+    result = query_rollup(rollups, ["brand"])
+
+    assert dict(zip(result["brand"], result["revenue"])) == {"A": 250.0, "B": 300.0}
+    assert result["transactions"].sum() == 10
+
+
+def test_iso_string_dates_filter_date_columns(rollups):
+    by_string = query_rollup(rollups, ["brand"], [("date", ">=", "2025-05-01")])
+    by_date = query_rollup(rollups, ["brand"], [("date", ">=", date(2025, 5, 1))])
+
+    assert by_string.equals(by_date)
+    assert by_string["transactions"].sum() == 6
+    in_list = query_rollup(rollups, [], [("date", "in", ["2025-04-30"]), ("store_location", "=", "NCR")])
+    assert in_list["transactions"].tolist() == [2]
+
+
+def test_string_filter_values_match_numeric_columns(rollups):
+    result = query_rollup(rollups, ["hour"], [("hour", "=", "8")])
+    assert result["hour"].tolist() == [8]
+    assert result["transactions"].tolist() == [4]
@@ -0,0 +1,11 @@
+import pyarrow as pa
+
+from parquet_schemas import apply_schema
+
+
+def test_transaction_coordinates_and_percentages_round_trip_exactly():
+    rows = [{"latitude": 14.5547, "longitude": 121.0244, "discount_percentage": 12.35, "margin_percentage": 0.1}]
+
+    table = apply_schema(pa.Table.from_pylist(rows), "transaction_trends")
+
+    assert table.to_pylist() == rows
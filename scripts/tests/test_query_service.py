@@ -0,0 +1,81 @@
+import json
+import threading
+from datetime import date, timedelta
+from http.server import ThreadingHTTPServer
+from urllib.request import urlopen
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+pytest.importorskip("duckdb")
+
+from query_service import QueryService, make_handler, payload
+
+KPI_FIELDS = {"transactions", "avgValue", "substitutionRate", "dataFreshness", "trendsData"}
+BRAND_METRICS = {"totalValue", "transactionCount", "averageTransaction", "growth"}
+
+
+@pytest.fixture
+def service(tmp_path):
+    last_day = date(2025, 5, 28)
+    # 28 days: Oishi every day (100 each), Tide on even days (50 each)
+    rows = [{"date": last_day - timedelta(days=i), "brand": "Oishi", "category": "Snacks", "peso_value": 100.0,
+             "store_location": "NCR", "city": "Manila", "consumer_id": f"C{i % 4}"} for i in range(28)]
+    rows += [{"date": last_day - timedelta(days=i), "brand": "Tide", "category": "Home Care", "peso_value": 50.0,
+              "store_location": "Visayas", "city": "Cebu", "consumer_id": f"C{i % 3}"} for i in range(0, 28, 2)]
+    pq.write_table(pa.Table.from_pylist(rows), tmp_path / "transaction_trends.parquet")
+    pq.write_table(pa.table({"original": ["Oishi"], "substitution": ["Tide"], "count": [5]}),
+                   tmp_path / "substitution_patterns.parquet")
+    return QueryService(tmp_path)
+
+
+def test_kpi_has_the_kpi_metrics_shape(service):
+    kpi = payload("kpi", service.query("kpi"))
+
+    assert set(kpi) == KPI_FIELDS
+    assert kpi["transactions"] == 42
+    assert kpi["avgValue"] == pytest.approx((28 * 100 + 14 * 50) / 42)
+    assert kpi["substitutionRate"] == pytest.approx(100 * 14 / 42)
+    assert 0 <= kpi["dataFreshness"] <= 100
+    trends = {trend["label"]: trend for trend in kpi["trendsData"]}
+    assert trends["Revenue"]["value"] == 28 * 100 + 14 * 50
+    assert trends["Active Consumers"]["value"] == 4
+    assert all(set(trend) == {"label", "value", "change"} for trend in kpi["trendsData"])
+
+
+def test_kpi_filters_apply_to_every_field(service):
+    kpi = payload("kpi", service.query("kpi", {"region": "NCR"}))
+    assert kpi["transactions"] == 28
+    assert kpi["substitutionRate"] == 0
+
+
+def test_compare_nests_metrics_per_requested_brand_and_echoes_the_period(service):
+    params = {"brands": "Tide,Unknown,Oishi", "period": "7d"}
+    body = payload("compare", service.query("compare", params), params)
+
+    assert body["period"] == "7d"
+    assert [row["brand"] for row in body["comparisons"]] == ["Tide", "Unknown", "Oishi"]
+    tide, unknown, oishi = (row["metrics"] for row in body["comparisons"])
+    assert set(tide) == BRAND_METRICS
+    assert tide["totalValue"] == 700 and tide["transactionCount"] == 14
+    assert unknown == {"totalValue": 0, "transactionCount": 0, "averageTransaction": 0, "growth": 0}
+    assert oishi["averageTransaction"] == 100 and oishi["growth"] == 0
+
+
+def test_http_routes_serve_the_node_shapes(service):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(service))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        with urlopen(f"{base}/api/dashboard/kpi") as response:
+            assert set(json.load(response)) == KPI_FIELDS
+        with urlopen(f"{base}/api/compare?brands=Oishi") as response:
+            body = json.load(response)
+        assert body["period"] == "30d"
+        assert body["comparisons"][0]["brand"] == "Oishi"
+        assert set(body["comparisons"][0]["metrics"]) == BRAND_METRICS
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,62 @@
+import numpy as np
+import pyarrow as pa
+
+from region_index import load_region_index
+
+# (latitude, longitude, region id) of store cities
+CITIES = [
+    (14.5995, 120.9842, "PH00"),  # Manila
+    (14.5547, 121.0244, "PH00"),  # Makati
+    (10.3157, 123.8854, "PH07"),  # Cebu City
+    (10.7202, 122.5621, "PH06"),  # Iloilo City
+    (7.1907, 125.4553, "PH11"),   # Davao City
+    (8.4822, 124.6472, "PH10"),   # Cagayan de Oro
+]
+
+
+def ray_cast_region(index, latitude, longitude):
+    """Region of the first polygon containing the point by testing every edge, or -1"""
+    for polygon, edges in enumerate(index.polygon_edges):
+        x1, y1, x2, y2 = edges.T
+        crosses = ((y1 > latitude) != (y2 > latitude)) & (
+            longitude < x1 + (latitude - y1) * (x2 - x1) / np.where(y2 == y1, 1, y2 - y1))
+        if crosses.sum() % 2:
+            return index.polygon_region[polygon]
+    return -1
+
+
+def test_store_cities_fall_in_their_regions():
+    index = load_region_index()
+    latitude, longitude, expected = zip(*CITIES)
+
+    positions = index.lookup(latitude, longitude)
+
+    assert [index.ids[position] for position in positions] == list(expected)
+
+
+def test_points_at_sea_or_without_coordinates_get_no_region():
+    index = load_region_index()
+    assert index.lookup([15.0, np.nan, 0.0], [118.0, 121.0, 0.0]).tolist() == [-1, -1, -1]
+
+
+def test_grid_lookup_matches_a_full_polygon_scan():
+    index = load_region_index()
+    rng = np.random.default_rng(7)
+    latitude, longitude = rng.uniform(5, 19, 300), rng.uniform(117, 127, 300)
+
+    positions = index.lookup(latitude, longitude)
+
+    for lat, lon, position in zip(latitude, longitude, positions):
+        inside = ray_cast_region(index, lat, lon)
+        if inside >= 0:  # points off the coast may also snap to a nearby region
+            assert position == inside, (lat, lon)
+
+
+def test_assign_adds_region_columns_to_tables_and_rows():
+    index = load_region_index()
+    table = index.assign(pa.table({"latitude": [14.5995, 15.0], "longitude": [120.9842, 118.0]}))
+    rows = index.assign_rows([{"latitude": 14.5995, "longitude": 120.9842}, {"latitude": None, "longitude": None}])
+
+    assert table.column("region_id").to_pylist() == ["PH00", None]
+    assert table.column("region").to_pylist() == ["National Capital Region", None]
+    assert [row["region_id"] for row in rows] == ["PH00", None]
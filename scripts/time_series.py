@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Daily and hourly time series per brand, category and region, with rolling
+windows, week-over-week changes and a batched demand forecast
+
+The series are built from the hourly rollups (brand_day_hour and
+region_day_hour, see dashboard_rollups.py), which are kept up to date by every
+conversion, including incremental ones. Each dimension becomes one dense
+series x time matrix. Every statistic is then a few whole-matrix numpy
+operations, so thousands of series refresh together without a per-series
+loop:
+
+- 7d and 28d rolling sums: differences of a cumulative sum. They are null
+  until a series has a full window.
+- Week-over-week: the change against the same day (or hour) a week earlier,
+  and the change of the rolling 7-day sum against the previous 7 days.
+- Forecast: a linear trend plus day-of-week seasonality, fitted by least
+  squares to the last 28 days of every series at once. It is projected
+  FORECAST_DAYS ahead, with a 95% band from the fit residuals.
+
+Outputs (parquet_output/time_series/):
+    daily.parquet     dimension, key, date, measures and rolling/WoW columns
+    hourly.parquet    the same per hour for the last HOURLY_DAYS days
+                      (windows of 168 and 672 hours)
+    forecast.parquet  dimension, key, date, forecast revenue/transactions and band
+
+Usage:
+    python time_series.py                                  # from parquet_output/rollups
+    python time_series.py --transactions ../parquet_output/transaction_trends
+"""
+
+import argparse
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from dashboard_rollups import build_rollups_from_parquet
+
+PARQUET_DIR = Path(os.environ.get('PARQUET_OUTPUT_DIR', Path(__file__).parent.parent / "parquet_output"))
+WINDOWS = {"7d": 7, "28d": 28}
+WEEK = 7
+FORECAST_DAYS = 14
+FORECAST_WINDOW = 28  # days of history each forecast is fitted to (whole weeks)
+HOURLY_DAYS = 28  # most recent days written to hourly.parquet
+Z_95 = 1.96
+MEASURES = ["transactions", "revenue", "units"]
+
+# dimension -> (rollup, key column)
+DIMENSIONS = {
+    "all": ("region_day_hour", None),
+    "brand": ("brand_day_hour", "brand"),
+    "category": ("brand_day_hour", "category"),
+    "region": ("region_day_hour", "store_location"),
+}
+SOURCE_ROLLUPS = sorted({rollup for rollup, _ in DIMENSIONS.values()})
+
+
+def _plain(column):
+    if pa.types.is_dictionary(column.type):
+        return column.cast(column.type.value_type)
+    return column
+
+
+def dense_series(rollups, hourly, first_day=None):
+    """{dimension: (keys, {measure: series x bucket matrix})} on one shared time axis
+
+    Buckets are days, or hours when hourly is set; bucket 0 is start (returned
+    too). Rows before first_day (days since the epoch) are left out. Returns
+    ({}, None) when no source rollup has a dated row.
+    """
+    days = []
+    for name in set(SOURCE_ROLLUPS) & set(rollups):
+        day = _plain(rollups[name].column("date")).cast(pa.date32()).cast(pa.int32())
+        if pc.min(day).as_py() is not None:
+            days.append((pc.min(day).as_py(), pc.max(day).as_py()))
+    if not days:
+        return {}, None
+    start = min(first for first, _ in days)
+    if first_day is not None:
+        start = max(start, first_day)
+    end = max(last for _, last in days)
+    buckets = (end - start + 1) * (24 if hourly else 1)
+
+    series = {}
+    for dimension, (name, key) in DIMENSIONS.items():
+        if name not in rollups:
+            continue
+        # Rows without a key, date or hour can't be placed in a series
+        table = rollups[name]
+        day = _plain(table.column("date")).cast(pa.date32()).cast(pa.int32())
+        valid = pc.and_(pc.greater_equal(day, start), pc.is_valid(table.column("hour")))
+        if key is not None:
+            valid = pc.and_(valid, pc.is_valid(table.column(key)))
+        table = table.filter(valid)
+        bucket = day.filter(valid).to_numpy().astype(np.int64) - start
+        if hourly:
+            bucket = bucket * 24 + table.column("hour").to_numpy().astype(np.int64)
+        if key is None:
+            keys, codes = ["All"], np.zeros(table.num_rows, dtype=np.int64)
+        else:
+            encoded = pc.dictionary_encode(_plain(table.column(key)).combine_chunks())
+            keys, codes = encoded.dictionary.to_pylist(), encoded.indices.to_numpy()
+        # One bincount per measure sums every (series, bucket) cell at once
+        flat = codes.astype(np.int64) * buckets + bucket
+        matrices = {
+            measure: np.bincount(flat, weights=table.column(measure).to_numpy().astype(np.float64),
+                                 minlength=len(keys) * buckets).reshape(len(keys), buckets)
+            for measure in MEASURES
+        }
+        series[dimension] = (keys, matrices)
+    return series, start
+
+
+def rolling_sum(matrix, window):
+    """Trailing window sums along the time axis; NaN until a full window"""
+    total = np.cumsum(matrix, axis=1)
+    result = np.full(matrix.shape, np.nan)
+    if matrix.shape[1] >= window:
+        result[:, window - 1] = total[:, window - 1]
+        result[:, window:] = total[:, window:] - total[:, :-window]
+    return result
+
+
+def lag_change(matrix, lag):
+    """matrix[t] - matrix[t - lag]; NaN for the first lag buckets"""
+    result = np.full(matrix.shape, np.nan)
+    result[:, lag:] = matrix[:, lag:] - matrix[:, :-lag]
+    return result
+
+
+def lag_ratio(matrix, lag):
+    """matrix[t] / matrix[t - lag] - 1; NaN where there is no earlier value"""
+    result = np.full(matrix.shape, np.nan)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        result[:, lag:] = matrix[:, lag:] / matrix[:, :-lag] - 1
+    result[~np.isfinite(result)] = np.nan
+    return result
+
+
+def forecast(matrix, horizon=FORECAST_DAYS, window=FORECAST_WINDOW):
+    """Trend + weekday seasonality forecast of every row; returns (forecast, lower, upper)"""
+    series, days = matrix.shape
+    season = WEEK if min(window, days) >= 2 * WEEK else 1
+    window = min(window, days) // season * season
+    history = matrix[:, days - window:]
+    t = np.arange(window) - (window - 1) / 2
+    level = history.mean(axis=1, keepdims=True)
+    slope = (history - level) @ t / max(t @ t, 1)
+    residual = history - level - slope[:, None] * t
+    seasonal = residual.reshape(series, window // season, season).mean(axis=1)
+    noise = (residual - np.tile(seasonal, window // season)).std(axis=1)
+
+    ahead = np.arange(window, window + horizon)
+    predicted = level + slope[:, None] * (ahead - (window - 1) / 2) + seasonal[:, ahead % season]
+    band = Z_95 * noise[:, None]
+    return np.maximum(predicted, 0), np.maximum(predicted - band, 0), np.maximum(predicted + band, 0)
+
+
+def _long_table(series, start, hourly, columns, skip=0):
+    """Flatten per-dimension matrices into one long table (dimension, key, date[, hour], columns...)
+
+    The first skip buckets only serve as history for the windows and are not written.
+    """
+    parts = []
+    for dimension, (keys, matrices) in series.items():
+        n_keys, buckets = next(iter(matrices.values())).shape
+        buckets -= skip
+        bucket = np.tile(np.arange(skip, skip + buckets), n_keys)
+        day = start + (bucket // 24 if hourly else bucket)
+        data = {
+            "dimension": pa.DictionaryArray.from_arrays(np.zeros(n_keys * buckets, dtype=np.int32),
+                                                        pa.array([dimension])),
+            "key": pa.DictionaryArray.from_arrays(np.repeat(np.arange(n_keys, dtype=np.int32), buckets),
+                                                  pa.array(keys, pa.string())),
+            "date": pa.array(day.astype(np.int32)).cast(pa.date32()),
+        }
+        if hourly:
+            data["hour"] = pa.array((bucket % 24).astype(np.int8))
+        for name, values in columns(matrices).items():
+            flat = values[:, skip:].reshape(-1)
+            data[name] = pa.array(flat, mask=np.isnan(flat)) if flat.dtype.kind == "f" else pa.array(flat)
+        parts.append(pa.table(data))
+    return pa.concat_tables(parts).unify_dictionaries()
+
+
+def series_columns(matrices, week):
+    """Measures, rolling windows and week-over-week changes for one grain (week = buckets per week)"""
+    columns = {
+        "transactions": matrices["transactions"].astype(np.int32),
+        "revenue": matrices["revenue"],
+        "units": matrices["units"].astype(np.int32),
+    }
+    for label, days in WINDOWS.items():
+        columns[f"revenue_{label}"] = rolling_sum(matrices["revenue"], days * week // WEEK)
+        columns[f"transactions_{label}"] = rolling_sum(matrices["transactions"], days * week // WEEK)
+    columns["revenue_wow_change"] = lag_change(matrices["revenue"], week)
+    columns["revenue_7d_wow_pct"] = lag_ratio(columns["revenue_7d"], week) * 100
+    return columns
+
+
+def build_time_series(rollups, horizon=FORECAST_DAYS, hourly_days=HOURLY_DAYS):
+    """{daily, hourly, forecast} tables from the rollup tables ({} without source rollups)"""
+    daily_series, start = dense_series(rollups, hourly=False)
+    if not daily_series:
+        return {}
+    days = next(iter(daily_series.values()))[1]["revenue"].shape[1]
+
+    # Hourly matrices are 24x wider, so they only cover the last hourly_days days plus
+    # the history the longest window needs
+    history = max(WINDOWS.values())
+    first_day = start + max(days - hourly_days - history, 0)
+    hourly_series, _ = dense_series(rollups, hourly=True, first_day=first_day)
+    skip = max(days - hourly_days - (first_day - start), 0) * 24
+
+    forecasts = {}
+    for dimension, (keys, matrices) in daily_series.items():
+        revenue, lower, upper = forecast(matrices["revenue"], horizon)
+        transactions, _, _ = forecast(matrices["transactions"], horizon)
+        forecasts[dimension] = (keys, {"forecast_revenue": revenue, "revenue_lower": lower,
+                                       "revenue_upper": upper, "forecast_transactions": transactions})
+    return {
+        "daily": _long_table(daily_series, start, False, lambda m: series_columns(m, WEEK)),
+        "hourly": _long_table(hourly_series, first_day, True, lambda m: series_columns(m, WEEK * 24), skip),
+        "forecast": _long_table(forecasts, start + days, False, lambda m: m),
+    }
+
+
+def write_time_series(tables, output_dir):
+    """Write each table to <output_dir>/<name>.parquet"""
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    for name, table in tables.items():
+        pq.write_table(table, output_dir / f"{name}.parquet", compression='snappy')
+    return {name: output_dir / f"{name}.parquet" for name in tables}
+
+
+def read_rollups(directory):
+    """The rollup tables the time series are built from"""
+    return {name: pq.read_table(Path(directory) / f"{name}.parquet")
+            for name in SOURCE_ROLLUPS if (Path(directory) / f"{name}.parquet").exists()}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build rolling daily/hourly series and forecasts from the rollups")
+    parser.add_argument("--rollups", default=str(PARQUET_DIR / "rollups"), help="rollup directory (default: %(default)s)")
+    parser.add_argument("--transactions", help="build the rollups from this transaction Parquet file or dataset instead")
+    parser.add_argument("-o", "--output", default=str(PARQUET_DIR / "time_series"))
+    parser.add_argument("--horizon", type=int, default=FORECAST_DAYS, help="days to forecast (default: %(default)s)")
+    parser.add_argument("--hourly-days", type=int, default=HOURLY_DAYS,
+                        help="most recent days in hourly.parquet (default: %(default)s)")
+    args = parser.parse_args()
+
+    rollups = build_rollups_from_parquet(args.transactions) if args.transactions else read_rollups(args.rollups)
+    if not rollups:
+        parser.error(f"no brand_day_hour/region_day_hour rollups in {args.rollups}")
+    started = time.perf_counter()
+    tables = build_time_series(rollups, args.horizon, args.hourly_days)
+    if not tables:
+        parser.error("the rollups have no dated rows")
+    paths = write_time_series(tables, args.output)
+    elapsed = time.perf_counter() - started
+    for name, path in paths.items():
+        print(f"✓ {name}: {tables[name].num_rows} rows ({path.stat().st_size / 1024:.2f} KB)")
+    days = len(pc.unique(tables["daily"].column("date")))
+    print(f"✅ Refreshed {tables['daily'].num_rows // days} series in {elapsed:.2f} s into {args.output}")
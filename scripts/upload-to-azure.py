@@ -3,67 +3,146 @@
 Upload Parquet files to existing Azure Blob Storage container
 """
 
+import argparse
+import base64
+import contextvars
+import hashlib
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from azure.storage.blob import BlobServiceClient
+from azure.storage.blob import BlobServiceClient, ContentSettings
 from azure.identity import DefaultAzureCredential
 import json
 from datetime import datetime
 
+from instrumentation import azure_retry_hook, span, traced
+
 # Configuration - Update these with your Azure details
 AZURE_STORAGE_ACCOUNT = os.environ.get('AZURE_STORAGE_ACCOUNT', 'your-storage-account')
 CONTAINER_NAME = os.environ.get('AZURE_CONTAINER_NAME', 'dashboard-data')
 CONNECTION_STRING = os.environ.get('AZURE_STORAGE_CONNECTION_STRING')
 
+# Well-known development account of the local Azurite emulator
+AZURITE_CONNECTION_STRING = (
+    "DefaultEndpointsProtocol=http;AccountName=devstoreaccount1;"
+    "AccountKey=Eby8vdM02xNOcqFlqUwJPLlmEtlCDXJ1OUzFT50uSRZ6IFsuFq2UVErCz4I6tq/K1SZFPTOtr/KBHBeksoGMGw==;"
+    "BlobEndpoint=http://127.0.0.1:10000/devstoreaccount1;"
+)
+
+# Upload tuning
+UPLOAD_WORKERS = int(os.environ.get('AZURE_UPLOAD_WORKERS', 4))           # files in flight
+MAX_CONCURRENCY = int(os.environ.get('AZURE_UPLOAD_CONCURRENCY', 4))      # blocks in flight per file
+BLOCK_SIZE_MB = int(os.environ.get('AZURE_UPLOAD_BLOCK_SIZE_MB', 4))      # staged block size
+MAX_SINGLE_PUT_MB = int(os.environ.get('AZURE_UPLOAD_SINGLE_PUT_MB', 8))  # larger files are split into blocks
+
 # Local paths
-PARQUET_DIR = Path(__file__).parent.parent / "parquet_output"
+PARQUET_DIR = Path(os.environ.get('PARQUET_OUTPUT_DIR', Path(__file__).parent.parent / "parquet_output"))
+MANIFEST_PATH = PARQUET_DIR / "upload_manifest.json"
+BLOB_PREFIX = "parquet/"
+DELETE_BATCH_SIZE = 256  # blob batch API limit per request
 
-def get_blob_service_client():
+def get_blob_service_client(block_size_mb=BLOCK_SIZE_MB, single_put_mb=MAX_SINGLE_PUT_MB):
     """Get Azure Blob Service Client"""
+    # Files above single_put_mb are uploaded as blocks of block_size_mb
+    transfer_options = {
+        "max_block_size": block_size_mb * 1024 * 1024,
+        "max_single_put_size": single_put_mb * 1024 * 1024
+    }
     if CONNECTION_STRING:
         # Use connection string if provided
-        return BlobServiceClient.from_connection_string(CONNECTION_STRING)
+        return BlobServiceClient.from_connection_string(CONNECTION_STRING, **transfer_options)
     else:
         # Use DefaultAzureCredential (works with Azure CLI, Managed Identity, etc.)
         account_url = f"https://{AZURE_STORAGE_ACCOUNT}.blob.core.windows.net"
         credential = DefaultAzureCredential()
-        return BlobServiceClient(account_url, credential=credential)
+        return BlobServiceClient(account_url, credential=credential, **transfer_options)
 
-def upload_file_to_blob(blob_service_client, local_file_path, blob_name):
+def upload_file_to_blob(blob_service_client, local_file_path, blob_name, max_concurrency=MAX_CONCURRENCY,
+                        content_md5=None):
     """Upload a single file to blob storage"""
-    try:
-        # Get container client
-        container_client = blob_service_client.get_container_client(CONTAINER_NAME)
-        
-        # Upload the file
-        with open(local_file_path, "rb") as data:
-            blob_client = container_client.upload_blob(
-                name=blob_name, 
-                data=data, 
-                overwrite=True
-            )
-        
-        # Get blob properties
-        properties = blob_client.get_blob_properties()
-        
-        print(f"✓ Uploaded {blob_name}")
-        print(f"  Size: {properties.size / 1024:.2f} KB")
-        print(f"  URL: {blob_client.url}")
-        
-        return True, blob_client.url
-        
-    except Exception as e:
-        print(f"❌ Failed to upload {blob_name}: {str(e)}")
-        return False, None
+    with span("upload_file_to_blob", blob=blob_name) as trace:
+        try:
+            # Get container client
+            container_client = blob_service_client.get_container_client(CONTAINER_NAME)
+            
+            # Upload the file; large files are staged as parallel blocks
+            size = Path(local_file_path).stat().st_size
+            with open(local_file_path, "rb") as data:
+                blob_client = container_client.upload_blob(
+                    name=blob_name, 
+                    data=data, 
+                    length=size,
+                    overwrite=True,
+                    max_concurrency=max_concurrency,
+                    # Block uploads get no service-computed MD5, so store ours for later syncs
+                    content_settings=ContentSettings(content_md5=bytearray(base64.b64decode(content_md5)))
+                    if content_md5 else None,
+                    retry_hook=azure_retry_hook
+                )
+            trace.count("bytes_uploaded", size)
+            
+            print(f"✓ Uploaded {blob_name} ({size / 1024:.2f} KB)")
+            
+            return True, blob_client.url
+            
+        except Exception as e:
+            trace.set("error", str(e))
+            print(f"❌ Failed to upload {blob_name}: {str(e)}")
+            return False, None
+
+def file_md5(path):
+    """Base64 MD5 of a file, in the form Azure reports as Content-MD5"""
+    digest = hashlib.md5()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return base64.b64encode(digest.digest()).decode()
+
+def load_manifest():
+    if MANIFEST_PATH.exists():
+        with open(MANIFEST_PATH) as f:
+            return json.load(f)
+    return {}
+
+def local_hashes(targets, manifest):
+    """Content hash per blob name, re-hashing only files whose size or mtime changed"""
+    hashes = {}
+    for blob_name, file_path in targets.items():
+        stat = file_path.stat()
+        entry = manifest.get(blob_name)
+        if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+            hashes[blob_name] = entry["md5"]
+        else:
+            hashes[blob_name] = file_md5(file_path)
+    return hashes
 
-def upload_all_parquet_files():
+def list_remote_hashes(container_client):
+    """Content-MD5 of every blob under the prefix, from a single list_blobs listing"""
+    remote = {}
+    for blob in container_client.list_blobs(name_starts_with=BLOB_PREFIX):
+        md5 = blob.content_settings.content_md5
+        remote[blob.name] = base64.b64encode(md5).decode() if md5 else None
+    return remote
+
+def delete_orphans(container_client, blob_names):
+    """Delete blobs in batches of DELETE_BATCH_SIZE"""
+    blob_names = sorted(blob_names)
+    for i in range(0, len(blob_names), DELETE_BATCH_SIZE):
+        container_client.delete_blobs(*blob_names[i:i + DELETE_BATCH_SIZE])
+    for name in blob_names:
+        print(f"✓ Deleted orphaned {name}")
+
+@traced()
+def upload_all_parquet_files(workers=UPLOAD_WORKERS, max_concurrency=MAX_CONCURRENCY,
+                             block_size_mb=BLOCK_SIZE_MB, sync=False, delete_orphaned=False):
     """Upload all Parquet files to Azure Blob Storage"""
     print(f"Connecting to Azure Storage Account: {AZURE_STORAGE_ACCOUNT}")
     print(f"Container: {CONTAINER_NAME}\n")
     
     # Get blob service client
     try:
-        blob_service_client = get_blob_service_client()
+        blob_service_client = get_blob_service_client(block_size_mb)
         
         # Check if container exists
         container_client = blob_service_client.get_container_client(CONTAINER_NAME)
@@ -78,33 +157,78 @@ def upload_all_parquet_files():
         return
     
     # Upload all parquet files
-    parquet_files = list(PARQUET_DIR.glob("*.parquet"))
+    # Partitioned datasets keep their month=/store_location= folders in the blob names
+    parquet_files = sorted(PARQUET_DIR.rglob("*.parquet"))
     
     if not parquet_files:
         print("❌ No Parquet files found. Run convert-to-parquet.py first.")
         return
     
-    print(f"Found {len(parquet_files)} Parquet files to upload\n")
+    # Create blob names with folder structure, plus the conversion metadata
+    targets = {f"{BLOB_PREFIX}{f.relative_to(PARQUET_DIR).as_posix()}": f for f in parquet_files}
+    metadata_file = PARQUET_DIR / "conversion_metadata.json"
+    if metadata_file.exists():
+        targets[f"{BLOB_PREFIX}metadata.json"] = metadata_file
+    
+    manifest = load_manifest()
+    hashes = local_hashes(targets, manifest)
+    
+    pending = list(targets)
+    orphaned = []
+    if sync or delete_orphaned:
+        remote = list_remote_hashes(container_client)
+        if sync:
+            pending = [name for name in targets if remote.get(name) != hashes[name]]
+            print(f"Sync: {len(targets) - len(pending)} unchanged, {len(pending)} new or changed")
+        orphaned = [name for name in remote if name not in targets]
+    
+    print(f"Found {len(pending)} files to upload")
+    print(f"  {workers} files in parallel, up to {max_concurrency} blocks of {block_size_mb} MB per file\n")
+    
+    # Largest files first so one big file doesn't start last and trail the rest
+    pending.sort(key=lambda name: targets[name].stat().st_size, reverse=True)
     
     uploaded_files = []
-    for file_path in parquet_files:
-        # Create blob name with folder structure
-        blob_name = f"parquet/{file_path.name}"
-        success, url = upload_file_to_blob(blob_service_client, file_path, blob_name)
+    started = time.perf_counter()
+    # The blob service client is thread-safe, so all workers share its connection pool
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            # copy_context keeps each upload span under this run's trace
+            executor.submit(contextvars.copy_context().run, upload_file_to_blob, blob_service_client,
+                            targets[blob_name], blob_name, max_concurrency, hashes[blob_name]): blob_name
+            for blob_name in pending
+        }
         
-        if success:
-            uploaded_files.append({
-                "file": file_path.name,
-                "blob_name": blob_name,
-                "url": url,
-                "size_kb": file_path.stat().st_size / 1024
-            })
-    
-    # Also upload metadata
-    metadata_file = PARQUET_DIR / "conversion_metadata.json"
-    if metadata_file.exists():
-        blob_name = "parquet/metadata.json"
-        upload_file_to_blob(blob_service_client, metadata_file, blob_name)
+        for future in as_completed(futures):
+            blob_name = futures[future]
+            file_path = targets[blob_name]
+            success, url = future.result()
+            if success:
+                uploaded_files.append({
+                    "file": file_path.relative_to(PARQUET_DIR).as_posix(),
+                    "blob_name": blob_name,
+                    "url": url,
+                    "size_kb": file_path.stat().st_size / 1024
+                })
+            else:
+                hashes.pop(blob_name)  # retried on the next sync
+    elapsed = time.perf_counter() - started
+    uploaded_files.sort(key=lambda f: f["blob_name"])
+    
+    if delete_orphaned and orphaned:
+        delete_orphans(container_client, orphaned)
+    
+    # Record what is now in the container
+    manifest = {
+        blob_name: {
+            "md5": md5,
+            "size": targets[blob_name].stat().st_size,
+            "mtime_ns": targets[blob_name].stat().st_mtime_ns
+        }
+        for blob_name, md5 in hashes.items()
+    }
+    with open(MANIFEST_PATH, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
     
     # Create upload summary
     summary = {
@@ -112,7 +236,14 @@ def upload_all_parquet_files():
         "storage_account": AZURE_STORAGE_ACCOUNT,
         "container": CONTAINER_NAME,
         "files_uploaded": len(uploaded_files),
+        "files_unchanged": len(targets) - len(pending),
+        "blobs_deleted": len(orphaned) if delete_orphaned else 0,
         "total_size_mb": sum(f["size_kb"] for f in uploaded_files) / 1024,
+        "elapsed_seconds": elapsed,
+        "throughput_mb_s": sum(f["size_kb"] for f in uploaded_files) / 1024 / elapsed if elapsed > 0 else 0,
+        "workers": workers,
+        "max_concurrency": max_concurrency,
+        "block_size_mb": block_size_mb,
         "files": uploaded_files
     }
     
@@ -123,7 +254,13 @@ def upload_all_parquet_files():
     
     print(f"\n✅ Upload complete!")
     print(f"  Files uploaded: {len(uploaded_files)}")
+    if sync:
+        print(f"  Files unchanged: {summary['files_unchanged']}")
+    if orphaned:
+        action = "Deleted" if delete_orphaned else "Orphaned blobs (use --delete-orphans)"
+        print(f"  {action}: {len(orphaned)}")
     print(f"  Total size: {summary['total_size_mb']:.2f} MB")
+    print(f"  Throughput: {summary['throughput_mb_s']:.2f} MB/s in {elapsed:.2f}s")
     print(f"  Summary saved to: {summary_path}")
 
 def create_env_template():
@@ -148,6 +285,25 @@ AZURE_STORAGE_CONNECTION_STRING="DefaultEndpointsProtocol=https;AccountName=xxx;
         print("Please update it with your Azure credentials")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Upload Parquet files to Azure Blob Storage")
+    parser.add_argument("--workers", type=int, default=UPLOAD_WORKERS,
+                        help="files uploaded in parallel (default: %(default)s)")
+    parser.add_argument("--max-concurrency", type=int, default=MAX_CONCURRENCY,
+                        help="parallel block uploads per file (default: %(default)s)")
+    parser.add_argument("--block-size-mb", type=int, default=BLOCK_SIZE_MB,
+                        help="block size for files split into blocks (default: %(default)s)")
+    parser.add_argument("--azurite", action="store_true",
+                        help="upload to a local Azurite emulator (127.0.0.1:10000)")
+    parser.add_argument("--sync", action="store_true",
+                        help="upload only files whose content hash differs from the blob's Content-MD5")
+    parser.add_argument("--delete-orphans", action="store_true",
+                        help="delete blobs under parquet/ that no longer exist locally")
+    args = parser.parse_args()
+    
+    if args.azurite:
+        CONNECTION_STRING = AZURITE_CONNECTION_STRING
+        AZURE_STORAGE_ACCOUNT = "devstoreaccount1"
+    
     # Create env template if needed
     if not CONNECTION_STRING and AZURE_STORAGE_ACCOUNT == 'your-storage-account':
         create_env_template()
@@ -155,4 +311,5 @@ if __name__ == "__main__":
         print("See .env.azure for template")
         exit(1)
     
-    upload_all_parquet_files()
\ No newline at end of file
+    upload_all_parquet_files(args.workers, args.max_concurrency, args.block_size_mb,
+                             args.sync, args.delete_orphans)
\ No newline at end of file